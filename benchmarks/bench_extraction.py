@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+条目提取引擎基准测试
+对比递归遍历（traverse）与预编译查询（query）两种引擎的耗时，并校验输出一致
+
+用法:
+    python benchmarks/bench_extraction.py /path/to/crate [--repeat 3]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from processor.records import to_json  # noqa: E402
+from processor.rust_analyzer import RustAnalyzer  # noqa: E402
+
+
+def run_engine(crate_path: Path, files: list, engine: str) -> tuple:
+    """
+    使用指定引擎分析全部文件
+
+    :return: (耗时秒数, 分析结果列表)
+    """
+    analyzer = RustAnalyzer(crate_path, engine=engine)
+    start = time.perf_counter()
+    results = [analyzer.analyze_file(f) for f in files]
+    return time.perf_counter() - start, results
+
+
+@click.command()
+@click.argument("crate_path", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option("--repeat", type=int, default=3, show_default=True, help="重复次数，取最短耗时")
+def main(crate_path: Path, repeat: int):
+    files = sorted(crate_path.rglob("*.rs"))
+    total_bytes = sum(f.stat().st_size for f in files)
+    click.echo(f"crate: {crate_path}")
+    click.echo(f"文件数: {len(files)}，总大小: {total_bytes / 1024:.1f} KiB")
+
+    timings = {}
+    outputs = {}
+    for engine in RustAnalyzer.ENGINES:
+        best = None
+        for _ in range(repeat):
+            elapsed, results = run_engine(crate_path, files, engine)
+            best = elapsed if best is None else min(best, elapsed)
+        timings[engine] = best
+        outputs[engine] = json.dumps(results, ensure_ascii=False, default=to_json)
+        click.echo(f"{engine:>9}: {best:.3f}s")
+
+    click.echo(f"加速比: {timings['traverse'] / timings['query']:.2f}x")
+    if outputs["traverse"] == outputs["query"]:
+        click.echo("输出一致")
+    else:
+        click.echo("输出不一致!", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
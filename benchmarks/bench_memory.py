@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析结果内存占用基准测试
+对比普通字典条目（dict）与 __slots__ 条目（slots）保留全部分析结果时的内存占用
+
+与 preprocess 相同地用 collect_source_files 收集源文件、用 analyze_files 串行分析，
+结果像单文件格式写入器一样全部保留在内存中。每种模式在独立的子进程中运行，
+分别报告结果对象占用的内存和进程峰值 RSS。
+
+用法:
+    python benchmarks/bench_memory.py /path/to/crate [-s src -s ...]
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from processor.rust_analyzer import RESULT_KEYS, analyze_files, merge_file_results  # noqa: E402
+from processor.source_walker import collect_source_files  # noqa: E402
+
+MODES = ("dict", "slots")
+
+
+def measure(crate_path: Path, source_paths: tuple, mode: str) -> dict:
+    """
+    与 preprocess 相同地收集、分析源文件并累积全部分析结果，测量内存占用
+
+    :param source_paths: 源码路径（库配置的 source_paths）
+    :return: {"results_kib": 结果对象占用, "max_rss_kib": 进程峰值 RSS, "functions": 函数数}
+    """
+    files = collect_source_files(crate_path, {"source_paths": list(source_paths)})
+    results = {key: [] for key in RESULT_KEYS}
+
+    tracemalloc.start()
+    for _, file_results in analyze_files(crate_path, files, jobs=1, compact=(mode == "slots")):
+        if file_results:
+            merge_file_results(results, file_results)
+    results_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "results_kib": results_bytes // 1024,
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "functions": len(results["functions"]),
+    }
+
+
+@click.command()
+@click.argument("crate_path", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option("-s", "--source-path", "source_paths", multiple=True, default=("src",), show_default=True,
+              help="源码路径（相对于 crate，可指定多个）")
+@click.option("--mode", type=click.Choice(MODES), default=None, hidden=True)
+def main(crate_path: Path, source_paths: tuple, mode: str):
+    if mode is not None:
+        # 子进程：只测量一种模式
+        click.echo(json.dumps(measure(crate_path, source_paths, mode)))
+        return
+
+    click.echo(f"crate: {crate_path}")
+    stats = {}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, str(crate_path), *(f"--source-path={p}" for p in source_paths),
+             "--mode", mode],
+            capture_output=True, text=True, check=True
+        ).stdout
+        stats[mode] = json.loads(output.strip().splitlines()[-1])
+        click.echo(f"{mode:>6}: 结果 {stats[mode]['results_kib'] / 1024:.1f} MiB，"
+                   f"峰值 RSS {stats[mode]['max_rss_kib'] / 1024:.1f} MiB，"
+                   f"函数 {stats[mode]['functions']}")
+
+    click.echo(f"结果内存节省: {1 - stats['slots']['results_kib'] / stats['dict']['results_kib']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,20 @@ Fuzz 命令 - 运行 Fuzzing
 """
 
 import click
+import json
 from pathlib import Path
 from loguru import logger
+from tqdm import tqdm
 import subprocess
-import time
 
 from src import vars as global_vars
 from src.utils import setup_library_config, get_output_path, get_crate_path
 
 
+# 除 fuzzing 时间外，为加载语料库等留出的时间（秒），超过后强制终止
+KILL_GRACE = 60
+
+
 @click.command(help="运行 cargo-fuzz 进行 fuzzing 测试")
 @click.option(
     "-L",
@@ -36,9 +41,51 @@ from src.utils import setup_library_config, get_output_path, get_crate_path
     "--jobs",
     type=int,
     default=0,
-    help="并行任务数（0 表示自动）"
+    help="每个 fuzz target 的 libFuzzer 并行任务数（0 表示不使用 -jobs，每个 target 占用 1 个核心）"
+)
+@click.option(
+    "-p",
+    "--parallel",
+    type=int,
+    default=None,
+    help="同时运行的 fuzz target 数（默认读取 [fuzzer] parallel，0 表示只受核心预算限制）"
+)
+@click.option(
+    "--cores",
+    type=int,
+    default=None,
+    help="可使用的 CPU 核心数（默认读取 [fuzzer] cores，0 表示全部可用核心）"
+)
+@click.option(
+    "--no-pin",
+    is_flag=True,
+    help="不将 fuzz target 绑定到 CPU 核心"
+)
+@click.option(
+    "--sanitizer",
+    type=click.Choice(["address", "leak", "memory", "thread", "none"]),
+    default=None,
+    help="编译 fuzz target 使用的 sanitizer（默认读取 [fuzzer] sanitizers 的第一个）"
 )
-def fuzz(library_name: str, target: str, timeout: int, jobs: int):
+@click.option(
+    "--adaptive/--no-adaptive",
+    default=None,
+    help="自适应模式：总时间不变，按时间片把 CPU 分配给覆盖率增长最快的 target（默认读取 [fuzzer] adaptive）"
+)
+@click.option(
+    "--slice",
+    "slice_seconds",
+    type=int,
+    default=None,
+    help="自适应模式的时间片长度（秒，默认读取 [fuzzer] slice_seconds）"
+)
+@click.option(
+    "--multiplex/--no-multiplex",
+    default=None,
+    help="将全部 fuzz target 合并为一个二进制编译，按 target 分别运行（默认读取 [fuzzer] multiplex）"
+)
+def fuzz(library_name: str, target: str, timeout: int, jobs: int, parallel: int, cores: int,
+         no_pin: bool, sanitizer: str, adaptive: bool, slice_seconds: int, multiplex: bool):
     """
     运行 fuzzing
     """
@@ -66,33 +113,189 @@ def fuzz(library_name: str, target: str, timeout: int, jobs: int):
     
     logger.info(f"准备运行 {len(targets)} 个 fuzz target")
     
+    fuzzer_config = global_vars.config.get("fuzzer", {})
+    if parallel is None:
+        parallel = fuzzer_config.get("parallel", 0)
+    if cores is None:
+        cores = fuzzer_config.get("cores", 0)
+    
+    if adaptive is None:
+        adaptive = fuzzer_config.get("adaptive", False)
+    if slice_seconds is None:
+        slice_seconds = fuzzer_config.get("slice_seconds", 300)
+    if adaptive and jobs > 0:
+        # -jobs 模式下 libFuzzer 的状态输出写入各 worker 的日志文件，无法按时间片评估
+        logger.warning("自适应模式不支持 --jobs，已忽略")
+        jobs = 0
+    if adaptive and timeout <= 0:
+        logger.error("自适应模式需要指定 --timeout 作为时间预算")
+        return
+    
+    # 一次编译全部 fuzz target，之后直接运行二进制
+    from src.fuzzer.build import FuzzBuild, sync_targets
+    if sanitizer is None:
+        sanitizer = (fuzzer_config.get("sanitizers") or ["address"])[0]
+    if multiplex is None:
+        multiplex = fuzzer_config.get("multiplex", False)
+    build = FuzzBuild(fuzz_project_dir, crate_path, output_path / "fuzz_build", sanitizer)
+    harness_index = {}
+    if multiplex:
+        # 全部 fuzz target 合并为一个二进制，只编译和链接一次；
+        # 运行时通过环境变量固定子 harness，语料库和 artifact 仍按 target 分开
+        from src.fuzzer.multiplex import build_multiplex
+        all_targets = sorted(f.stem for f in fuzz_targets_dir.glob("*.rs"))
+        harness_index = build_multiplex(build, fuzz_targets_dir, all_targets)
+        built = [name for name in targets if name in harness_index]
+    else:
+        registered = sync_targets(fuzz_targets_dir, fuzz_project_dir / "fuzz")
+        if registered:
+            logger.info(f"注册 {len(registered)} 个新的 fuzz target")
+        built = build.build(targets)
+    if len(built) < len(targets):
+        skipped = [name for name in targets if name not in built]
+        logger.warning(f"{len(skipped)} 个 fuzz target 编译失败，跳过: {', '.join(skipped)}")
+    targets = built
+    if not targets:
+        logger.error("没有可运行的 fuzz target")
+        return
+    
+    # 每个 target 一个任务，-jobs 大于 0 时占用相应数量的核心
+    from src.fuzzer.scheduler import FuzzJob, FuzzScheduler
+    cores_per_target = max(1, jobs)
+    log_dir = output_path / "fuzz_logs"
+    stats_dir = output_path / "fuzz_stats"
+    
+    if jobs > 0:
+        # -jobs 模式下 libFuzzer 的状态输出写入各 worker 的 fuzz-N.log，主进程输出中没有状态行
+        logger.warning(f"--jobs 模式下没有指标时间序列，各 worker 的日志保存在 {log_dir}/<target>.workers/")
+    
+    def make_job(target_name: str, seconds: int, elapsed: float = 0.0) -> FuzzJob:
+        args = [f"-max_total_time={seconds}"]
+        cwd = fuzz_project_dir
+        
+        if jobs > 0:
+            args.extend([f"-jobs={jobs}", f"-workers={jobs}"])
+            # worker 日志写入工作目录，每个 target 单独一个目录，并行的 target 不会互相覆盖
+            cwd = log_dir / f"{target_name}.workers"
+            cwd.mkdir(parents=True, exist_ok=True)
+        
+        binary, env = None, {}
+        if target_name in harness_index:
+            from src.fuzzer.multiplex import HARNESS_ENV, MULTIPLEX_TARGET
+            binary, env = MULTIPLEX_TARGET, {HARNESS_ENV: str(harness_index[target_name])}
+        
+        return FuzzJob(
+            name=target_name,
+            cmd=build.command(target_name, args, binary),
+            cwd=cwd,
+            log_file=log_dir / f"{target_name}.log",
+            artifact_dir=build.artifact_dir(target_name),
+            cores=cores_per_target,
+            deadline=seconds + KILL_GRACE if seconds > 0 else None,
+            stats_file=stats_dir / f"{target_name}.jsonl",
+            append=elapsed > 0,
+            time_offset=elapsed,
+            env=env
+        )
+    
+    scheduler = FuzzScheduler(core_budget=cores, max_parallel=parallel, pin=not no_pin)
+    slots = len(scheduler.cores) // min(cores_per_target, len(scheduler.cores))
+    if parallel:
+        slots = min(slots, parallel)
+    logger.info(f"核心预算 {len(scheduler.cores)}，每个 target {cores_per_target} 个核心，"
+                f"最多同时运行 {slots} 个 target")
+    
+    def report(result, slice_seconds=None):
+        metrics = _format_stats(result.stats)
+        if result.status == "crash":
+            logger.warning(f"{result.name}: 发现 {len(result.artifacts)} 个 crash "
+                           f"({result.duration:.0f}s, {metrics})，日志: {result.log_file}")
+        elif result.status == "ok":
+            log = logger.debug if slice_seconds else logger.info
+            log(f"Fuzzing 完成: {result.name} ({result.duration:.0f}s, {metrics})")
+        else:
+            logger.error(f"Fuzzing 失败: {result.name}（{result.status}，退出码 {result.returncode}），"
+                         f"日志末尾:\n{_log_tail(result.log_file)}")
+    
+    def on_progress(running):
+        # 运行中各 target 的最新指标汇总显示在进度条上
+        snapshots = [stats.snapshot() for stats in running]
+        if not snapshots:
+            return
+        if len(snapshots) == 1:
+            postfix = f"{running[0].name}: {_format_stats(snapshots[0])}"
+        else:
+            postfix = (f"运行中 {len(snapshots)}，"
+                       f"exec/s 合计 {sum(s.get('exec_s', 0) for s in snapshots)}，"
+                       f"cov 最高 {max((s.get('cov', 0) for s in snapshots), default=0)}，"
+                       f"rss 最高 {max((s.get('rss_mb', 0) for s in snapshots), default=0)}Mb")
+        progress.set_postfix_str(postfix, refresh=False)
+        progress.refresh()
+    
     # 运行 fuzzing
-    for target_name in targets:
-        logger.info(f"运行 fuzz target: {target_name}")
+    if adaptive:
+        # 总时间预算与每个 target 各运行 timeout 秒相同，按覆盖率增长分配时间片
+        from src.fuzzer.adaptive import AdaptiveCampaign
+        budget = timeout * len(targets)
+        logger.info(f"自适应模式: 总预算 {budget}s，时间片 {slice_seconds}s")
+        campaign = AdaptiveCampaign(scheduler, targets, make_job, budget, slice_seconds, slots)
+        progress = tqdm(total=budget, desc="Fuzzing", unit="s")
         
-        cmd = [
-            "cargo", "fuzz", "run", target_name,
-            "--", f"-max_total_time={timeout}"
-        ]
+        def on_slice(result, seconds):
+            progress.update(seconds)
+            report(result, seconds)
         
-        if jobs > 0:
-            cmd.extend([f"-jobs={jobs}"])
+        try:
+            results = campaign.run(on_slice=on_slice, on_progress=on_progress)
+        finally:
+            progress.close()
+        for result in results:
+            gain, seconds = result.feature_gain
+            logger.info(f"{result.name}: 时间片 {campaign.bandit.pulls[result.name]} 个，"
+                        f"新增 feature {gain}，{_format_stats(result.stats)}")
+    else:
+        progress = tqdm(total=len(targets), desc="Fuzzing", unit="target")
+        
+        def on_finish(result):
+            progress.update(1)
+            report(result)
         
         try:
-            result = subprocess.run(
-                cmd,
-                cwd=fuzz_project_dir,
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode != 0:
-                logger.error(f"Fuzzing 失败: {result.stderr}")
-            else:
-                logger.info(f"Fuzzing 完成: {target_name}")
-                
-        except Exception as e:
-            logger.error(f"运行 fuzzing 失败: {e}")
+            results = scheduler.run([make_job(name, timeout) for name in targets],
+                                    on_finish=on_finish, on_progress=on_progress)
+        finally:
+            progress.close()
+    
+    summary_file = output_path / "fuzz_summary.json"
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump([result.to_dict() for result in results], f, indent=2, ensure_ascii=False)
+    
+    statuses = [result.status for result in results]
+    logger.info("=" * 60)
+    logger.info(f"完成 {len(results)} 个 fuzz target: 正常 {statuses.count('ok')}，"
+                f"crash {statuses.count('crash')}，超时 {statuses.count('timeout')}，"
+                f"失败 {statuses.count('failed')}")
+    logger.info(f"运行结果: {summary_file}")
+    logger.info(f"运行日志: {log_dir}")
+    logger.info(f"指标时间序列: {stats_dir}")
+    logger.info("=" * 60)
+
+
+def _format_stats(stats: dict) -> str:
+    """格式化 libFuzzer 指标"""
+    if not stats:
+        return "无 libFuzzer 状态输出"
+    return (f"#{stats['execs']} cov {stats.get('cov', 0)} ft {stats.get('ft', 0)} "
+            f"corp {stats.get('corpus', 0)} exec/s {stats.get('exec_s', 0)} rss {stats.get('rss_mb', 0)}Mb")
+
+
+def _log_tail(log_file: Path, lines: int = 20) -> str:
+    """读取日志的最后几行"""
+    try:
+        with open(log_file, "r", encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+    except OSError:
+        return ""
 
 
 def setup_fuzz_project(crate_path: Path, fuzz_project_dir: Path, fuzz_targets_dir: Path):
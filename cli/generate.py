@@ -2,11 +2,13 @@
 Generate 命令 - 生成 Fuzz Target
 """
 
+import os
 import click
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 from pathlib import Path
 from loguru import logger
 from tqdm import tqdm
-import json
 
 from src import vars as global_vars
 from src.utils import setup_library_config, get_output_path, setup_llm
@@ -38,7 +40,38 @@ from src.utils import setup_library_config, get_output_path, setup_llm
     default="",
     help="指定要测试的函数（逗号分隔）"
 )
-def generate(library_name: str, count: int, task: str, functions: str):
+@click.option(
+    "-c",
+    "--concurrency",
+    type=int,
+    default=None,
+    help="同时进行的 LLM 请求数（默认读取 [generator] concurrency，为 1 时串行生成）"
+)
+@click.option(
+    "-b",
+    "--batch-size",
+    type=int,
+    default=None,
+    help="每次 LLM 请求生成的 fuzz target 数量（默认读取 [generator] batch_size）"
+)
+@click.option(
+    "--temperature",
+    type=float,
+    default=None,
+    help="LLM 采样温度（默认读取 [llm] temperature，为 0 时相同的 prompt 直接使用缓存的响应）"
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="不使用 LLM 响应缓存，总是请求 LLM"
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="按生成日志继续上次中断的生成，沿用上次的计划并跳过已完成的 fuzz target"
+)
+def generate(library_name: str, count: int, task: str, functions: str, concurrency: int,
+             batch_size: int, temperature: float, no_cache: bool, resume: bool):
     """
     生成 fuzz target
     """
@@ -46,19 +79,46 @@ def generate(library_name: str, count: int, task: str, functions: str):
     
     output_path = get_output_path()
     
-    # 检查预处理结果
-    ast_file = output_path / "ast.json"
-    if not ast_file.exists():
+    # 检查预处理结果，优先使用符号索引
+    from processor.ast_store import AstReader
+    from processor.symbol_index import SymbolIndex
+    symbol_index = SymbolIndex.open(output_path)
+    reader = AstReader.open(output_path)
+    if symbol_index is None and reader is None:
         logger.error("未找到预处理结果，请先运行 preprocess 命令")
         return
     
-    logger.info("加载分析结果...")
-    with open(ast_file, "r", encoding="utf-8") as f:
-        analysis_results = json.load(f)
+    if symbol_index is not None:
+        logger.info("使用符号索引...")
+        analysis_results = {}
+    else:
+        logger.info("加载分析结果...")
+        analysis_results = reader.load(("functions", "structs", "enums", "traits", "impls"))
+        # trait 方法没有 pub 关键字，按 trait 和所属类型的可见性确定（与符号索引一致）
+        from processor.rust_analyzer import trait_methods_to_publish
+        types = analysis_results["structs"] + analysis_results["enums"] + analysis_results["traits"]
+        for func in trait_methods_to_publish(analysis_results["functions"], types):
+            func["is_pub"] = True
     
     # 设置 LLM
     logger.info("初始化 LLM...")
-    llm_client = setup_llm()
+    # temperature > 0 的缓存响应只在继续上次的生成时复用，否则重复的函数集合会得到相同的 fuzz target
+    llm_client = setup_llm(use_cache=not no_cache, reuse_sampled=resume)
+    
+    # 建立类型索引，用于在 prompt 中附带参数依赖的类型定义
+    from src.generator.type_context import TypeIndex
+    generator_config = global_vars.config.get("generator", {})
+    if symbol_index is not None:
+        type_sources = (symbol_index.all_types("struct"), symbol_index.all_types("enum"),
+                        symbol_index.all_impls())
+    else:
+        type_sources = (analysis_results["structs"], analysis_results["enums"], analysis_results["impls"])
+    type_index = TypeIndex(
+        *type_sources,
+        collect_depth=generator_config.get("collect_depth", 3),
+        one_def_per_name=generator_config.get("collect_one_def_in_same_names", True)
+    )
+    logger.info(f"类型索引: {len(type_index)} 个类型，收集深度 {type_index.collect_depth}")
     
     # 创建生成器
     from src.generator.rust_generator import RustFuzzGenerator
@@ -66,22 +126,30 @@ def generate(library_name: str, count: int, task: str, functions: str):
     generator = RustFuzzGenerator(
         llm_client=llm_client,
         analysis_results=analysis_results,
-        config=global_vars.config
+        config=global_vars.config,
+        symbol_index=symbol_index,
+        library_config=global_vars.library_config,
+        type_index=type_index
     )
+    if temperature is not None:
+        generator.temperature = temperature
     
     # 准备目标函数列表
     target_functions = []
     if task == "given" and functions:
-        target_functions = [f.strip() for f in functions.split(",")]
-    elif task == "allcover":
+        for name in (f.strip() for f in functions.split(",") if f.strip()):
+            matches = generator.find_functions(name)
+            if not matches:
+                logger.warning(f"未找到函数 {name}")
+            elif len(matches) > 1:
+                logger.info(f"{name} 匹配 {len(matches)} 个函数: {', '.join(f['path'] for f in matches)}")
+            target_functions += matches
+    elif task in ("allcover", "autoscale"):
         # 覆盖所有公开函数
-        all_funcs = analysis_results.get("functions", [])
-        target_functions = [f["name"] for f in all_funcs if f.get("is_pub", False)]
-    elif task == "autoscale":
-        # 自动缩放
-        all_funcs = analysis_results.get("functions", [])
-        target_functions = [f["name"] for f in all_funcs if f.get("is_pub", False)]
-        count = min(count, len(target_functions))
+        if symbol_index is not None:
+            target_functions = list(symbol_index.functions(is_pub=True))
+        else:
+            target_functions = [f for f in analysis_results.get("functions", []) if f.get("is_pub", False)]
     
     logger.info(f"目标函数数量: {len(target_functions)}")
     
@@ -89,32 +157,134 @@ def generate(library_name: str, count: int, task: str, functions: str):
     fuzz_targets_dir = output_path / "fuzz_targets"
     fuzz_targets_dir.mkdir(exist_ok=True)
     
-    # 生成 fuzz target
-    logger.info(f"开始生成 {count} 个 fuzz target...")
+    if concurrency is None:
+        concurrency = generator_config.get("concurrency", 1)
+    concurrency = max(1, concurrency)
+    if batch_size is None:
+        batch_size = generator_config.get("batch_size", 1)
+    batch_size = max(1, batch_size)
+    
+    from src.generator.journal import GenerationJournal, JOURNAL_FILE
+    journal = GenerationJournal(output_path / JOURNAL_FILE)
+    state = journal.load() if resume else None
+    if resume and state.selections is None:
+        logger.warning("未找到生成日志，重新开始生成")
+    
+    completed = set()
+    if state is not None and state.selections is not None:
+        # 继续上次的生成：沿用日志中的计划，输出文件仍存在的 fuzz target 视为已完成
+        selections = state.selections
+        count = len(selections)
+        completed = {i for i, entry in state.completed.items()
+                     if (fuzz_targets_dir / entry["output"]).exists()}
+        journal.resume()
+        logger.info(f"继续上次的生成: 共 {count} 个 fuzz target，已完成 {len(completed)} 个")
+    else:
+        # 预先规划所有函数集合（加权集合覆盖），编号与完成顺序无关
+        from src.generator.selector import FunctionSelector
+        reaching_unsafe = ()
+        if symbol_index is not None:
+            reaching_unsafe = [func["path"] for func in symbol_index.pub_functions_reaching_unsafe()]
+        selector = FunctionSelector(
+            function_set_size=generator_config.get("function_set_size", 3),
+            prioritize_unsafe=generator_config.get("prioritize_unsafe", True),
+            priority_functions=global_vars.library_config.get("priority_unsafe_functions", []),
+            reaching_unsafe=reaching_unsafe
+        )
+        if task == "autoscale":
+            # 自动缩放：不超过覆盖全部函数所需的数量
+            count = min(count, selector.plan(target_functions, 0).full_cover_size)
+        plan = selector.plan(target_functions, count)
+        selections = plan.selections
+        count = len(selections)
+        
+        logger.info(f"覆盖全部目标函数需要 {plan.full_cover_size} 个 fuzz target")
+        if plan.uncovered:
+            logger.warning(f"{len(plan.uncovered)} 个函数未被任何 fuzz target 覆盖"
+                           f"（可增大 --count），如: {', '.join(plan.uncovered[:10])}")
+        
+        journal.start(selections, task=task)
+    
+    # 生成 fuzz target，每个请求包含 batch_size 个，最多 concurrency 个请求同时进行，完成一批保存一批
+    pending = [i for i in range(count) if i not in completed]
+    logger.info(f"开始生成 {len(pending)} 个 fuzz target，每批 {batch_size} 个，并发请求数: {concurrency}")
     
     generated_count = 0
-    for i in tqdm(range(count), desc="生成 fuzz target"):
-        try:
-            # 选择函数集合
-            selected_funcs = generator.select_functions(
-                target_functions,
-                function_set_size=global_vars.config.get("generator", {}).get("function_set_size", 3)
-            )
-            
-            # 生成代码
-            fuzz_code = generator.generate_fuzz_target(selected_funcs)
-            
-            # 保存
-            target_file = fuzz_targets_dir / f"fuzz_target_{i+1}.rs"
-            with open(target_file, "w", encoding="utf-8") as f:
-                f.write(fuzz_code)
-            
-            generated_count += 1
-            
-        except Exception as e:
-            logger.error(f"生成 fuzz target {i+1} 失败: {e}")
+    batches = iter([pending[start:start + batch_size] for start in range(0, len(pending), batch_size)])
+    # 只保持 concurrency 个请求在进行中，完成一批再提交下一批，中断时不会为排队的批次继续请求 LLM
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    running = {}
+    try:
+        with tqdm(total=count, initial=len(completed), desc="生成 fuzz target") as progress:
+            while True:
+                for batch in islice(batches, concurrency - len(running)):
+                    future = executor.submit(generator.generate_fuzz_targets, [selections[i] for i in batch],
+                                             [str(i) for i in batch])
+                    running[future] = batch
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = running.pop(future)
+                    try:
+                        fuzz_codes = future.result()
+                    except Exception as e:
+                        # 一批失败不影响其他批次，未记录的 fuzz target 可以用 --resume 重新生成
+                        fuzz_codes = [e] * len(batch)
+                    for i, fuzz_code in zip(batch, fuzz_codes):
+                        progress.update(1)
+                        if isinstance(fuzz_code, Exception):
+                            logger.error(f"生成 fuzz target {i+1} 失败: {fuzz_code}")
+                            continue
+                        
+                        # 保存，文件落盘后再写入日志
+                        target_file = fuzz_targets_dir / f"fuzz_target_{i+1}.rs"
+                        with open(target_file, "w", encoding="utf-8") as f:
+                            f.write(fuzz_code)
+                            f.flush()
+                            os.fsync(f.fileno())
+                        journal.record(i, selections[i], generator.prompt_hashes.get(tuple(selections[i]), ""),
+                                       target_file.name)
+                        
+                        generated_count += 1
+                        
+                        tokens = generator.prompt_tokens.get(tuple(selections[i]))
+                        if tokens is not None:
+                            logger.debug(f"fuzz_target_{i+1}.rs: prompt {tokens} tokens")
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    
+    journal.close()
     
     logger.info("=" * 60)
     logger.info(f"成功生成 {generated_count} 个 fuzz target")
+    if completed:
+        logger.info(f"此前已完成 {len(completed)} 个 fuzz target")
     logger.info(f"保存位置: {fuzz_targets_dir}")
+    prompt_tokens = [generator.prompt_tokens[key] for key in map(tuple, selections)
+                     if key in generator.prompt_tokens]
+    if prompt_tokens:
+        logger.info(f"prompt tokens: 平均每个 fuzz target {sum(prompt_tokens) / len(prompt_tokens):.0f}，"
+                    f"最多 {max(prompt_tokens)}，预算 {generator.prompt_budget.max_tokens or '不限'}"
+                    f"（分词器: {generator.prompt_budget.tokenizer.name}）")
+    latency = llm_client.latency.summary()
+    if latency["requests"]:
+        logger.info(f"LLM 请求 {latency['requests']} 次: 首 token 平均 {latency['ttft_mean']:.1f}s "
+                    f"(p50 {latency['ttft_p50']:.1f}s)，总耗时平均 {latency['latency_mean']:.1f}s "
+                    f"(p50 {latency['latency_p50']:.1f}s, p95 {latency['latency_p95']:.1f}s)，"
+                    f"代码块完成后提前结束 {latency['early_stops']} 次")
+    from src.llm.pool import LLMClientPool
+    if isinstance(llm_client, LLMClientPool):
+        pool_stats = llm_client.stats()
+        logger.info(f"各端点请求数: {pool_stats['requests']}，对冲请求 {pool_stats['hedged']} 次"
+                    f"（其中 {pool_stats['hedge_wins']} 次先完成），改用其他端点 {pool_stats['failovers']} 次")
+        llm_client.close()
+    if llm_client.cache is not None:
+        cache_stats = llm_client.cache.stats()
+        llm_client.cache.close()
+        logger.info(f"LLM 响应缓存: 命中 {cache_stats['hits']}，未命中 {cache_stats['misses']}，"
+                    f"采样请求不使用缓存 {cache_stats['bypassed']}，"
+                    f"共 {cache_stats['entries']} 条 ({cache_stats['size'] / 1024 / 1024:.1f} MiB)")
     logger.info("=" * 60)
@@ -6,7 +6,6 @@ import click
 from pathlib import Path
 from loguru import logger
 from tqdm import tqdm
-import json
 
 from src import vars as global_vars
 from src.utils import setup_library_config, get_output_path, get_crate_path
@@ -25,7 +24,22 @@ from src.utils import setup_library_config, get_output_path, get_crate_path
     is_flag=True,
     help="强制重新分析，即使已有分析结果"
 )
-def preprocess(library_name: str, force: bool):
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    help="并行分析的进程数（0 表示使用 CPU 核心数）",
+    show_default=True
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "sharded"]),
+    default=None,
+    help="结果格式（json: 单个 ast.json，sharded: 按条目类型分片的 JSONL），默认读取 [preprocessor] output_format"
+)
+def preprocess(library_name: str, force: bool, jobs: int, output_format: str):
     """
     预处理命令 - 分析 Rust 代码结构
     """
@@ -36,69 +50,106 @@ def preprocess(library_name: str, force: bool):
     
     logger.info(f"开始预处理 crate: {crate_path}")
     
-    # 检查是否已有分析结果
-    ast_file = output_path / "ast.json"
-    if ast_file.exists() and not force:
-        logger.info("检测到已有分析结果，使用 --force 强制重新分析")
-        return
+    manifest_file = output_path / "ast_manifest.json"
+    preprocessor_config = global_vars.config.get("preprocessor", {})
+    output_format = output_format or preprocessor_config.get("output_format", "json")
     
     # 导入 Rust 分析器
-    from processor.rust_analyzer import RustAnalyzer
+    from processor.rust_analyzer import analyze_files, resolve_jobs, group_results_by_file
+    from processor.manifest import SourceManifest, snapshot
+    from processor.source_walker import collect_source_files
+    from processor.ast_store import AstReader, open_writer
+    from processor.symbol_index import SymbolIndexWriter
+    
+    # 收集源文件（应用 exclude_paths、test_paths 和 target_modules）
+    rs_files = collect_source_files(crate_path, global_vars.library_config)
     
-    analyzer = RustAnalyzer(crate_path)
+    # 检查是否已有分析结果，有则只重新分析变化的文件
+    cached = {}
+    manifest = None
+    reader = AstReader.open(output_path)
+    if reader is not None and not force:
+        manifest = SourceManifest.load(manifest_file, crate_path)
+        if manifest is None:
+            logger.info("已有分析结果缺少文件清单或格式版本过旧，重新完整分析")
+    
+    if manifest is not None:
+        changed_files, deleted_files = manifest.diff(rs_files)
+        up_to_date = reader.sharded == (output_format == "sharded") and _index_current(output_path)
+        if not changed_files and not deleted_files and up_to_date:
+            manifest.save(manifest_file)
+            logger.info("源文件没有变化，无需重新分析")
+            return
+        
+        logger.info(f"增量预处理: {len(changed_files)} 个文件新增或修改，{len(deleted_files)} 个文件已删除")
+        cached = group_results_by_file(reader.load())
+        for rel_path in deleted_files:
+            manifest.forget(rel_path)
+    else:
+        manifest = SourceManifest(crate_path)
+        changed_files = rs_files
     
     # 分析源代码
     logger.info("正在分析源代码...")
-    source_paths = global_vars.library_config.get("source_paths", ["src"])
-    
-    results = {
-        "functions": [],
-        "structs": [],
-        "enums": [],
-        "traits": [],
-        "impls": [],
-        "unsafe_blocks": [],
-        "modules": []
-    }
+    logger.info(f"待分析文件: {len(changed_files)}，并行进程数: {resolve_jobs(jobs)}")
     
-    for src_path in source_paths:
-        full_path = crate_path / src_path
-        if not full_path.exists():
-            logger.warning(f"源代码路径不存在: {full_path}")
-            continue
-        
-        logger.info(f"分析路径: {full_path}")
-        rs_files = list(full_path.rglob("*.rs"))
+    # 按文件顺序写出新旧结果，与完整分析的输出一致
+    writer = open_writer(output_path, output_format)
+    index_writer = SymbolIndexWriter(output_path)
+    # 分析前记录文件状态，分析期间被修改的文件下次仍会重新分析
+    states = {rs_file: snapshot(rs_file) for rs_file in changed_files}
+    file_iter = analyze_files(crate_path, changed_files, jobs)
+    for rs_file in tqdm(rs_files, desc="分析 Rust 文件"):
+        rel_path = manifest.relative(rs_file)
+        if rs_file in states:
+            _, file_results = next(file_iter)
+            if file_results:
+                manifest.record(rs_file, states[rs_file])
+            else:
+                # 分析失败的文件不记录，下次重新分析
+                manifest.forget(rel_path)
+        else:
+            file_results = cached.get(rel_path)
         
-        for rs_file in tqdm(rs_files, desc="分析 Rust 文件"):
-            try:
-                file_results = analyzer.analyze_file(rs_file)
-                
-                results["functions"].extend(file_results.get("functions", []))
-                results["structs"].extend(file_results.get("structs", []))
-                results["enums"].extend(file_results.get("enums", []))
-                results["traits"].extend(file_results.get("traits", []))
-                results["impls"].extend(file_results.get("impls", []))
-                results["unsafe_blocks"].extend(file_results.get("unsafe_blocks", []))
-                results["modules"].extend(file_results.get("modules", []))
-                
-            except Exception as e:
-                logger.error(f"分析文件失败 {rs_file}: {e}")
+        if file_results:
+            writer.add(file_results)
+            index_writer.add(file_results)
     
     # 保存结果
     logger.info("保存分析结果...")
-    with open(output_path / "ast.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    writer.close()
+    call_graph = index_writer.close()
+    
+    if preprocessor_config.get("dump_call_graph", False):
+        from processor.symbol_index import SymbolIndex
+        symbol_index = SymbolIndex.open(output_path)
+        paths = [func["path"] for func in symbol_index.functions()]
+        symbol_index.close()
+        call_graph.dump(output_path / "call_graph.json", paths)
+        logger.info(f"调用图已导出: {output_path / 'call_graph.json'}")
+    manifest.save(manifest_file)
+    counts = writer.counts
     
     # 统计信息
     logger.info("=" * 60)
     logger.info("预处理完成!")
-    logger.info(f"函数数量: {len(results['functions'])}")
-    logger.info(f"结构体数量: {len(results['structs'])}")
-    logger.info(f"枚举数量: {len(results['enums'])}")
-    logger.info(f"Trait 数量: {len(results['traits'])}")
-    logger.info(f"Impl 块数量: {len(results['impls'])}")
-    logger.info(f"Unsafe 块数量: {len(results['unsafe_blocks'])}")
-    logger.info(f"模块数量: {len(results['modules'])}")
+    logger.info(f"函数数量: {counts['functions']}")
+    logger.info(f"结构体数量: {counts['structs']}")
+    logger.info(f"枚举数量: {counts['enums']}")
+    logger.info(f"Trait 数量: {counts['traits']}")
+    logger.info(f"Impl 块数量: {counts['impls']}")
+    logger.info(f"Unsafe 块数量: {counts['unsafe_blocks']}")
+    logger.info(f"模块数量: {counts['modules']}")
+    logger.info(f"调用边数量: {call_graph.edge_count}")
     logger.info(f"结果保存至: {output_path}")
     logger.info("=" * 60)
+
+
+def _index_current(output_path: Path) -> bool:
+    """符号索引存在且格式版本与当前一致"""
+    from processor.symbol_index import SymbolIndex
+    symbol_index = SymbolIndex.open(output_path)
+    if symbol_index is None:
+        return False
+    symbol_index.close()
+    return True
@@ -5,7 +5,6 @@ Stats 命令 - 统计信息
 import click
 from pathlib import Path
 from loguru import logger
-import json
 
 from src import vars as global_vars
 from src.utils import setup_library_config, get_output_path
@@ -32,20 +31,26 @@ def stats(library_name: str, coverage: bool):
     
     output_path = get_output_path()
     
-    # 加载分析结果
-    ast_file = output_path / "ast.json"
-    if ast_file.exists():
-        with open(ast_file, "r", encoding="utf-8") as f:
-            analysis = json.load(f)
+    # 加载分析结果（优先查询符号索引，分片格式只读取 header）
+    from processor.ast_store import AstReader
+    from processor.symbol_index import SymbolIndex
+    symbol_index = SymbolIndex.open(output_path)
+    reader = AstReader.open(output_path)
+    if symbol_index is not None or reader is not None:
+        counts = symbol_index.counts() if symbol_index is not None else reader.counts()
         
         logger.info("=" * 60)
         logger.info("代码分析统计")
         logger.info("=" * 60)
-        logger.info(f"函数: {len(analysis.get('functions', []))}")
-        logger.info(f"结构体: {len(analysis.get('structs', []))}")
-        logger.info(f"枚举: {len(analysis.get('enums', []))}")
-        logger.info(f"Trait: {len(analysis.get('traits', []))}")
-        logger.info(f"Unsafe 块: {len(analysis.get('unsafe_blocks', []))}")
+        logger.info(f"函数: {counts.get('functions', 0)}")
+        if symbol_index is not None:
+            logger.info(f"  公开函数: {symbol_index.count_functions(is_pub=True)}")
+            logger.info(f"  unsafe 函数: {symbol_index.count_functions(is_unsafe=True)}")
+            logger.info(f"  可达 unsafe 代码的公开函数: {len(symbol_index.pub_functions_reaching_unsafe())}")
+        logger.info(f"结构体: {counts.get('structs', 0)}")
+        logger.info(f"枚举: {counts.get('enums', 0)}")
+        logger.info(f"Trait: {counts.get('traits', 0)}")
+        logger.info(f"Unsafe 块: {counts.get('unsafe_blocks', 0)}")
     
     # fuzz target 统计
     fuzz_targets_dir = output_path / "fuzz_targets"
@@ -0,0 +1,191 @@
+"""
+分析结果存储
+支持单个 ast.json 文件和按条目类型分片的 JSONL 目录两种格式
+"""
+
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from .records import to_json
+from .rust_analyzer import RESULT_KEYS, merge_file_results
+
+
+AST_JSON = "ast.json"
+AST_SHARD_DIR = "ast"
+SHARD_HEADER = "header.json"
+SHARD_VERSION = 1
+
+
+class AstJsonWriter:
+    """
+    单文件格式写入器，所有结果在内存中汇总后一次写出
+    """
+
+    def __init__(self, output_path: Path):
+        """
+        初始化写入器
+
+        :param output_path: 输出目录
+        """
+        self.output_path = output_path
+        self.results = {key: [] for key in RESULT_KEYS}
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """各类条目数量"""
+        return {key: len(items) for key, items in self.results.items()}
+
+    def add(self, file_results: dict):
+        """添加单个文件的分析结果"""
+        merge_file_results(self.results, file_results)
+
+    def close(self):
+        """写出结果，并移除旧的分片格式结果"""
+        with open(self.output_path / AST_JSON, "w", encoding="utf-8") as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False, default=to_json)
+        shutil.rmtree(self.output_path / AST_SHARD_DIR, ignore_errors=True)
+
+
+class AstShardWriter:
+    """
+    分片格式写入器
+
+    每类条目一个 JSONL 分片，文件分析完成后立即追加；
+    header.json 记录各类条目数量，关闭时写入。
+    写入过程在临时目录中进行，完成后整体替换旧结果。
+    """
+
+    def __init__(self, output_path: Path):
+        """
+        初始化写入器
+
+        :param output_path: 输出目录
+        """
+        self.output_path = output_path
+        self.tmp_dir = output_path / f"{AST_SHARD_DIR}.tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        self.tmp_dir.mkdir(parents=True)
+        self.shards = {
+            key: open(self.tmp_dir / f"{key}.jsonl", "w", encoding="utf-8")
+            for key in RESULT_KEYS
+        }
+        self.counts = {key: 0 for key in RESULT_KEYS}
+
+    def add(self, file_results: dict):
+        """追加单个文件的分析结果"""
+        for key in RESULT_KEYS:
+            items = file_results.get(key, [])
+            shard = self.shards[key]
+            for item in items:
+                shard.write(json.dumps(item, ensure_ascii=False, default=to_json))
+                shard.write("\n")
+            self.counts[key] += len(items)
+
+    def close(self):
+        """写入 header 并替换旧结果"""
+        for shard in self.shards.values():
+            shard.close()
+        header = {
+            "version": SHARD_VERSION,
+            "counts": self.counts,
+        }
+        with open(self.tmp_dir / SHARD_HEADER, "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2, ensure_ascii=False)
+
+        shard_dir = self.output_path / AST_SHARD_DIR
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        self.tmp_dir.rename(shard_dir)
+        (self.output_path / AST_JSON).unlink(missing_ok=True)
+
+
+def open_writer(output_path: Path, output_format: str):
+    """
+    创建结果写入器
+
+    :param output_path: 输出目录
+    :param output_format: 输出格式（json 或 sharded）
+    :return: 写入器
+    """
+    if output_format == "sharded":
+        return AstShardWriter(output_path)
+    if output_format == "json":
+        return AstJsonWriter(output_path)
+    raise ValueError(f"不支持的输出格式: {output_format}")
+
+
+class AstReader:
+    """
+    分析结果读取器，自动识别存储格式
+
+    分片格式按需逐行读取，单文件格式首次访问时整体加载。
+    """
+
+    def __init__(self, output_path: Path):
+        """
+        初始化读取器
+
+        :param output_path: 输出目录
+        """
+        self.shard_dir = output_path / AST_SHARD_DIR
+        self.json_file = output_path / AST_JSON
+        self.sharded = (self.shard_dir / SHARD_HEADER).exists()
+        self._header = None
+        self._results = None
+
+    @classmethod
+    def open(cls, output_path: Path) -> Optional["AstReader"]:
+        """
+        打开已有的分析结果
+
+        :param output_path: 输出目录
+        :return: 读取器，不存在分析结果时返回 None
+        """
+        reader = cls(output_path)
+        if not reader.sharded and not reader.json_file.exists():
+            return None
+        return reader
+
+    def _load_json(self) -> dict:
+        if self._results is None:
+            with open(self.json_file, "r", encoding="utf-8") as f:
+                self._results = json.load(f)
+        return self._results
+
+    def counts(self) -> Dict[str, int]:
+        """
+        各类条目数量，分片格式只读取 header
+        """
+        if self.sharded:
+            if self._header is None:
+                with open(self.shard_dir / SHARD_HEADER, "r", encoding="utf-8") as f:
+                    self._header = json.load(f)
+            return self._header["counts"]
+        results = self._load_json()
+        return {key: len(results.get(key, [])) for key in RESULT_KEYS}
+
+    def iter(self, key: str) -> Iterator[dict]:
+        """
+        逐个读取某类条目
+
+        :param key: 条目类型（functions、structs 等）
+        """
+        if not self.sharded:
+            yield from self._load_json().get(key, [])
+            return
+        shard = self.shard_dir / f"{key}.jsonl"
+        if not shard.exists():
+            return
+        with open(shard, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def load(self, keys: Iterable[str] = RESULT_KEYS) -> dict:
+        """
+        读取多类条目
+
+        :param keys: 条目类型
+        :return: {条目类型: 条目列表}
+        """
+        return {key: list(self.iter(key)) for key in keys}
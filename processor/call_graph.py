@@ -0,0 +1,164 @@
+"""
+调用图
+以整数邻接数组（CSR）保存函数间的调用关系，支持快速可达性查询
+"""
+
+import json
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+
+class CallGraph:
+    """
+    函数调用图
+
+    节点编号即函数在分析结果中的顺序；节点 i 的被调用者为
+    targets[offsets[i]:offsets[i + 1]]。
+    """
+
+    def __init__(self, offsets: array, targets: array):
+        """
+        初始化调用图
+
+        :param offsets: 每个节点出边的起始下标，长度为节点数 + 1
+        :param targets: 所有出边的目标节点
+        """
+        self.offsets = offsets
+        self.targets = targets
+        self._reverse = None
+
+    @property
+    def node_count(self) -> int:
+        """节点数"""
+        return len(self.offsets) - 1
+
+    @property
+    def edge_count(self) -> int:
+        """边数"""
+        return len(self.targets)
+
+    @classmethod
+    def build(cls, functions: Iterable[dict]) -> "CallGraph":
+        """
+        根据函数的 calls 字段构建调用图
+
+        被调用者只有名称，按以下顺序解析：同一类型的同名方法、
+        同一模块的同名函数，否则连接到所有同名函数。
+
+        :param functions: 函数列表（需包含 name、owner、module、calls）
+        """
+        owners = []
+        modules = []
+        calls = []
+        by_name: Dict[str, List[int]] = {}
+        for i, func in enumerate(functions):
+            owners.append(func.get("owner", ""))
+            modules.append(func.get("module", ""))
+            calls.append(func.get("calls", []))
+            by_name.setdefault(func["name"], []).append(i)
+
+        offsets = array("I", [0])
+        targets = array("I")
+        for i, callees in enumerate(calls):
+            linked = set()
+            for callee in callees:
+                candidates = by_name.get(callee)
+                if not candidates:
+                    continue
+                resolved = [j for j in candidates if owners[i] and owners[j] == owners[i]]
+                if not resolved:
+                    resolved = [j for j in candidates if modules[j] == modules[i]]
+                if not resolved:
+                    resolved = candidates
+                linked.update(resolved)
+            linked.discard(i)
+            targets.extend(sorted(linked))
+            offsets.append(len(targets))
+        return cls(offsets, targets)
+
+    def callees(self, node: int) -> array:
+        """获取节点直接调用的函数"""
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def _reverse_graph(self) -> "CallGraph":
+        if self._reverse is None:
+            counts = array("I", [0]) * (self.node_count + 1)
+            for target in self.targets:
+                counts[target + 1] += 1
+            for i in range(self.node_count):
+                counts[i + 1] += counts[i]
+            fill = array("I", counts[:-1])
+            sources = array("I", [0]) * self.edge_count
+            for source in range(self.node_count):
+                for k in range(self.offsets[source], self.offsets[source + 1]):
+                    target = self.targets[k]
+                    sources[fill[target]] = source
+                    fill[target] += 1
+            self._reverse = CallGraph(counts, sources)
+        return self._reverse
+
+    def callers(self, node: int) -> array:
+        """获取直接调用该节点的函数"""
+        return self._reverse_graph().callees(node)
+
+    @staticmethod
+    def _bfs(graph: "CallGraph", sources: Iterable[int]) -> Set[int]:
+        visited = set(sources)
+        queue = deque(visited)
+        offsets = graph.offsets
+        targets = graph.targets
+        while queue:
+            node = queue.popleft()
+            for k in range(offsets[node], offsets[node + 1]):
+                target = targets[k]
+                if target not in visited:
+                    visited.add(target)
+                    queue.append(target)
+        return visited
+
+    def reachable_from(self, sources: Iterable[int]) -> Set[int]:
+        """
+        从给定函数出发可到达的所有函数（包含自身）
+
+        :param sources: 起始函数编号
+        """
+        return self._bfs(self, sources)
+
+    def reaching(self, targets: Iterable[int]) -> Set[int]:
+        """
+        可到达给定函数的所有函数（包含自身）
+
+        例如传入包含 unsafe 块的函数，得到所有可能执行到 unsafe 代码的函数。
+
+        :param targets: 目标函数编号
+        """
+        return self._bfs(self._reverse_graph(), targets)
+
+    def to_bytes(self) -> tuple:
+        """序列化为 (offsets, targets) 字节串"""
+        return self.offsets.tobytes(), self.targets.tobytes()
+
+    @classmethod
+    def from_bytes(cls, offsets: bytes, targets: bytes) -> "CallGraph":
+        """从 to_bytes 的结果恢复"""
+        offsets_array = array("I")
+        offsets_array.frombytes(offsets)
+        targets_array = array("I")
+        targets_array.frombytes(targets)
+        return cls(offsets_array, targets_array)
+
+    def dump(self, output_file: Path, paths: List[str]):
+        """
+        导出为便于查看的 JSON（调试用）
+
+        :param output_file: 输出文件
+        :param paths: 每个节点对应的函数限定路径
+        """
+        graph = [
+            {"id": i, "path": paths[i], "calls": list(self.callees(i))}
+            for i in range(self.node_count)
+        ]
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(graph, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,144 @@
+"""
+预处理文件清单
+记录每个源文件的内容哈希、修改时间和大小，用于增量预处理
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+from loguru import logger
+
+from .rust_analyzer import ANALYSIS_VERSION
+
+
+MANIFEST_VERSION = 1
+
+
+def hash_file(file_path: Path) -> str:
+    """
+    计算文件内容哈希
+
+    :param file_path: 文件路径
+    :return: 十六进制哈希值
+    """
+    return hashlib.blake2b(file_path.read_bytes(), digest_size=16).hexdigest()
+
+
+def snapshot(file_path: Path, stat: os.stat_result = None) -> dict:
+    """
+    读取文件的当前状态
+
+    先取修改时间再计算哈希：之后对文件的修改总会改变修改时间，下次比较时能够发现。
+    应在分析文件之前调用，记录的哈希不会比分析所用的内容更新。
+
+    :param file_path: 文件路径
+    :param stat: 已读取的文件状态（为空时重新读取）
+    :return: {"hash", "mtime", "size"}
+    """
+    stat = stat or file_path.stat()
+    return {"hash": hash_file(file_path), "mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+
+class SourceManifest:
+    """
+    源文件清单
+
+    键为相对于 crate 的文件路径，值为 {"hash", "mtime", "size"}。
+    """
+
+    def __init__(self, crate_path: Path, entries: Dict[str, dict] = None):
+        """
+        初始化清单
+
+        :param crate_path: Crate 路径
+        :param entries: 已有的清单条目
+        """
+        self.crate_path = crate_path
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, manifest_file: Path, crate_path: Path) -> "SourceManifest":
+        """
+        从文件加载清单，文件不存在或版本（含分析结果格式版本）不匹配时返回 None
+
+        :param manifest_file: 清单文件路径
+        :param crate_path: Crate 路径
+        :return: 清单对象
+        """
+        if not manifest_file.exists():
+            return None
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"读取文件清单失败 {manifest_file}: {e}")
+            return None
+        if data.get("version") != MANIFEST_VERSION or data.get("analysis_version") != ANALYSIS_VERSION:
+            return None
+        return cls(crate_path, data.get("files", {}))
+
+    def save(self, manifest_file: Path):
+        """
+        保存清单
+
+        :param manifest_file: 清单文件路径
+        """
+        data = {
+            "version": MANIFEST_VERSION,
+            "analysis_version": ANALYSIS_VERSION,
+            "files": self.entries,
+        }
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def relative(self, file_path: Path) -> str:
+        """获取相对于 crate 的路径"""
+        return str(file_path.relative_to(self.crate_path))
+
+    def record(self, file_path: Path, state: dict = None):
+        """
+        记录文件的状态
+
+        :param file_path: 文件路径
+        :param state: 分析前由 snapshot 读取的状态（为空时读取当前状态）
+        """
+        self.entries[self.relative(file_path)] = state or snapshot(file_path)
+
+    def forget(self, rel_path: str):
+        """移除文件记录"""
+        self.entries.pop(rel_path, None)
+
+    def diff(self, files: List[Path]) -> Tuple[List[Path], List[str]]:
+        """
+        比较当前文件与清单
+
+        修改时间和大小均未变化的文件直接视为未修改；否则比较内容哈希，
+        内容未变时只刷新清单中的修改时间。
+
+        :param files: 当前的源文件列表
+        :return: (新增或修改的文件, 已删除文件的相对路径)
+        """
+        changed = []
+        current = set()
+        for file_path in files:
+            rel_path = self.relative(file_path)
+            current.add(rel_path)
+            entry = self.entries.get(rel_path)
+            if entry is None:
+                changed.append(file_path)
+                continue
+
+            stat = file_path.stat()
+            if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+
+            state = snapshot(file_path, stat)
+            if state["hash"] == entry["hash"]:
+                self.record(file_path, state)
+            else:
+                changed.append(file_path)
+
+        deleted = [rel_path for rel_path in self.entries if rel_path not in current]
+        return changed, deleted
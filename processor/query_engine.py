@@ -0,0 +1,93 @@
+"""
+基于 tree-sitter Query 的条目提取引擎
+由原生代码一次性匹配所有条目，替代 Python 中的递归遍历
+"""
+
+from typing import Dict, Iterator, List, Optional
+from tree_sitter import Language, Node, Query
+
+
+# 条目的捕获名与分析结果中的键一一对应；calls 捕获函数调用中被调用的表达式
+ITEM_QUERY = """
+(function_item) @functions
+(struct_item) @structs
+(enum_item) @enums
+(trait_item) @traits
+(impl_item) @impls
+(unsafe_block) @unsafe_blocks
+(mod_item) @modules
+(call_expression function: (_) @calls)
+"""
+
+
+def _document_order(node: Node):
+    """先序遍历顺序：起始位置靠前者优先，起始相同时外层节点优先"""
+    return node.start_byte, -node.end_byte
+
+
+class ItemQuery:
+    """
+    预编译的条目查询
+
+    同一 Language 只编译一次查询，可被同一进程中的多个分析器复用。
+    """
+
+    _compiled: Dict[int, Query] = {}
+
+    def __init__(self, language: Language):
+        """
+        初始化查询
+
+        :param language: tree-sitter 语言
+        """
+        key = id(language)
+        if key not in self._compiled:
+            self._compiled[key] = Query(language, ITEM_QUERY)
+        self.query = self._compiled[key]
+
+    def captures(self, root: Node) -> Dict[str, List[Node]]:
+        """
+        匹配语法树中的所有条目
+
+        :param root: 根节点
+        :return: {结果键: 按先序遍历顺序排列的节点列表}
+        """
+        captures = self.query.captures(root)
+        for nodes in captures.values():
+            nodes.sort(key=_document_order)
+        return captures
+
+
+def iter_children(node: Node) -> Iterator[Node]:
+    """
+    使用 TreeCursor 逐个访问子节点
+
+    与 node.children 不同，不会一次性构造全部子节点列表，可以提前结束。
+    """
+    cursor = node.walk()
+    if not cursor.goto_first_child():
+        return
+    yield cursor.node
+    while cursor.goto_next_sibling():
+        yield cursor.node
+
+
+def find_child(node: Node, node_type: str) -> Optional[Node]:
+    """
+    查找第一个指定类型的子节点
+
+    :param node: 父节点
+    :param node_type: 子节点类型
+    :return: 子节点，不存在时返回 None
+    """
+    for child in iter_children(node):
+        if child.type == node_type:
+            return child
+    return None
+
+
+def node_text(node: Optional[Node], default: str = "") -> str:
+    """获取节点文本"""
+    if node is None:
+        return default
+    return node.text.decode()
@@ -0,0 +1,151 @@
+"""
+紧凑的分析结果条目
+使用 __slots__ 对象代替嵌套字典，序列化后与原有的 JSON 结构完全一致
+"""
+
+
+def _restore(cls, values: tuple):
+    record = cls.__new__(cls)
+    for name, value in zip(cls.__slots__, values):
+        object.__setattr__(record, name, value)
+    return record
+
+
+class Record:
+    """
+    条目基类
+
+    字段即 __slots__，顺序与 JSON 中键的顺序一致。
+    支持 record["name"] 和 record.get("name") 形式的只读访问，
+    以便与从 JSON 加载的字典条目混用。
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        """同 dict.get"""
+        return getattr(self, key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def __reduce__(self):
+        # 多进程分析时按字段元组传递，比默认的 slots 序列化更紧凑
+        return _restore, (self.__class__, tuple(getattr(self, name) for name in self.__slots__))
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.__reduce__() == other.__reduce__()
+
+    def to_dict(self) -> dict:
+        """转换为字典，嵌套的条目保持不变，由 to_json 递归处理"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Location(Record):
+    """源码位置（行列均从 0 开始）"""
+
+    __slots__ = ("start_row", "start_column", "end_row", "end_column")
+
+    @classmethod
+    def of(cls, node) -> "Location":
+        """从语法树节点创建"""
+        start = node.start_point
+        end = node.end_point
+        return cls(start_row=start[0], start_column=start[1],
+                   end_row=end[0], end_column=end[1])
+
+    def to_dict(self) -> dict:
+        return {
+            "start": [self.start_row, self.start_column],
+            "end": [self.end_row, self.end_column],
+        }
+
+
+class Param(Record):
+    """函数参数"""
+
+    __slots__ = ("name", "type")
+
+
+class Field(Record):
+    """结构体字段"""
+
+    __slots__ = ("name", "type", "is_pub")
+
+
+class FunctionRecord(Record):
+    """函数（包括方法）"""
+
+    __slots__ = (
+        "file", "module", "path", "name", "owner", "trait",
+        "is_pub", "is_unsafe", "contains_unsafe", "self_param",
+        "params", "return_type", "doc_comment", "location", "calls",
+    )
+
+
+class StructRecord(Record):
+    """结构体"""
+
+    __slots__ = ("file", "module", "path", "name", "is_pub", "fields", "doc_comment", "location")
+
+
+class EnumRecord(Record):
+    """枚举"""
+
+    __slots__ = ("file", "module", "path", "name", "is_pub", "variants", "doc_comment", "location")
+
+
+class TraitRecord(Record):
+    """Trait"""
+
+    __slots__ = ("file", "module", "path", "name", "is_pub", "methods", "doc_comment", "location")
+
+
+class ImplRecord(Record):
+    """impl 块"""
+
+    __slots__ = ("file", "type", "trait", "methods", "location")
+
+
+class UnsafeBlockRecord(Record):
+    """unsafe 块"""
+
+    __slots__ = ("file", "byte_range", "location")
+
+
+class ModuleRecord(Record):
+    """模块"""
+
+    __slots__ = ("file", "module", "path", "name", "is_pub", "location")
+
+
+def to_json(obj):
+    """
+    json.dump 的 default 参数，将条目序列化为原有的字典结构
+
+    用法: json.dump(results, f, default=to_json)
+    """
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def to_plain(obj):
+    """递归地将条目转换为普通字典和列表"""
+    if isinstance(obj, Record):
+        obj = obj.to_dict()
+    if isinstance(obj, dict):
+        return {key: to_plain(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [to_plain(value) for value in obj]
+    return obj
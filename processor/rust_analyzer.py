@@ -4,26 +4,69 @@ Rust 代码分析器
 """
 
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from sys import intern
+from typing import Iterable, Iterator, Tuple
 from loguru import logger
 from tree_sitter import Language, Parser, Node
 import tree_sitter_rust as ts_rust
 
+from .query_engine import ItemQuery, iter_children, find_child, node_text
+from .source import SourceText
+from .records import (
+    Location, Param, Field, FunctionRecord, StructRecord, EnumRecord,
+    TraitRecord, ImplRecord, UnsafeBlockRecord, ModuleRecord, to_plain
+)
+
+
+# 分析结果格式版本，条目字段变化时递增，旧结果将被完整重建
+ANALYSIS_VERSION = 4
+
+RESULT_KEYS = (
+    "functions",
+    "structs",
+    "enums",
+    "traits",
+    "impls",
+    "unsafe_blocks",
+    "modules",
+)
+
 
 class RustAnalyzer:
     """
     Rust 代码分析器
     """
     
-    def __init__(self, crate_path: Path):
+    ENGINES = ("query", "traverse")
+    
+    def __init__(self, crate_path: Path, engine: str = "query", compact: bool = True):
         """
         初始化分析器
         
         :param crate_path: Crate 路径
+        :param engine: 条目提取引擎（query: 预编译查询，traverse: 递归遍历）
+        :param compact: 是否以 __slots__ 条目返回结果（False 时返回普通字典）
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"不支持的提取引擎: {engine}")
         self.crate_path = crate_path
+        self.engine = engine
+        self.compact = compact
         self.language = Language(ts_rust.language())
         self.parser = Parser(self.language)
+        self.item_query = ItemQuery(self.language)
+        self.extractors = {
+            "functions": self._extract_function,
+            "structs": self._extract_struct,
+            "enums": self._extract_enum,
+            "traits": self._extract_trait,
+            "impls": self._extract_impl,
+            "unsafe_blocks": self._extract_unsafe_block,
+            "modules": self._extract_module,
+        }
     
     def analyze_file(self, file_path: Path) -> dict:
         """
@@ -33,11 +76,13 @@ class RustAnalyzer:
         :return: 分析结果
         """
         try:
-            code = file_path.read_text(encoding="utf-8")
-            tree = self.parser.parse(code.encode())
+            code = SourceText.read(file_path)
+            tree = self.parser.parse(code.data)
             
+            rel_path = file_path.relative_to(self.crate_path)
             result = {
-                "file": str(file_path.relative_to(self.crate_path)),
+                "file": intern(str(rel_path)),
+                "module": self._file_module(rel_path),
                 "functions": [],
                 "structs": [],
                 "enums": [],
@@ -47,259 +92,505 @@ class RustAnalyzer:
                 "modules": []
             }
             
-            self._traverse(tree.root_node, result, code)
-            return result
+            if self.engine == "query":
+                captures = self.item_query.captures(tree.root_node)
+            else:
+                captures = {}
+                self._traverse(tree.root_node, captures)
+            self._extract_captures(captures, result, code)
+            return result if self.compact else to_plain(result)
             
         except Exception as e:
             logger.error(f"分析文件失败 {file_path}: {e}")
             return {}
     
-    def _traverse(self, node: Node, result: dict, code: str):
+    def _traverse(self, node: Node, captures: dict):
         """
-        遍历 AST 节点
+        递归遍历 AST 节点收集条目（旧实现，保留用于对比测试）
         """
         if node.type == "function_item":
-            self._extract_function(node, result, code)
+            captures.setdefault("functions", []).append(node)
         elif node.type == "struct_item":
-            self._extract_struct(node, result, code)
+            captures.setdefault("structs", []).append(node)
         elif node.type == "enum_item":
-            self._extract_enum(node, result, code)
+            captures.setdefault("enums", []).append(node)
         elif node.type == "trait_item":
-            self._extract_trait(node, result, code)
+            captures.setdefault("traits", []).append(node)
         elif node.type == "impl_item":
-            self._extract_impl(node, result, code)
+            captures.setdefault("impls", []).append(node)
         elif node.type == "unsafe_block":
-            self._extract_unsafe_block(node, result, code)
+            captures.setdefault("unsafe_blocks", []).append(node)
         elif node.type == "mod_item":
-            self._extract_module(node, result, code)
+            captures.setdefault("modules", []).append(node)
+        elif node.type == "call_expression":
+            captures.setdefault("calls", []).append(node.child_by_field_name("function"))
         
         # 递归遍历子节点
         for child in node.children:
-            self._traverse(child, result, code)
+            self._traverse(child, captures)
+    
+    def _extract_captures(self, captures: dict, result: dict, code: SourceText):
+        """
+        从收集到的节点中提取条目，并将调用和 unsafe 块归属到所在函数
+        """
+        for key, extractor in self.extractors.items():
+            for node in captures.get(key, []):
+                extractor(node, result, code)
+        self._link_functions(captures, result)
+    
+    def _link_functions(self, captures: dict, result: dict):
+        """
+        一次线性扫描，将调用和 unsafe 块归属到最内层的所在函数
+        
+        函数、调用和 unsafe 块均已按先序遍历顺序排列，用栈维护当前位置所在的函数。
+        """
+        functions = captures.get("functions", [])
+        records = result["functions"]
+        events = [(node.start_byte, 0, node) for node in captures.get("calls", [])]
+        events += [(node.start_byte, 1, node) for node in captures.get("unsafe_blocks", [])]
+        events.sort(key=lambda event: (event[0], event[1]))
+        
+        calls = [set() for _ in functions]
+        stack = []
+        next_function = 0
+        for start_byte, kind, node in events:
+            while next_function < len(functions) and functions[next_function].start_byte <= start_byte:
+                while stack and functions[stack[-1]].end_byte <= functions[next_function].start_byte:
+                    stack.pop()
+                stack.append(next_function)
+                next_function += 1
+            while stack and functions[stack[-1]].end_byte <= start_byte:
+                stack.pop()
+            if not stack:
+                continue
+            
+            if kind == 0:
+                callee = self._get_callee_name(node)
+                if callee:
+                    calls[stack[-1]].add(intern(callee))
+            else:
+                records[stack[-1]].contains_unsafe = True
+        
+        for record, callees in zip(records, calls):
+            record.calls = sorted(callees)
+    
+    def _get_callee_name(self, node: Node) -> str:
+        """获取调用表达式中被调用函数的名称"""
+        while node is not None and node.type == "generic_function":
+            node = node.child_by_field_name("function")
+        if node is None:
+            return ""
+        if node.type == "identifier":
+            return node_text(node)
+        if node.type == "scoped_identifier":
+            return node_text(node.child_by_field_name("name"))
+        if node.type == "field_expression":
+            return node_text(node.child_by_field_name("field"))
+        return ""
     
-    def _extract_function(self, node: Node, result: dict, code: str):
+    def _extract_function(self, node: Node, result: dict, code: SourceText):
         """提取函数信息"""
-        func_info = {
-            "name": self._get_name(node),
-            "is_pub": self._is_pub(node),
-            "is_unsafe": self._is_unsafe(node),
-            "params": self._get_params(node),
-            "return_type": self._get_return_type(node),
-            "doc_comment": self._get_doc_comment(node, code),
-            "location": {
-                "start": node.start_point,
-                "end": node.end_point
-            }
-        }
+        name = intern(self._get_name(node))
+        module = self._get_module(node, result)
+        owner, trait = self._get_method_owner(node)
+        path = f"{module}::{owner}::{name}" if owner else f"{module}::{name}"
+        func_info = FunctionRecord(
+            file=result["file"],
+            module=module,
+            path=path,
+            name=name,
+            owner=intern(owner),
+            trait=intern(trait),
+            is_pub=self._is_pub(node),
+            is_unsafe=self._is_unsafe(node),
+            contains_unsafe=False,
+            self_param=intern(self._get_self_param(node)),
+            params=self._get_params(node),
+            return_type=intern(self._get_return_type(node)),
+            doc_comment=self._get_doc_comment(node, code),
+            location=Location.of(node),
+            calls=[]
+        )
         result["functions"].append(func_info)
     
-    def _extract_struct(self, node: Node, result: dict, code: str):
+    def _extract_struct(self, node: Node, result: dict, code: SourceText):
         """提取结构体信息"""
-        struct_info = {
-            "name": self._get_name(node),
-            "is_pub": self._is_pub(node),
-            "fields": self._get_fields(node),
-            "doc_comment": self._get_doc_comment(node, code),
-            "location": {
-                "start": node.start_point,
-                "end": node.end_point
-            }
-        }
+        name = intern(self._get_name(node))
+        module = self._get_module(node, result)
+        struct_info = StructRecord(
+            file=result["file"],
+            module=module,
+            path=f"{module}::{name}",
+            name=name,
+            is_pub=self._is_pub(node),
+            fields=self._get_fields(node),
+            doc_comment=self._get_doc_comment(node, code),
+            location=Location.of(node)
+        )
         result["structs"].append(struct_info)
     
-    def _extract_enum(self, node: Node, result: dict, code: str):
+    def _extract_enum(self, node: Node, result: dict, code: SourceText):
         """提取枚举信息"""
-        enum_info = {
-            "name": self._get_name(node),
-            "is_pub": self._is_pub(node),
-            "variants": self._get_enum_variants(node),
-            "doc_comment": self._get_doc_comment(node, code),
-            "location": {
-                "start": node.start_point,
-                "end": node.end_point
-            }
-        }
+        name = intern(self._get_name(node))
+        module = self._get_module(node, result)
+        enum_info = EnumRecord(
+            file=result["file"],
+            module=module,
+            path=f"{module}::{name}",
+            name=name,
+            is_pub=self._is_pub(node),
+            variants=self._get_enum_variants(node),
+            doc_comment=self._get_doc_comment(node, code),
+            location=Location.of(node)
+        )
         result["enums"].append(enum_info)
     
-    def _extract_trait(self, node: Node, result: dict, code: str):
+    def _extract_trait(self, node: Node, result: dict, code: SourceText):
         """提取 trait 信息"""
-        trait_info = {
-            "name": self._get_name(node),
-            "is_pub": self._is_pub(node),
-            "methods": self._get_trait_methods(node),
-            "doc_comment": self._get_doc_comment(node, code),
-            "location": {
-                "start": node.start_point,
-                "end": node.end_point
-            }
-        }
+        name = intern(self._get_name(node))
+        module = self._get_module(node, result)
+        trait_info = TraitRecord(
+            file=result["file"],
+            module=module,
+            path=f"{module}::{name}",
+            name=name,
+            is_pub=self._is_pub(node),
+            methods=self._get_methods(node),
+            doc_comment=self._get_doc_comment(node, code),
+            location=Location.of(node)
+        )
         result["traits"].append(trait_info)
     
-    def _extract_impl(self, node: Node, result: dict, code: str):
+    def _extract_impl(self, node: Node, result: dict, code: SourceText):
         """提取 impl 块信息"""
-        impl_info = {
-            "type": self._get_impl_type(node),
-            "trait": self._get_impl_trait(node),
-            "methods": self._get_impl_methods(node),
-            "location": {
-                "start": node.start_point,
-                "end": node.end_point
-            }
-        }
+        impl_info = ImplRecord(
+            file=result["file"],
+            type=intern(self._get_type_name(node.child_by_field_name("type"))),
+            trait=intern(node_text(node.child_by_field_name("trait"))),
+            methods=self._get_methods(node),
+            location=Location.of(node)
+        )
         result["impls"].append(impl_info)
     
-    def _extract_unsafe_block(self, node: Node, result: dict, code: str):
+    def _extract_unsafe_block(self, node: Node, result: dict, code: SourceText):
         """提取 unsafe 块信息"""
-        unsafe_info = {
-            "code": code[node.start_byte:node.end_byte],
-            "location": {
-                "start": node.start_point,
-                "end": node.end_point
-            }
-        }
+        unsafe_info = UnsafeBlockRecord(
+            file=result["file"],
+            byte_range=[node.start_byte, node.end_byte],
+            location=Location.of(node)
+        )
         result["unsafe_blocks"].append(unsafe_info)
     
-    def _extract_module(self, node: Node, result: dict, code: str):
+    def _extract_module(self, node: Node, result: dict, code: SourceText):
         """提取模块信息"""
-        mod_info = {
-            "name": self._get_name(node),
-            "is_pub": self._is_pub(node),
-            "location": {
-                "start": node.start_point,
-                "end": node.end_point
-            }
-        }
+        name = intern(self._get_name(node))
+        module = self._get_module(node, result)
+        mod_info = ModuleRecord(
+            file=result["file"],
+            module=module,
+            path=f"{module}::{name}",
+            name=name,
+            is_pub=self._is_pub(node),
+            location=Location.of(node)
+        )
         result["modules"].append(mod_info)
     
+    def _file_module(self, rel_path: Path) -> str:
+        """
+        根据文件路径推导模块路径
+        
+        src/lib.rs -> crate，src/a/mod.rs -> crate::a，src/a/b.rs -> crate::a::b
+        """
+        parts = list(rel_path.with_suffix("").parts)
+        # 去掉源码根目录（如 src）
+        if len(parts) > 1:
+            parts = parts[1:]
+        if parts and parts[-1] in ("lib", "main", "mod"):
+            parts = parts[:-1]
+        return intern("::".join(["crate"] + parts))
+    
+    def _get_module(self, node: Node, result: dict) -> str:
+        """获取条目所在的模块路径（文件模块加上外层内联 mod）"""
+        names = []
+        parent = node.parent
+        while parent is not None:
+            if parent.type == "mod_item":
+                names.append(self._get_name(parent))
+            parent = parent.parent
+        if not names:
+            return result["module"]
+        return intern("::".join([result["module"]] + names[::-1]))
+    
     def _get_name(self, node: Node) -> str:
         """获取名称"""
-        for child in node.children:
-            if child.type == "identifier":
-                return child.text.decode()
-        return ""
+        return node_text(node.child_by_field_name("name"))
     
     def _is_pub(self, node: Node) -> bool:
         """检查是否为公开"""
-        for child in node.children:
-            if child.type == "visibility_modifier":
-                return child.text.decode() == "pub"
-        return False
+        # 可见性修饰符总是条目的第一个子节点
+        first = node.child(0)
+        return (first is not None and first.type == "visibility_modifier"
+                and first.text == b"pub")
     
     def _is_unsafe(self, node: Node) -> bool:
         """检查是否为 unsafe"""
-        for child in node.children:
-            if child.type == "unsafe":
-                return True
-        return False
+        modifiers = find_child(node, "function_modifiers")
+        if modifiers is None:
+            return False
+        return find_child(modifiers, "unsafe") is not None
     
     def _get_params(self, node: Node) -> list:
         """获取函数参数"""
         params = []
-        for child in node.children:
-            if child.type == "parameters":
-                for param in child.children:
-                    if param.type == "parameter":
-                        params.append({
-                            "name": self._get_param_name(param),
-                            "type": self._get_param_type(param)
-                        })
+        parameters = node.child_by_field_name("parameters")
+        if parameters is None:
+            return params
+        for param in parameters.named_children:
+            if param.type == "parameter":
+                params.append(Param(
+                    name=intern(self._get_param_name(param)),
+                    type=intern(self._get_param_type(param))
+                ))
         return params
     
     def _get_param_name(self, param_node: Node) -> str:
         """获取参数名"""
-        for child in param_node.children:
-            if child.type == "identifier":
-                return child.text.decode()
-        return ""
+        return node_text(param_node.child_by_field_name("pattern"))
     
     def _get_param_type(self, param_node: Node) -> str:
         """获取参数类型"""
-        for i, child in enumerate(param_node.children):
-            if child.type == ":":
-                if i + 1 < len(param_node.children):
-                    return param_node.children[i + 1].text.decode()
-        return ""
+        return node_text(param_node.child_by_field_name("type"))
     
     def _get_return_type(self, node: Node) -> str:
         """获取返回类型"""
-        for child in node.children:
-            if child.type == "->":
-                next_sibling = child.next_sibling
-                if next_sibling:
-                    return next_sibling.text.decode()
-        return "()"
+        return node_text(node.child_by_field_name("return_type"), "()")
     
     def _get_fields(self, node: Node) -> list:
         """获取结构体字段"""
         fields = []
-        for child in node.children:
-            if child.type == "field_declaration_list":
-                for field in child.children:
-                    if field.type == "field_declaration":
-                        fields.append({
-                            "name": self._get_name(field),
-                            "type": self._get_field_type(field),
-                            "is_pub": self._is_pub(field)
-                        })
+        body = node.child_by_field_name("body")
+        if body is None:
+            return fields
+        if body.type == "field_declaration_list":
+            for field in body.named_children:
+                if field.type == "field_declaration":
+                    fields.append(Field(
+                        name=intern(self._get_name(field)),
+                        type=intern(self._get_field_type(field)),
+                        is_pub=self._is_pub(field)
+                    ))
+        elif body.type == "ordered_field_declaration_list":
+            # 元组结构体，字段名为下标
+            is_pub = False
+            for child in iter_children(body):
+                if child.type == "visibility_modifier":
+                    is_pub = child.text == b"pub"
+                elif child.is_named and child.type not in ("attribute_item", "line_comment", "block_comment"):
+                    fields.append(Field(
+                        name=intern(str(len(fields))),
+                        type=intern(node_text(child)),
+                        is_pub=is_pub
+                    ))
+                    is_pub = False
         return fields
     
     def _get_field_type(self, field_node: Node) -> str:
         """获取字段类型"""
-        for child in field_node.children:
-            if child.type == ":":
-                next_sibling = child.next_sibling
-                if next_sibling:
-                    return next_sibling.text.decode()
-        return ""
+        return node_text(field_node.child_by_field_name("type"))
     
     def _get_enum_variants(self, node: Node) -> list:
         """获取枚举变体"""
         variants = []
-        for child in node.children:
-            if child.type == "enum_variant_list":
-                for variant in child.children:
-                    if variant.type == "enum_variant":
-                        variants.append(self._get_name(variant))
+        body = node.child_by_field_name("body")
+        if body is None:
+            return variants
+        for variant in body.named_children:
+            if variant.type == "enum_variant":
+                variants.append(self._get_name(variant))
         return variants
     
-    def _get_trait_methods(self, node: Node) -> list:
-        """获取 trait 方法"""
-        # 简化实现
-        return []
+    def _get_methods(self, node: Node) -> list:
+        """获取 impl 或 trait 中定义的方法名"""
+        body = node.child_by_field_name("body")
+        if body is None:
+            return []
+        return [
+            self._get_name(child) for child in body.named_children
+            if child.type in ("function_item", "function_signature_item")
+        ]
     
-    def _get_impl_type(self, node: Node) -> str:
-        """获取 impl 的类型"""
-        for child in node.children:
-            if child.type == "type_identifier":
-                return child.text.decode()
-        return ""
+    def _get_type_name(self, node: Node) -> str:
+        """获取类型名（去掉泛型参数和路径前缀）"""
+        if node is not None and node.type == "generic_type":
+            node = node.child_by_field_name("type")
+        if node is not None and node.type == "scoped_type_identifier":
+            node = node.child_by_field_name("name")
+        return node_text(node)
     
-    def _get_impl_trait(self, node: Node) -> str:
-        """获取 impl 的 trait"""
-        for child in node.children:
-            if child.type == "for":
-                next_sibling = child.next_sibling
-                if next_sibling:
-                    return next_sibling.text.decode()
-        return ""
+    def _get_method_owner(self, node: Node) -> tuple:
+        """
+        获取方法所属的类型和 trait
+        
+        :return: (所属类型或 trait 名, 实现的 trait)，普通函数返回 ("", "")
+        """
+        parent = node.parent
+        if parent is None or parent.type != "declaration_list":
+            return "", ""
+        container = parent.parent
+        if container.type == "impl_item":
+            return (self._get_type_name(container.child_by_field_name("type")),
+                    node_text(container.child_by_field_name("trait")))
+        if container.type == "trait_item":
+            trait = self._get_name(container)
+            return trait, trait
+        return "", ""
     
-    def _get_impl_methods(self, node: Node) -> list:
-        """获取 impl 方法"""
-        # 简化实现
-        return []
+    def _get_self_param(self, node: Node) -> str:
+        """获取方法的 self 参数（如 &self、&mut self），非方法返回空字符串"""
+        parameters = node.child_by_field_name("parameters")
+        if parameters is None:
+            return ""
+        return node_text(find_child(parameters, "self_parameter"))
     
-    def _get_doc_comment(self, node: Node, code: str) -> str:
-        """获取文档注释"""
-        # 查找节点前的注释
-        start_line = node.start_point[0]
-        lines = code.split('\n')
+    def _get_doc_comment(self, node: Node, code: SourceText) -> str:
+        """
+        获取文档注释
         
+        向前遍历条目的兄弟节点，收集 ///、/** */ 和 #[doc = ...]，
+        跳过其他属性和普通注释，遇到其他节点时停止。
+        """
         doc_lines = []
-        for i in range(start_line - 1, -1, -1):
-            line = lines[i].strip()
-            if line.startswith("///") or line.startswith("//!"):
-                doc_lines.insert(0, line)
-            elif line:
+        sibling = node.prev_sibling
+        while sibling is not None:
+            if sibling.type == "line_comment":
+                text = code.slice(sibling.start_byte, sibling.end_byte).strip()
+                if text.startswith("///") and not text.startswith("////"):
+                    doc_lines.append(text)
+            elif sibling.type == "block_comment":
+                text = code.slice(sibling.start_byte, sibling.end_byte).strip()
+                if text.startswith("/**") and not text.startswith("/***") and text != "/**/":
+                    doc_lines.append(text)
+            elif sibling.type == "attribute_item":
+                attribute = sibling.named_children[0] if sibling.named_child_count else None
+                path = attribute.named_children[0] if attribute and attribute.named_child_count else None
+                if path is not None and path.type == "identifier" and path.text == b"doc":
+                    doc_lines.append(code.slice(sibling.start_byte, sibling.end_byte).strip())
+            else:
                 break
+            sibling = sibling.prev_sibling
         
+        doc_lines.reverse()
         return '\n'.join(doc_lines)
+
+
+# 每个 worker 进程持有一个 RustAnalyzer（以及其中的 Parser）
+_worker_analyzer: RustAnalyzer = None
+
+
+def _init_worker(crate_path: Path, compact: bool = True):
+    """初始化 worker 进程的分析器"""
+    global _worker_analyzer
+    _worker_analyzer = RustAnalyzer(crate_path, compact=compact)
+
+
+def _analyze_in_worker(file_path: Path) -> dict:
+    """在 worker 进程中分析单个文件"""
+    return _worker_analyzer.analyze_file(file_path)
+
+
+def resolve_jobs(jobs: int) -> int:
+    """
+    解析并行进程数
+
+    :param jobs: 进程数（0 表示使用 CPU 核心数）
+    :return: 实际进程数
+    """
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def analyze_files(crate_path: Path, files: Iterable[Path],
+                  jobs: int = 1, compact: bool = True) -> Iterator[Tuple[Path, dict]]:
+    """
+    分析多个 Rust 文件
+
+    结果按照输入文件的顺序产出，与并行度无关，保证输出确定。
+
+    :param crate_path: Crate 路径
+    :param files: 文件列表
+    :param jobs: 并行进程数（1 表示串行，0 表示使用 CPU 核心数）
+    :param compact: 是否以 __slots__ 条目返回结果（见 RustAnalyzer）
+    :return: (文件路径, 分析结果) 迭代器
+    """
+    files = list(files)
+    jobs = min(resolve_jobs(jobs), max(len(files), 1))
+
+    if jobs == 1:
+        analyzer = RustAnalyzer(crate_path, compact=compact)
+        for file_path in files:
+            yield file_path, analyzer.analyze_file(file_path)
+        return
+
+    # 小块分发以均衡负载，map 保证结果顺序与输入一致
+    chunksize = max(1, len(files) // (jobs * 8))
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(crate_path, compact)
+    ) as executor:
+        yield from zip(files, executor.map(_analyze_in_worker, files, chunksize=chunksize))
+
+
+def merge_file_results(results: dict, file_results: dict):
+    """
+    将单个文件的分析结果合并到总结果中
+
+    :param results: 总结果
+    :param file_results: 单个文件的分析结果
+    """
+    for key in RESULT_KEYS:
+        results[key].extend(file_results.get(key, []))
+
+
+def group_results_by_file(results: dict) -> dict:
+    """
+    按文件对分析结果分组，保持各文件内条目的原有顺序
+
+    :param results: 总结果
+    :return: {文件相对路径: 单个文件的分析结果}
+    """
+    grouped = {}
+    for key in RESULT_KEYS:
+        for item in results.get(key, []):
+            file_results = grouped.setdefault(item["file"], {k: [] for k in RESULT_KEYS})
+            file_results[key].append(item)
+    return grouped
+
+
+def _last_segment(type_name: str) -> str:
+    """去掉路径和泛型参数，如 fmt::Display -> Display，From<u8> -> From"""
+    return type_name.split("<", 1)[0].rsplit("::", 1)[-1].strip()
+
+
+def trait_methods_to_publish(functions: Iterable, types: Iterable) -> list:
+    """
+    找出应视为公开的 trait 方法
+
+    trait 中声明的方法和 trait 实现中的方法没有 pub 关键字，可见性与 trait 和所属类型相同：
+    两者都公开时视为公开。不在本 crate 中定义的 trait 和类型（如 std 的 Display）视为公开，
+    同名定义中有一个公开即视为公开。
+
+    :param functions: 函数信息
+    :param types: 结构体、枚举和 trait 信息
+    :return: is_pub 为 False 但应视为公开的方法
+    """
+    defined = {}
+    for item in types:
+        defined[item["name"]] = defined.get(item["name"], False) or bool(item["is_pub"])
+    return [
+        func for func in functions
+        if func.get("trait") and not func["is_pub"]
+        and defined.get(_last_segment(func["owner"]), True)
+        and defined.get(_last_segment(func["trait"]), True)
+    ]
@@ -0,0 +1,106 @@
+"""
+源文件文本访问
+"""
+
+import mmap
+from collections import OrderedDict
+from pathlib import Path
+
+
+class SourceText:
+    """
+    单个源文件的原始字节
+
+    tree-sitter 的节点位置是字节偏移，直接按字节切片，
+    避免对每个条目重复解码或按行切分整个文件。
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        """
+        初始化源文件文本
+
+        :param data: 文件内容
+        """
+        self.data = data
+
+    @classmethod
+    def read(cls, file_path: Path) -> "SourceText":
+        """读取文件"""
+        return cls(file_path.read_bytes())
+
+    def slice(self, start_byte: int, end_byte: int) -> str:
+        """
+        获取字节范围内的文本
+
+        :param start_byte: 起始字节偏移
+        :param end_byte: 结束字节偏移
+        :return: 文本
+        """
+        return self.data[start_byte:end_byte].decode("utf-8", errors="replace")
+
+
+class SourceMap:
+    """
+    按需读取源文件片段
+
+    分析结果中只保存文件和字节范围，需要文本时通过内存映射读取，
+    最近使用的映射会被缓存复用。
+    """
+
+    def __init__(self, crate_path: Path, max_open: int = 64):
+        """
+        初始化
+
+        :param crate_path: Crate 路径
+        :param max_open: 最多同时保持的映射数
+        """
+        self.crate_path = crate_path
+        self.max_open = max_open
+        self._maps = OrderedDict()
+
+    def _map(self, rel_path: str):
+        view = self._maps.get(rel_path)
+        if view is not None:
+            self._maps.move_to_end(rel_path)
+            return view
+
+        with open(self.crate_path / rel_path, "rb") as f:
+            if f.seek(0, 2) == 0:
+                view = b""
+            else:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[rel_path] = view
+        if len(self._maps) > self.max_open:
+            _, oldest = self._maps.popitem(last=False)
+            if isinstance(oldest, mmap.mmap):
+                oldest.close()
+        return view
+
+    def read(self, rel_path: str, start_byte: int, end_byte: int) -> str:
+        """
+        读取文件中的字节范围
+
+        :param rel_path: 相对于 crate 的文件路径
+        :param start_byte: 起始字节偏移
+        :param end_byte: 结束字节偏移
+        :return: 文本
+        """
+        return self._map(rel_path)[start_byte:end_byte].decode("utf-8", errors="replace")
+
+    def code_of(self, item: dict) -> str:
+        """
+        获取条目对应的源代码（条目需包含 file 和 byte_range）
+
+        :param item: 分析结果中的条目，如 unsafe 块
+        """
+        start_byte, end_byte = item["byte_range"]
+        return self.read(item["file"], start_byte, end_byte)
+
+    def close(self):
+        """关闭所有映射"""
+        for view in self._maps.values():
+            if isinstance(view, mmap.mmap):
+                view.close()
+        self._maps.clear()
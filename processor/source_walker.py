@@ -0,0 +1,299 @@
+"""
+源文件收集
+按目录剪枝地遍历源码树，支持 gitignore 风格的排除规则，
+以及从 crate 根沿 mod 声明只收集目标模块
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from loguru import logger
+from tree_sitter import Language, Parser, Query
+import tree_sitter_rust as ts_rust
+
+
+# 总是跳过的目录（只匹配 crate 根目录下的，src/target/ 这样的模块目录不受影响）
+DEFAULT_EXCLUDES = ("/target/", "/.git/")
+
+# 模块声明
+MOD_QUERY = """
+(mod_item name: (identifier) @name) @mod
+"""
+
+CRATE_ROOTS = ("lib.rs", "main.rs")
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """将单条 glob 转换为正则表达式"""
+    regex = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            regex.append("[^/]*")
+        elif c == "?":
+            regex.append("[^/]")
+        else:
+            regex.append(re.escape(c))
+        i += 1
+    return "".join(regex)
+
+
+class ExcludeMatcher:
+    """
+    gitignore 风格的排除规则
+
+    - 不含 / 的规则匹配任意层级的同名文件或目录，如 benches、*.generated.rs
+    - 含 / 的规则相对于 crate 根目录匹配，如 /vendor、src/bin
+    - 以 / 结尾的规则只匹配目录
+    - 以 ! 开头的规则重新包含之前被排除的路径
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        初始化
+
+        :param patterns: 排除规则
+        """
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith("#"):
+                continue
+            negate = pattern.startswith("!")
+            if negate:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if "/" in pattern:
+                regex = _glob_to_regex(pattern.lstrip("/"))
+            else:
+                regex = "(?:.*/)?" + _glob_to_regex(pattern)
+            self.rules.append((re.compile(regex + "$"), dir_only, negate))
+
+    def excluded(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        判断路径是否被排除
+
+        :param rel_path: 相对于 crate 根目录、以 / 分隔的路径
+        :param is_dir: 是否为目录
+        """
+        excluded = False
+        for regex, dir_only, negate in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                excluded = not negate
+        return excluded
+
+
+def walk_rust_files(crate_path: Path, root: Path, matcher: ExcludeMatcher) -> List[Path]:
+    """
+    遍历目录收集 .rs 文件，被排除的目录不会进入
+
+    :param crate_path: Crate 路径（排除规则的基准目录）
+    :param root: 开始遍历的目录
+    :param matcher: 排除规则
+    :return: 按路径排序的文件列表
+    """
+    files = []
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    path = Path(entry.path)
+                    rel_path = path.relative_to(crate_path).as_posix()
+                    if entry.is_dir(follow_symlinks=False):
+                        if not matcher.excluded(rel_path, True):
+                            stack.append(path)
+                    elif entry.name.endswith(".rs") and entry.is_file():
+                        if not matcher.excluded(rel_path, False):
+                            files.append(path)
+        except OSError as e:
+            logger.warning(f"无法读取目录 {directory}: {e}")
+    return sorted(files)
+
+
+class ModuleWalker:
+    """
+    从 crate 根文件沿 mod 声明收集模块文件
+    """
+
+    def __init__(self, crate_path: Path, matcher: ExcludeMatcher, target_modules: List[str]):
+        """
+        初始化
+
+        :param crate_path: Crate 路径
+        :param matcher: 排除规则
+        :param target_modules: 目标模块路径（如 de、value::ser），相对于 crate 根模块
+        """
+        self.crate_path = crate_path
+        self.matcher = matcher
+        self.targets = [tuple(t.split("::")) for t in target_modules]
+        self.language = Language(ts_rust.language())
+        self.parser = Parser(self.language)
+        self.query = Query(self.language, MOD_QUERY)
+
+    def _wanted(self, module: tuple) -> tuple:
+        """
+        :return: (是否收集该模块的文件, 是否需要继续向下查找)
+        """
+        if not self.targets:
+            return True, True
+        for target in self.targets:
+            if module[:len(target)] == target:
+                return True, True
+        descend = any(target[:len(module)] == module for target in self.targets)
+        return False, descend
+
+    def walk(self, root_file: Path) -> List[Path]:
+        """
+        收集模块文件
+
+        :param root_file: crate 根文件（lib.rs 或 main.rs）
+        :return: 文件列表
+        """
+        files = []
+        visited: Set[Path] = set()
+        self._visit(root_file, (), root_file.parent, files, visited)
+        return sorted(files)
+
+    def _visit(self, file_path: Path, module: tuple, mod_dir: Path,
+               files: List[Path], visited: Set[Path]):
+        """
+        访问模块文件
+
+        :param module: 该文件对应的模块路径
+        :param mod_dir: 子模块文件所在目录
+        """
+        file_path = file_path.resolve()
+        if file_path in visited:
+            return
+        visited.add(file_path)
+
+        try:
+            rel_path = file_path.relative_to(self.crate_path.resolve()).as_posix()
+        except ValueError:
+            # #[path] 可以指向 crate 目录之外的文件，分析结果以 crate 内的相对路径记录，无法包含
+            logger.warning(f"模块 {'::'.join(module)} 的文件位于 crate 目录之外，跳过: {file_path}")
+            return
+        if self.matcher.excluded(rel_path, False):
+            return
+        collect, _ = self._wanted(module)
+        if collect:
+            files.append(self.crate_path / rel_path)
+
+        tree = self.parser.parse(file_path.read_bytes())
+        captures = self.query.captures(tree.root_node)
+        for node in captures.get("mod", []):
+            inline_names = self._inline_parents(node)
+            name = node.child_by_field_name("name").text.decode()
+            child_module = module + tuple(inline_names) + (name,)
+            _, descend = self._wanted(child_module)
+            if not descend:
+                continue
+            # 内联模块中的条目已包含在当前文件中
+            if node.child_by_field_name("body") is not None:
+                continue
+
+            child_file, by_path_attr = self._resolve(node, file_path, mod_dir, inline_names, name)
+            if child_file is None:
+                logger.debug(f"未找到模块文件: {'::'.join(child_module)}")
+                continue
+            # mod.rs 和 #[path] 指定的文件，其子模块位于同一目录
+            if child_file.name == "mod.rs" or by_path_attr:
+                next_dir = child_file.parent
+            else:
+                next_dir = child_file.parent / child_file.stem
+            self._visit(child_file, child_module, next_dir, files, visited)
+
+    def _inline_parents(self, node) -> List[str]:
+        """获取外层内联 mod 的名称"""
+        names = []
+        parent = node.parent
+        while parent is not None:
+            if parent.type == "mod_item":
+                names.append(parent.child_by_field_name("name").text.decode())
+            parent = parent.parent
+        return names[::-1]
+
+    def _path_attr(self, node) -> Optional[str]:
+        """获取 #[path = "..."] 属性的值"""
+        sibling = node.prev_named_sibling
+        while sibling is not None and sibling.type in ("attribute_item", "line_comment", "block_comment"):
+            text = sibling.text.decode()
+            match = re.match(r'#\[\s*path\s*=\s*"([^"]+)"\s*\]', text)
+            if match:
+                return match.group(1)
+            sibling = sibling.prev_named_sibling
+        return None
+
+    def _resolve(self, node, file_path: Path, mod_dir: Path,
+                 inline_names: List[str], name: str) -> tuple:
+        """
+        按 Rust 的模块文件规则定位子模块文件
+
+        :return: (文件路径, 是否由 #[path] 指定)，未找到时文件路径为 None
+        """
+        path_attr = self._path_attr(node)
+        if path_attr:
+            # 不在内联模块中时，#[path] 相对于当前文件所在目录
+            base_dir = mod_dir.joinpath(*inline_names) if inline_names else file_path.parent
+            candidate = base_dir / path_attr
+            return (candidate if candidate.is_file() else None), True
+
+        child_dir = mod_dir.joinpath(*inline_names)
+        for candidate in (child_dir / f"{name}.rs", child_dir / name / "mod.rs"):
+            if candidate.is_file():
+                return candidate, False
+        return None, False
+
+
+def collect_source_files(crate_path: Path, library_config: dict) -> List[Path]:
+    """
+    根据库配置收集要分析的源文件
+
+    使用 source_paths、exclude_paths、test_paths 和 target_modules：
+    测试路径和排除路径在目录层级剪枝；设置了 target_modules 时，
+    从各源码路径下的 lib.rs/main.rs 沿 mod 声明只收集目标模块。
+
+    :param crate_path: Crate 路径
+    :param library_config: 库配置
+    :return: 文件列表
+    """
+    patterns = list(DEFAULT_EXCLUDES)
+    patterns += library_config.get("exclude_paths", [])
+    patterns += [f"/{p.strip('/')}/" for p in library_config.get("test_paths", [])]
+    matcher = ExcludeMatcher(patterns)
+    target_modules = library_config.get("target_modules", [])
+
+    files = []
+    for src_path in library_config.get("source_paths", ["src"]):
+        full_path = crate_path / src_path
+        if not full_path.exists():
+            logger.warning(f"源代码路径不存在: {full_path}")
+            continue
+
+        logger.info(f"分析路径: {full_path}")
+        if target_modules:
+            root_file = next((full_path / name for name in CRATE_ROOTS if (full_path / name).is_file()), None)
+            if root_file is not None:
+                files.extend(ModuleWalker(crate_path, matcher, target_modules).walk(root_file))
+                continue
+            logger.warning(f"{full_path} 下未找到 crate 根文件，忽略 target_modules")
+        files.extend(walk_rust_files(crate_path, full_path, matcher))
+
+    # 多个源码路径可能重叠
+    return list(dict.fromkeys(files))
@@ -0,0 +1,413 @@
+"""
+符号索引
+基于 SQLite 持久化函数与类型定义，支持按名称、路径、可见性和 unsafe 查询
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .call_graph import CallGraph
+from .records import to_json
+from .rust_analyzer import RESULT_KEYS, trait_methods_to_publish
+
+
+SYMBOL_DB = "symbols.db"
+SCHEMA_VERSION = 4
+
+# 类型定义表中的条目类型
+TYPE_KINDS = {
+    "structs": "struct",
+    "enums": "enum",
+    "traits": "trait",
+}
+
+SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE functions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    file TEXT NOT NULL,
+    module TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    is_pub INTEGER NOT NULL,
+    is_unsafe INTEGER NOT NULL,
+    contains_unsafe INTEGER NOT NULL,
+    return_type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE params (
+    function_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (function_id, position)
+);
+CREATE TABLE call_graph (
+    offsets BLOB NOT NULL,
+    targets BLOB NOT NULL
+);
+CREATE TABLE types (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    file TEXT NOT NULL,
+    module TEXT NOT NULL,
+    is_pub INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE impls (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    trait TEXT NOT NULL,
+    file TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX idx_functions_name ON functions(name);
+CREATE INDEX idx_functions_path ON functions(path);
+CREATE INDEX idx_functions_file ON functions(file);
+CREATE INDEX idx_functions_module ON functions(module);
+CREATE INDEX idx_functions_owner ON functions(owner);
+CREATE INDEX idx_functions_flags ON functions(is_pub, is_unsafe);
+CREATE INDEX idx_functions_return_type ON functions(return_type);
+CREATE INDEX idx_params_type ON params(type);
+CREATE INDEX idx_types_name ON types(name, kind);
+CREATE INDEX idx_impls_type ON impls(type);
+"""
+
+
+class SymbolIndexWriter:
+    """
+    符号索引写入器
+
+    在临时数据库中构建索引，关闭时替换旧索引。
+    """
+
+    def __init__(self, output_path: Path):
+        """
+        初始化写入器
+
+        :param output_path: 输出目录
+        """
+        self.db_file = output_path / SYMBOL_DB
+        self.tmp_file = output_path / f"{SYMBOL_DB}.tmp"
+        self.tmp_file.unlink(missing_ok=True)
+        self.conn = sqlite3.connect(self.tmp_file)
+        self.conn.executescript(SCHEMA)
+        self.counts = {key: 0 for key in RESULT_KEYS}
+        self.function_id = 0
+        self.type_id = 0
+        self.impl_id = 0
+        # 构建调用图所需的最少字段
+        self.call_info = []
+        # 没有 pub 关键字的 trait 方法，可见性在全部类型定义写入后确定
+        self.trait_methods = []
+
+    def add(self, file_results: dict):
+        """添加单个文件的分析结果"""
+        functions = []
+        params = []
+        for func in file_results.get("functions", []):
+            functions.append((
+                self.function_id,
+                func["name"],
+                func["path"],
+                func["file"],
+                func["module"],
+                func["owner"],
+                int(func["is_pub"]),
+                int(func["is_unsafe"]),
+                int(func["contains_unsafe"]),
+                func["return_type"],
+                json.dumps(func, ensure_ascii=False, default=to_json),
+            ))
+            self.call_info.append({
+                "name": func["name"],
+                "owner": func["owner"],
+                "module": func["module"],
+                "calls": func["calls"],
+            })
+            if func.get("trait") and not func["is_pub"]:
+                self.trait_methods.append({
+                    "id": self.function_id,
+                    "owner": func["owner"],
+                    "trait": func["trait"],
+                    "is_pub": False,
+                })
+            for position, param in enumerate(func["params"]):
+                params.append((self.function_id, position, param["name"], param["type"]))
+            self.function_id += 1
+        self.conn.executemany("INSERT INTO functions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", functions)
+        self.conn.executemany("INSERT INTO params VALUES (?, ?, ?, ?)", params)
+
+        types = []
+        for key, kind in TYPE_KINDS.items():
+            for item in file_results.get(key, []):
+                types.append((
+                    self.type_id,
+                    kind,
+                    item["name"],
+                    item["path"],
+                    item["file"],
+                    item["module"],
+                    int(item["is_pub"]),
+                    json.dumps(item, ensure_ascii=False, default=to_json),
+                ))
+                self.type_id += 1
+        self.conn.executemany("INSERT INTO types VALUES (?, ?, ?, ?, ?, ?, ?, ?)", types)
+
+        impls = []
+        for impl in file_results.get("impls", []):
+            impls.append((
+                self.impl_id,
+                impl["type"],
+                impl["trait"],
+                impl["file"],
+                json.dumps(impl, ensure_ascii=False, default=to_json),
+            ))
+            self.impl_id += 1
+        self.conn.executemany("INSERT INTO impls VALUES (?, ?, ?, ?, ?)", impls)
+
+        for key in RESULT_KEYS:
+            self.counts[key] += len(file_results.get(key, []))
+
+    def close(self) -> CallGraph:
+        """
+        构建调用图，写入元信息并替换旧索引
+        
+        :return: 调用图
+        """
+        self._publish_trait_methods()
+        call_graph = CallGraph.build(self.call_info)
+        self.call_info = []
+        self.conn.execute("INSERT INTO call_graph VALUES (?, ?)", call_graph.to_bytes())
+        meta = [
+            ("version", str(SCHEMA_VERSION)),
+            ("counts", json.dumps(self.counts)),
+        ]
+        self.conn.executemany("INSERT INTO meta VALUES (?, ?)", meta)
+        self.conn.commit()
+        self.conn.close()
+        self.tmp_file.replace(self.db_file)
+        return call_graph
+
+
+    def _publish_trait_methods(self):
+        """按 trait 和所属类型的可见性将 trait 方法标记为公开"""
+        types = [{"name": name, "is_pub": is_pub}
+                 for name, is_pub in self.conn.execute("SELECT name, is_pub FROM types")]
+        updates = []
+        for method in trait_methods_to_publish(self.trait_methods, types):
+            data = json.loads(self.conn.execute("SELECT data FROM functions WHERE id = ?",
+                                                (method["id"],)).fetchone()[0])
+            data["is_pub"] = True
+            updates.append((json.dumps(data, ensure_ascii=False), method["id"]))
+        self.conn.executemany("UPDATE functions SET is_pub = 1, data = ? WHERE id = ?", updates)
+        self.trait_methods = []
+
+
+class SymbolIndex:
+    """
+    符号索引查询接口
+
+    连接可在多个线程间共享，查询通过锁串行化。
+    """
+
+    def __init__(self, db_file: Path):
+        """
+        打开索引
+
+        :param db_file: 索引数据库路径
+        """
+        self.db_file = db_file
+        self.conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        self._call_graph = None
+
+    @classmethod
+    def open(cls, output_path: Path) -> Optional["SymbolIndex"]:
+        """
+        打开输出目录中的索引
+
+        :param output_path: 输出目录
+        :return: 索引，不存在或版本不匹配时返回 None
+        """
+        db_file = output_path / SYMBOL_DB
+        if not db_file.exists():
+            return None
+        index = cls(db_file)
+        if index._meta("version") != str(SCHEMA_VERSION):
+            index.close()
+            return None
+        return index
+
+    def close(self):
+        """关闭索引"""
+        self.conn.close()
+
+    def _query(self, sql: str, args: tuple = ()) -> List[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def _meta(self, key: str) -> Optional[str]:
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def counts(self) -> Dict[str, int]:
+        """各类条目数量"""
+        return json.loads(self._meta("counts"))
+
+    def count_functions(self, is_pub: bool = None, is_unsafe: bool = None) -> int:
+        """
+        统计函数数量
+
+        :param is_pub: 按可见性过滤（None 表示不过滤）
+        :param is_unsafe: 按 unsafe 过滤（None 表示不过滤）
+        """
+        where, args = self._function_filter(is_pub=is_pub, is_unsafe=is_unsafe)
+        return self._query(f"SELECT COUNT(*) FROM functions{where}", args)[0][0]
+
+    def _function_filter(self, name: str = None, path: str = None, module: str = None,
+                         file: str = None, owner: str = None, is_pub: bool = None,
+                         is_unsafe: bool = None, contains_unsafe: bool = None,
+                         return_type: str = None, param_type: str = None) -> tuple:
+        clauses = []
+        args = []
+        for column, value in (("name", name), ("path", path), ("module", module),
+                              ("file", file), ("owner", owner), ("return_type", return_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        for column, value in (("is_pub", is_pub), ("is_unsafe", is_unsafe),
+                              ("contains_unsafe", contains_unsafe)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(int(value))
+        if param_type is not None:
+            clauses.append("id IN (SELECT function_id FROM params WHERE type = ?)")
+            args.append(param_type)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, tuple(args)
+
+    def function_names(self, **filters) -> List[str]:
+        """
+        查询函数名，按分析顺序排列
+
+        :param filters: 过滤条件（name、path、module、file、owner、is_pub、is_unsafe、
+                        contains_unsafe、return_type、param_type）
+        """
+        where, args = self._function_filter(**filters)
+        rows = self._query(f"SELECT name FROM functions{where} ORDER BY id", args)
+        return [row[0] for row in rows]
+
+    def functions(self, **filters) -> Iterator[dict]:
+        """
+        查询函数信息，按分析顺序排列
+
+        :param filters: 过滤条件，同 function_names
+        """
+        where, args = self._function_filter(**filters)
+        for row in self._query(f"SELECT data FROM functions{where} ORDER BY id", args):
+            yield json.loads(row[0])
+
+    def get_function(self, path: str) -> Optional[dict]:
+        """
+        按限定路径获取函数
+
+        :param path: 限定路径（如 crate::a::Foo::new）
+        """
+        rows = self._query("SELECT data FROM functions WHERE path = ? ORDER BY id LIMIT 1", (path,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def find_functions(self, name: str) -> List[dict]:
+        """
+        按限定路径或名称查找函数
+
+        完整路径精确匹配；否则匹配以 name 结尾的路径（如 "new"、"Foo::new"），可能有多个。
+
+        :param name: 限定路径、部分路径或函数名
+        """
+        rows = self._query("SELECT data FROM functions WHERE path = ? ORDER BY id", (name,))
+        if not rows:
+            suffix = f"::{name}"
+            rows = self._query(
+                "SELECT data FROM functions WHERE name = ? AND substr(path, -?) = ? ORDER BY id",
+                (name.rsplit("::", 1)[-1], len(suffix), suffix)
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def types(self, name: str, kind: str = None) -> List[dict]:
+        """
+        按名称查询类型定义
+
+        :param name: 类型名
+        :param kind: 类型种类（struct、enum、trait）
+        """
+        if kind is None:
+            rows = self._query("SELECT data FROM types WHERE name = ? ORDER BY id", (name,))
+        else:
+            rows = self._query("SELECT data FROM types WHERE kind = ? AND name = ? ORDER BY id", (kind, name))
+        return [json.loads(row[0]) for row in rows]
+
+    def all_types(self, kind: str = None) -> Iterator[dict]:
+        """
+        查询全部类型定义，按分析顺序排列
+
+        :param kind: 类型种类（struct、enum、trait，None 表示全部）
+        """
+        if kind is None:
+            rows = self._query("SELECT data FROM types ORDER BY id")
+        else:
+            rows = self._query("SELECT data FROM types WHERE kind = ? ORDER BY id", (kind,))
+        for row in rows:
+            yield json.loads(row[0])
+
+    def all_impls(self, type_name: str = None) -> Iterator[dict]:
+        """
+        查询 impl 块，按分析顺序排列
+
+        :param type_name: 实现的目标类型名（None 表示全部）
+        """
+        if type_name is None:
+            rows = self._query("SELECT data FROM impls ORDER BY id")
+        else:
+            rows = self._query("SELECT data FROM impls WHERE type = ? ORDER BY id", (type_name,))
+        for row in rows:
+            yield json.loads(row[0])
+
+    def function_ids(self, **filters) -> List[int]:
+        """
+        查询函数编号（即调用图中的节点编号）
+
+        :param filters: 过滤条件，同 function_names
+        """
+        where, args = self._function_filter(**filters)
+        return [row[0] for row in self._query(f"SELECT id FROM functions{where} ORDER BY id", args)]
+
+    def call_graph(self) -> CallGraph:
+        """加载调用图"""
+        if self._call_graph is None:
+            offsets, targets = self._query("SELECT offsets, targets FROM call_graph")[0]
+            self._call_graph = CallGraph.from_bytes(offsets, targets)
+        return self._call_graph
+
+    def pub_functions_reaching_unsafe(self) -> List[dict]:
+        """
+        查询可能执行到 unsafe 代码的公开函数
+
+        unsafe 函数本身及包含 unsafe 块的函数作为起点，沿调用图反向搜索。
+        """
+        seeds = set(self.function_ids(is_unsafe=True))
+        seeds.update(self.function_ids(contains_unsafe=True))
+        reaching = self.call_graph().reaching(seeds)
+        return [
+            func for func_id, func in zip(self.function_ids(is_pub=True), self.functions(is_pub=True))
+            if func_id in reaching
+        ]
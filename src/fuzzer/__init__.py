@@ -0,0 +1 @@
+# Fuzzer 模块初始化
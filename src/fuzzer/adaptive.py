@@ -0,0 +1,193 @@
+"""
+自适应时间分配
+将 fuzzing 时间切成时间片，用多臂老虎机按近期 feature 增长速度把时间片分给各个 fuzz target
+"""
+
+import math
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from .scheduler import FuzzJob, FuzzResult, FuzzScheduler
+
+
+class SliceBandit:
+    """
+    滑动窗口 UCB1
+
+    每个 fuzz target 是一个臂，收益为最近 window 个时间片的 feature 增长速度
+    （除以目前观察到的最大速度归一化），发现新 crash 的时间片额外获得 crash_bonus。
+    覆盖率进入平台期的 target 收益趋近于 0，时间片逐渐转给仍在增长的 target；
+    探索项保证每个 target 都会被周期性地重新尝试。
+    """
+
+    def __init__(self, arms: List[str], window: int = 3, exploration: float = 1.0,
+                 crash_bonus: float = 1.0):
+        """
+        :param arms: fuzz target 名称
+        :param window: 计算收益时使用的最近时间片数
+        :param exploration: 探索项系数
+        :param crash_bonus: 发现新 crash 的额外收益
+        """
+        self.arms = list(arms)
+        self.exploration = exploration
+        self.crash_bonus = crash_bonus
+        self.history: Dict[str, deque] = {arm: deque(maxlen=window) for arm in arms}
+        self.pulls = {arm: 0 for arm in arms}
+        self.total_pulls = 0
+        self.max_rate = 0.0
+
+    def value(self, arm: str) -> float:
+        """最近时间片的平均收益（0 到 1）"""
+        history = self.history[arm]
+        if not history:
+            return 0.0
+        rewards = [
+            min(1.0, (rate / self.max_rate if self.max_rate else 0.0) + self.crash_bonus * crashed)
+            for rate, crashed in history
+        ]
+        return sum(rewards) / len(rewards)
+
+    def score(self, arm: str) -> float:
+        """UCB 分数，未尝试过的 target 为无穷大"""
+        if not self.pulls[arm]:
+            return math.inf
+        bonus = math.sqrt(2 * math.log(max(self.total_pulls, 1)) / self.pulls[arm])
+        return self.value(arm) + self.exploration * bonus
+
+    def select(self, count: int) -> List[str]:
+        """
+        选择分数最高的若干个 target（同分时按原顺序）
+
+        :param count: 数量
+        """
+        order = {arm: i for i, arm in enumerate(self.arms)}
+        return sorted(self.arms, key=lambda arm: (-self.score(arm), order[arm]))[:count]
+
+    def update(self, arm: str, rate: float, crashed: bool = False):
+        """
+        记录一个时间片的结果
+
+        :param arm: fuzz target 名称
+        :param rate: 每秒新增的 feature 数
+        :param crashed: 是否发现了新 crash
+        """
+        self.history[arm].append((rate, crashed))
+        self.pulls[arm] += 1
+        self.total_pulls += 1
+        self.max_rate = max(self.max_rate, rate)
+
+    def remove(self, arm: str):
+        """不再调度某个 target（如无法编译）"""
+        if arm in self.arms:
+            self.arms.remove(arm)
+
+
+def merge_results(results: List[FuzzResult]) -> FuzzResult:
+    """将同一个 target 多个时间片的结果合并为一个"""
+    last = results[-1]
+    gains = [result.feature_gain for result in results]
+    return FuzzResult(
+        last.name,
+        last.returncode,
+        sum(result.duration for result in results),
+        last.cores,
+        last.log_file,
+        [path for result in results for path in result.artifacts],
+        any(result.timed_out for result in results),
+        last.stats,
+        (sum(gain for gain, _ in gains), sum(seconds for _, seconds in gains))
+    )
+
+
+class AdaptiveCampaign:
+    """
+    自适应 fuzzing 活动
+
+    按轮进行：每轮由 SliceBandit 选出至多 slots 个 target，各运行一个时间片
+    （libFuzzer 的 -max_total_time），语料库在时间片之间保留，下一片从已有语料继续。
+    预算按各时间片的实际运行时间扣除（发现 crash 后 libFuzzer 会提前退出），
+    所有时间片的总时长不超过预算。
+    """
+
+    def __init__(self, scheduler: FuzzScheduler, targets: List[str],
+                 make_job: Callable[[str, int, float], FuzzJob], budget: float,
+                 slice_seconds: int = 300, slots: int = 1, bandit: Optional[SliceBandit] = None):
+        """
+        :param scheduler: 调度器
+        :param targets: fuzz target 名称
+        :param make_job: 创建任务的函数，参数为 target 名称、时间片秒数、此前已运行的秒数
+        :param budget: 全部时间片的总秒数
+        :param slice_seconds: 时间片长度（秒）
+        :param slots: 每轮同时运行的 target 数
+        :param bandit: 时间片分配策略
+        """
+        self.scheduler = scheduler
+        self.targets = list(targets)
+        self.make_job = make_job
+        self.budget = budget
+        self.slice_seconds = max(1, slice_seconds)
+        self.slots = max(1, slots)
+        self.bandit = bandit or SliceBandit(targets)
+        # 已经获得过 crash 收益的 target：每次重新运行都会再次触发同一个浅层 bug
+        # 并写出新的 crash-<sha1>，只有第一次发现 crash 时给予额外收益
+        self.crashed = set()
+
+    def run(self, on_slice: Optional[Callable[[FuzzResult, int], None]] = None,
+            on_progress: Optional[Callable] = None) -> List[FuzzResult]:
+        """
+        运行直到预算用完或没有可调度的 target
+
+        :param on_slice: 每个时间片结束时的回调，参数为结果和扣除的预算秒数
+        :param on_progress: 传给调度器的进度回调
+        :return: 每个 target 合并后的结果（按 targets 顺序，未运行过的 target 不包含在内）
+        """
+        remaining = self.budget
+        elapsed = {target: 0.0 for target in self.targets}
+        history: Dict[str, List[FuzzResult]] = {target: [] for target in self.targets}
+        round_index = 0
+        while remaining >= 1 and self.bandit.arms:
+            round_index += 1
+            chosen = self.bandit.select(self.slots)
+            seconds = int(min(self.slice_seconds, remaining / len(chosen)))
+            if seconds < 1:
+                break
+            logger.debug(f"第 {round_index} 轮: {', '.join(chosen)}，时间片 {seconds}s，"
+                         f"剩余预算 {remaining:.0f}s")
+            jobs = [self.make_job(target, seconds, elapsed[target]) for target in chosen]
+
+            spent = []
+
+            def on_finish(result: FuzzResult, spent=spent):
+                history[result.name].append(result)
+                elapsed[result.name] += result.duration
+                # 至少按 1 秒计，避免立即退出的 target 在剩余预算上空转
+                spent.append(max(result.duration, 1.0))
+                self._update(result)
+                if on_slice:
+                    on_slice(result, spent[-1])
+
+            self.scheduler.run(jobs, on_finish=on_finish, on_progress=on_progress)
+            remaining -= sum(spent)
+
+        pulls = ", ".join(f"{target} {self.bandit.pulls[target]}" for target in self.targets)
+        logger.info(f"共 {round_index} 轮，各 target 的时间片数: {pulls}")
+        return [merge_results(history[target]) for target in self.targets if history[target]]
+
+    def _update(self, result: FuzzResult):
+        """根据时间片结果更新分配策略"""
+        if result.timed_out or (result.status == "failed" and not result.stats):
+            # 无法编译、没有 libFuzzer 输出或被强制终止的 target 不再调度；
+            # 有 libFuzzer 输出的非 0 退出通常是再次触发了已知的 crash
+            logger.warning(f"{result.name} 运行失败（{result.status}），不再分配时间片")
+            self.bandit.remove(result.name)
+            return
+        gain, seconds = result.feature_gain
+        rate = gain / max(seconds, 1.0)
+        crashed = bool(result.artifacts) and result.name not in self.crashed
+        if crashed:
+            self.crashed.add(result.name)
+        self.bandit.update(result.name, rate, crashed=crashed)
+        logger.debug(f"{result.name}: 新增 {gain} 个 feature ({rate:.2f}/s)，"
+                     f"收益 {self.bandit.value(result.name):.2f}")
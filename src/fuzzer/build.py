@@ -0,0 +1,223 @@
+"""
+Fuzz target 构建
+一次 cargo fuzz build 编译全部 fuzz target，fuzz 阶段直接运行编译好的二进制
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from loguru import logger
+
+
+BUILD_STAMP = ".rustfuzz_build_stamp"
+
+SANITIZERS = ("address", "leak", "memory", "thread", "none")
+
+# 不影响编译结果的顶层目录
+IGNORED_DIRS = {"target", "corpus", "artifacts", "coverage", ".git"}
+
+
+def host_triple() -> str:
+    """rustc 的 host target（cargo fuzz 默认以它为编译目标）"""
+    output = subprocess.run(["rustc", "-vV"], capture_output=True, text=True, check=True).stdout
+    for line in output.splitlines():
+        if line.startswith("host:"):
+            return line.split(":", 1)[1].strip()
+    raise RuntimeError("无法从 rustc -vV 获取 host target")
+
+
+def sync_targets(fuzz_targets_dir: Path, fuzz_dir: Path) -> List[str]:
+    """
+    将生成的全部 fuzz target 同步到 fuzz 项目，使 fuzz/Cargo.toml 中的 [[bin]] 与之一致
+
+    内容未变的文件不重新复制，以免改变修改时间导致重新编译；
+    源文件已不存在的 [[bin]] 会被移除，否则一次编译全部 target 时会失败。
+
+    :param fuzz_targets_dir: 生成的 fuzz target 目录
+    :param fuzz_dir: cargo fuzz 的 fuzz 目录
+    :return: 新注册的 fuzz target
+    """
+    source_dir = fuzz_dir / "fuzz_targets"
+    source_dir.mkdir(parents=True, exist_ok=True)
+    names = sorted(src.stem for src in fuzz_targets_dir.glob("*.rs"))
+    for name in names:
+        src = fuzz_targets_dir / f"{name}.rs"
+        dst = source_dir / f"{name}.rs"
+        if not dst.exists() or dst.read_bytes() != src.read_bytes():
+            shutil.copy(src, dst)
+    return register_bins(fuzz_dir, names)
+
+
+def register_bins(fuzz_dir: Path, names: List[str], prune: bool = True) -> List[str]:
+    """
+    在 fuzz/Cargo.toml 中注册 [[bin]]（源文件为 fuzz_targets/<name>.rs）
+
+    :param fuzz_dir: cargo fuzz 的 fuzz 目录
+    :param names: fuzz target 名称
+    :param prune: 移除不在 names 中的 [[bin]]
+    :return: 新注册的 fuzz target
+    """
+    manifest = fuzz_dir / "Cargo.toml"
+    content = manifest.read_text(encoding="utf-8")
+    header, *bins = re.split(r"(?m)^(?=\[\[bin\]\]\s*$)", content)
+    kept = {}
+    for block in bins:
+        match = re.search(r'(?m)^name\s*=\s*"([^"]+)"', block)
+        if match and (match.group(1) in names or not prune):
+            kept[match.group(1)] = block.rstrip("\n") + "\n\n"
+    registered = [name for name in names if name not in kept]
+    for name in registered:
+        kept[name] = f'''[[bin]]
+name = "{name}"
+path = "fuzz_targets/{name}.rs"
+test = false
+doc = false
+bench = false
+
+'''
+    updated = header + "".join(kept[name] for name in (names if prune else kept))
+    if updated != content:
+        manifest.write_text(updated, encoding="utf-8")
+    return registered
+
+
+class FuzzBuild:
+    """
+    fuzz target 的构建
+
+    所有 fuzz target 共用 CARGO_TARGET_DIR，每种 sanitizer 使用独立的子目录，
+    切换 sanitizer 不会使另一种的编译结果失效。构建输入（fuzz target、被测 crate 的源码、
+    Cargo.toml/Cargo.lock、工具链版本和编译参数）的摘要记录在印记文件中，
+    未变化时完全跳过 cargo。
+    """
+
+    def __init__(self, fuzz_project_dir: Path, crate_path: Path, target_dir: Path,
+                 sanitizer: str = "address"):
+        """
+        :param fuzz_project_dir: 运行 cargo fuzz 的目录
+        :param crate_path: 被测 crate 目录
+        :param target_dir: 共享的构建目录
+        :param sanitizer: address、leak、memory、thread 或 none
+        """
+        if sanitizer not in SANITIZERS:
+            raise ValueError(f"不支持的 sanitizer: {sanitizer}")
+        self.fuzz_project_dir = fuzz_project_dir
+        self.fuzz_dir = fuzz_project_dir / "fuzz"
+        self.crate_path = crate_path
+        self.sanitizer = sanitizer
+        self.target_dir = target_dir / sanitizer
+        self.triple = host_triple()
+        self.last_error = ""
+
+    @property
+    def cmd(self) -> List[str]:
+        """构建命令（不指定 target 时编译 fuzz/Cargo.toml 中的全部 [[bin]]）"""
+        return ["cargo", "fuzz", "build", "-O", f"--sanitizer={self.sanitizer}"]
+
+    def binary(self, name: str) -> Path:
+        """fuzz target 的二进制路径"""
+        return self.target_dir / self.triple / "release" / name
+
+    def fingerprint(self) -> str:
+        """构建输入的摘要"""
+        digest = hashlib.blake2b(digest_size=16)
+        toolchain = subprocess.run(["rustc", "-V"], capture_output=True, text=True).stdout
+        digest.update(f"{toolchain}\0{' '.join(self.cmd)}\0{os.environ.get('RUSTFLAGS', '')}\0".encode())
+        for root in (self.fuzz_dir, self.crate_path):
+            for path in self._inputs(root):
+                stat = path.stat()
+                digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+        return digest.hexdigest()
+
+    def _inputs(self, root: Path) -> List[Path]:
+        """目录中可能影响编译结果的文件（跳过构建产物、语料库和 crash）"""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            current = Path(dirpath)
+            dirnames[:] = sorted(
+                name for name in dirnames
+                if not (current == root and name in IGNORED_DIRS) and current / name != self.target_dir.parent
+            )
+            files += [current / name for name in sorted(filenames)]
+        return files
+
+    def build(self, names: List[str]) -> List[str]:
+        """
+        编译 fuzz target，输入未变化且二进制都存在时跳过
+
+        多个 target 时一次编译 fuzz/Cargo.toml 中的全部 [[bin]]，失败时（通常是个别生成的
+        fuzz target 无法编译）在同一个构建目录中逐个编译，依赖不会重复编译；
+        只有一个 target 时只编译它。最后一次失败的错误输出保存在 last_error 中。
+
+        :param names: 需要的 fuzz target
+        :return: 编译成功的 fuzz target
+        """
+        stamp_file = self.target_dir / BUILD_STAMP
+        fingerprint = self.fingerprint()
+        missing = [name for name in names if not self.binary(name).exists()]
+        # 印记文件：第一行为摘要，其余为当时编译的 fuzz target
+        stamp = stamp_file.read_text().splitlines() if stamp_file.exists() else []
+        if not missing and stamp[:1] == [fingerprint] and set(names) <= set(stamp[1:]):
+            logger.info(f"fuzz target 未变化，使用已编译的二进制 ({self.target_dir})")
+            return list(names)
+
+        logger.info(f"编译 {len(names)} 个 fuzz target（sanitizer: {self.sanitizer}）...")
+        self.target_dir.mkdir(parents=True, exist_ok=True)
+        stamp_file.unlink(missing_ok=True)
+        self.last_error = ""
+        result = self._cargo(self.cmd + names if len(names) == 1 else self.cmd)
+        if result.returncode == 0:
+            built = [name for name in names if self.binary(name).exists()]
+        elif len(names) == 1:
+            built = []
+            self.last_error = result.stderr
+            logger.error(f"编译 {names[0]} 失败:\n{result.stderr[-2000:]}")
+        else:
+            logger.warning("一次编译全部 fuzz target 失败，改为逐个编译")
+            built = []
+            for name in names:
+                result = self._cargo(self.cmd + [name])
+                if result.returncode == 0 and self.binary(name).exists():
+                    built.append(name)
+                else:
+                    self.last_error = result.stderr
+                    logger.error(f"编译 {name} 失败:\n{result.stderr[-2000:]}")
+        if len(built) == len(names):
+            # 编译过程中源码可能被修改，使用编译前的摘要
+            stamp_file.write_text("\n".join([fingerprint, *names]))
+        return built
+
+    def _cargo(self, cmd: List[str]) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            cmd,
+            cwd=self.fuzz_project_dir,
+            env={**os.environ, "CARGO_TARGET_DIR": str(self.target_dir)},
+            capture_output=True,
+            text=True
+        )
+
+    def command(self, name: str, args: List[str], binary: Optional[str] = None) -> List[str]:
+        """
+        直接运行 fuzz target 二进制的命令，语料库和 artifact 目录与 cargo fuzz run 一致
+
+        :param name: fuzz target 名称
+        :param args: libFuzzer 参数
+        :param binary: 运行的二进制（默认与 name 相同；多路复用时为合并后的二进制，
+                       语料库和 artifact 仍按 name 分开）
+        """
+        corpus_dir = self.fuzz_dir / "corpus" / name
+        artifact_dir = self.artifact_dir(name)
+        corpus_dir.mkdir(parents=True, exist_ok=True)
+        artifact_dir.mkdir(parents=True, exist_ok=True)
+        # 使用绝对路径，任务的工作目录可以不同（-jobs 时为 worker 日志目录）
+        return [str(self.binary(binary or name).absolute()), f"-artifact_prefix={artifact_dir.absolute()}/",
+                *args, str(corpus_dir.absolute())]
+
+    def artifact_dir(self, name: str) -> Path:
+        """fuzz target 的 artifact 目录"""
+        return self.fuzz_dir / "artifacts" / name
@@ -0,0 +1,302 @@
+"""
+多路复用 fuzz 二进制
+将生成的多个 fuzz target 合并为一个二进制，按输入的选择前缀或环境变量分派到各个子 harness
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .build import FuzzBuild, register_bins
+
+
+MULTIPLEX_TARGET = "rustfuzz_multiplex"
+
+# 固定运行某个子 harness 的环境变量（值为编号），此时整个输入交给该 harness
+HARNESS_ENV = "RUSTFUZZ_HARNESS"
+
+# 子 harness 的顺序和被排除的 fuzz target，位于 fuzz 目录
+STATE_FILE = "multiplex.json"
+
+_MACRO_RE = re.compile(r"(?:::)?(?:libfuzzer_sys\s*::\s*)?fuzz_target!\s*\(")
+_INNER_ATTR_RE = re.compile(r"(?m)^\s*#!\[[^\]]*\]\s*$\n?")
+_PARAM_RE = re.compile(r"^\|\s*(?:mut\s+)?(\w+)\s*(?::\s*(.*?))?\s*\|", re.DOTALL)
+_CHAR_RE = re.compile(r"'(?:\\(?:x[0-9a-fA-F]{2}|u\{[0-9a-fA-F]+\}|.)|[^\\'])'")
+
+
+def _skip_literal(code: str, i: int) -> int:
+    """
+    如果 i 处是字符串、字符字面量或注释，返回其后的位置，否则返回 i
+    """
+    if code.startswith("//", i):
+        end = code.find("\n", i)
+        return len(code) if end < 0 else end
+    if code.startswith("/*", i):
+        depth = 0
+        while i < len(code):
+            if code.startswith("/*", i):
+                depth += 1
+                i += 2
+            elif code.startswith("*/", i):
+                depth -= 1
+                i += 2
+                if not depth:
+                    return i
+            else:
+                i += 1
+        return i
+    raw = re.match(r'b?r(#*)"', code[i:i + 260])
+    if raw and (i == 0 or not (code[i - 1].isalnum() or code[i - 1] == "_")):
+        end = code.find('"' + raw.group(1), i + raw.end())
+        return len(code) if end < 0 else end + 1 + len(raw.group(1))
+    if code[i] == '"':
+        i += 1
+        while i < len(code) and code[i] != '"':
+            i += 2 if code[i] == "\\" else 1
+        return i + 1
+    if code[i] == "'":
+        match = _CHAR_RE.match(code, i)
+        if match:
+            return match.end()
+    return i
+
+
+def _matching_paren(code: str, start: int) -> int:
+    """start 处为 "("，返回与之匹配的 ")" 的位置（跳过字符串和注释）"""
+    depth = 0
+    i = start
+    while i < len(code):
+        skipped = _skip_literal(code, i)
+        if skipped != i:
+            i = skipped
+            continue
+        if code[i] in "([{":
+            depth += 1
+        elif code[i] in ")]}":
+            depth -= 1
+            if not depth:
+                return i
+        i += 1
+    raise ValueError("fuzz_target! 的括号不匹配")
+
+
+def _find_macro(code: str) -> Optional[re.Match]:
+    """查找 fuzz_target! 宏调用（跳过字符串和注释中的）"""
+    i = 0
+    while i < len(code):
+        skipped = _skip_literal(code, i)
+        if skipped != i:
+            i = skipped
+            continue
+        if i == 0 or not (code[i - 1].isalnum() or code[i - 1] == "_"):
+            match = _MACRO_RE.match(code, i)
+            if match:
+                return match
+        i += 1
+    return None
+
+
+def harness_module(name: str, source: str) -> str:
+    """
+    将一个 fuzz target 改写为模块，fuzz_target! 替换为 pub fn run(data: &[u8])
+
+    闭包本身保持不变；参数不是 &[u8] 时与 libfuzzer-sys 相同，
+    用 Arbitrary::arbitrary_take_rest 从输入构造。
+
+    :param name: 模块名
+    :param source: fuzz target 源码
+    :return: 模块代码
+    """
+    match = _find_macro(source)
+    if not match:
+        raise ValueError("未找到 fuzz_target! 宏")
+    open_paren = match.end() - 1
+    close_paren = _matching_paren(source, open_paren)
+    closure = source[open_paren + 1:close_paren].strip().rstrip(",").strip()
+    param = _PARAM_RE.match(closure)
+    if not param:
+        raise ValueError("无法解析 fuzz_target! 的闭包参数")
+
+    param_type = (param.group(2) or "").replace(" ", "")
+    if param_type in ("", "&[u8]"):
+        call = "let _ = harness(data);"
+    else:
+        call = (f"if let Ok(input) = <{param.group(2).strip()} as libfuzzer_sys::arbitrary::Arbitrary>"
+                f"::arbitrary_take_rest(libfuzzer_sys::arbitrary::Unstructured::new(data)) {{\n"
+                f"        let _ = harness(input);\n"
+                f"    }}")
+    run = (f"pub fn run(data: &[u8]) {{\n"
+           f"    let harness = {closure};\n"
+           f"    {call}\n"
+           f"}}")
+
+    end = close_paren + 1
+    if source[end:].lstrip().startswith(";"):
+        end = source.index(";", end) + 1
+    body = source[:match.start()] + run + source[end:]
+    # 不缩进原有代码，以免改变多行字符串字面量的内容
+    body = _INNER_ATTR_RE.sub("", body).strip()
+    return f"mod {name} {{\n#![allow(unused_imports, dead_code)]\n\n{body}\n}}\n"
+
+
+def module_name(target_name: str) -> str:
+    """fuzz target 名称对应的模块名"""
+    name = re.sub(r"\W", "_", target_name)
+    return f"h_{name}" if not name or name[0].isdigit() else name
+
+
+def render_multiplex(harnesses: List[Tuple[str, str]]) -> Tuple[str, Dict[str, Tuple[int, int]]]:
+    """
+    生成多路复用二进制的源码
+
+    没有设置 RUSTFUZZ_HARNESS 时，输入的前 1 个字节（超过 256 个子 harness 时为 2 个字节）
+    选择子 harness，其余部分作为该 harness 的输入。
+
+    :param harnesses: [(fuzz target 名称, 已改写的模块代码)]，顺序即编号
+    :return: 源码，以及各 fuzz target 在源码中的行范围 (起始行, 结束行)（从 1 开始，含两端）
+    """
+    selector_bytes = 1 if len(harnesses) <= 256 else 2
+    header = f"""#![no_main]
+// 由 RustFuzz 生成：{len(harnesses)} 个 fuzz target 合并为一个二进制
+// 设置 {HARNESS_ENV}=<编号> 时整个输入交给对应的子 harness，
+// 否则输入的前 {selector_bytes} 个字节选择子 harness
+
+use libfuzzer_sys::fuzz_target;
+use std::sync::OnceLock;
+
+"""
+    code = header
+    line_ranges = {}
+    for name, module in harnesses:
+        start = code.count("\n") + 1
+        code += module + "\n"
+        line_ranges[name] = (start, code.count("\n"))
+
+    entries = "".join(f"    {module_name(name)}::run,\n" for name, _ in harnesses)
+    code += f"""const HARNESSES: &[fn(&[u8])] = &[
+{entries}];
+
+const SELECTOR_BYTES: usize = {selector_bytes};
+
+fn pinned() -> Option<usize> {{
+    static PINNED: OnceLock<Option<usize>> = OnceLock::new();
+    *PINNED.get_or_init(|| {{
+        std::env::var("{HARNESS_ENV}")
+            .ok()
+            .and_then(|value| value.parse().ok())
+            .filter(|&index: &usize| index < HARNESSES.len())
+    }})
+}}
+
+fuzz_target!(|data: &[u8]| {{
+    if let Some(index) = pinned() {{
+        HARNESSES[index](data);
+    }} else if data.len() >= SELECTOR_BYTES {{
+        let (selector, rest) = data.split_at(SELECTOR_BYTES);
+        let index = selector.iter().fold(0usize, |acc, &byte| acc << 8 | byte as usize);
+        HARNESSES[index % HARNESSES.len()](rest);
+    }}
+}});
+"""
+    return code, line_ranges
+
+
+def failing_harnesses(stderr: str, line_ranges: Dict[str, Tuple[int, int]]) -> Optional[List[str]]:
+    """
+    从编译错误中找出出错的子 harness
+
+    :param stderr: cargo 的错误输出
+    :param line_ranges: render_multiplex 返回的行范围
+    :return: 出错的 fuzz target；存在不属于任何子 harness 的错误时返回 None
+    """
+    failing = []
+    level = None
+    for line in stderr.splitlines():
+        if re.match(r"^(error|warning)", line):
+            level = line.split(":", 1)[0].split("[", 1)[0]
+            continue
+        location = re.match(rf"^\s*--> .*{MULTIPLEX_TARGET}\.rs:(\d+):", line)
+        if level != "error" or not location:
+            continue
+        line_no = int(location.group(1))
+        owner = next((name for name, (start, end) in line_ranges.items() if start <= line_no <= end), None)
+        if owner is None:
+            return None
+        if owner not in failing:
+            failing.append(owner)
+    return failing or None
+
+
+def build_multiplex(build: FuzzBuild, fuzz_targets_dir: Path, names: List[str],
+                    max_rounds: int = 5) -> Dict[str, int]:
+    """
+    将 fuzz target 合并为一个二进制并编译
+
+    无法编译的子 harness 根据错误位置排除后重新编译，排除记录（连同源码摘要）保存在
+    fuzz/multiplex.json 中，源码不变时之后的运行直接跳过。子 harness 的编号尽量保持稳定，
+    新的 fuzz target 追加在末尾。
+
+    :param build: 构建器
+    :param fuzz_targets_dir: 生成的 fuzz target 目录
+    :param names: 需要的 fuzz target
+    :param max_rounds: 最多编译次数
+    :return: {fuzz target 名称: 子 harness 编号}，编译失败时为空
+    """
+    state_file = build.fuzz_dir / STATE_FILE
+    state = json.loads(state_file.read_text(encoding="utf-8")) if state_file.exists() else {}
+    excluded: Dict[str, str] = dict(state.get("excluded", {}))
+
+    modules = {}
+    digests = {}
+    for name in names:
+        source = (fuzz_targets_dir / f"{name}.rs").read_text(encoding="utf-8")
+        digests[name] = hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+        if excluded.get(name) == digests[name]:
+            continue
+        excluded.pop(name, None)
+        try:
+            modules[name] = harness_module(module_name(name), source)
+        except ValueError as e:
+            logger.warning(f"{name} 无法合并: {e}")
+            excluded[name] = digests[name]
+
+    skipped = [name for name in names if name in excluded]
+    if skipped:
+        logger.warning(f"{len(skipped)} 个 fuzz target 曾无法编译且源码未变化，跳过: {', '.join(skipped)}")
+
+    source_file = build.fuzz_dir / "fuzz_targets" / f"{MULTIPLEX_TARGET}.rs"
+    source_file.parent.mkdir(parents=True, exist_ok=True)
+    register_bins(build.fuzz_dir, [MULTIPLEX_TARGET], prune=False)
+    previous = [name for name in state.get("harnesses", []) if name in modules]
+    for _ in range(max_rounds):
+        order = previous + sorted(name for name in modules if name not in previous)
+        if not order:
+            return {}
+        code, line_ranges = render_multiplex([(name, modules[name]) for name in order])
+        # 内容未变时不写入，以免改变修改时间导致重新编译
+        if not source_file.exists() or source_file.read_text(encoding="utf-8") != code:
+            source_file.write_text(code, encoding="utf-8")
+        new_state = {"harnesses": order, "excluded": dict(excluded)}
+        if new_state != state:
+            state_file.write_text(json.dumps(new_state, indent=2, ensure_ascii=False), encoding="utf-8")
+            state = new_state
+
+        logger.info(f"合并 {len(order)} 个 fuzz target 为 {MULTIPLEX_TARGET}")
+        if build.build([MULTIPLEX_TARGET]):
+            return {name: index for index, name in enumerate(order)}
+
+        failing = failing_harnesses(build.last_error, line_ranges)
+        if not failing:
+            logger.error("编译错误不属于任何子 harness，无法通过排除 fuzz target 修复")
+            return {}
+        logger.warning(f"排除无法编译的 {len(failing)} 个 fuzz target 后重新编译: {', '.join(failing)}")
+        for name in failing:
+            excluded[name] = digests[name]
+            del modules[name]
+        previous = [name for name in order if name in modules]
+    logger.error(f"编译 {MULTIPLEX_TARGET} {max_rounds} 次后仍然失败")
+    return {}
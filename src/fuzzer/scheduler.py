@@ -0,0 +1,290 @@
+"""
+Fuzz target 并行调度
+在核心预算内同时运行多个 fuzz target，每个任务绑定到独立的 CPU 核心
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from .stats import TargetStats
+
+
+def available_cores() -> List[int]:
+    """当前进程可以使用的 CPU 核心编号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class FuzzJob:
+    """
+    一个 fuzz target 的运行任务
+    """
+
+    def __init__(self, name: str, cmd: List[str], cwd: Path, log_file: Path,
+                 artifact_dir: Optional[Path] = None, cores: int = 1,
+                 deadline: Optional[float] = None, env: Optional[Dict[str, str]] = None,
+                 stats_file: Optional[Path] = None, append: bool = False, time_offset: float = 0.0):
+        """
+        :param name: fuzz target 名称
+        :param cmd: 命令
+        :param cwd: 工作目录
+        :param log_file: 原始输出（stdout 和 stderr）保存位置
+        :param artifact_dir: libFuzzer 写入 crash 等文件的目录
+        :param cores: 占用的核心数
+        :param deadline: 超过此时间（秒）仍未结束时强制终止（None 表示不限制）
+        :param env: 额外的环境变量
+        :param stats_file: libFuzzer 状态时间序列保存位置（None 表示不保存）
+        :param append: 日志和时间序列追加到已有文件（同一个 target 分多次运行时使用）
+        :param time_offset: 此前已运行的秒数，作为时间序列的起点
+        """
+        self.name = name
+        self.cmd = cmd
+        self.cwd = cwd
+        self.log_file = log_file
+        self.artifact_dir = artifact_dir
+        self.cores = max(1, cores)
+        self.deadline = deadline
+        self.env = env or {}
+        self.stats_file = stats_file
+        self.append = append
+        self.time_offset = time_offset
+
+
+class FuzzResult:
+    """
+    fuzz target 的运行结果
+    """
+
+    def __init__(self, name: str, returncode: Optional[int], duration: float, cores: List[int],
+                 log_file: Path, artifacts: List[Path], timed_out: bool = False,
+                 stats: Optional[dict] = None, feature_gain: tuple = (0, 0.0)):
+        """
+        :param name: fuzz target 名称
+        :param returncode: 退出码（无法启动时为 None）
+        :param duration: 运行时间（秒）
+        :param cores: 绑定的核心
+        :param log_file: 输出保存位置
+        :param artifacts: 本次运行新产生的 crash / leak / timeout / oom 文件
+        :param timed_out: 是否因超过 deadline 被终止
+        :param stats: 最后的 libFuzzer 指标
+        :param feature_gain: 本次运行新增的 feature 数和对应的 fuzzing 秒数
+        """
+        self.name = name
+        self.returncode = returncode
+        self.duration = duration
+        self.cores = cores
+        self.log_file = log_file
+        self.artifacts = artifacts
+        self.timed_out = timed_out
+        self.stats = stats or {}
+        self.feature_gain = feature_gain
+
+    @property
+    def status(self) -> str:
+        """ok、crash（产生了 artifact）、timeout（被强制终止）或 failed"""
+        if self.artifacts:
+            return "crash"
+        if self.timed_out:
+            return "timeout"
+        return "ok" if self.returncode == 0 else "failed"
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "name": self.name,
+            "status": self.status,
+            "returncode": self.returncode,
+            "duration": round(self.duration, 1),
+            "cores": self.cores,
+            "log_file": str(self.log_file),
+            "artifacts": [str(path) for path in self.artifacts],
+            "stats": self.stats,
+        }
+
+
+class _Running:
+    """运行中的任务"""
+
+    def __init__(self, job: FuzzJob, process: subprocess.Popen, cores: List[int], log,
+                 existing: set):
+        self.job = job
+        self.process = process
+        self.cores = cores
+        self.log = log
+        self.existing = existing
+        self.started = time.monotonic()
+        self.timed_out = False
+        self.stats = TargetStats(job.name, job.stats_file, job.append, job.time_offset)
+        self.reader = threading.Thread(target=self._pump, daemon=True)
+        self.reader.start()
+
+    def _pump(self):
+        """逐行读取输出：原样写入日志，同时解析状态行"""
+        for line in iter(self.process.stdout.readline, b""):
+            self.log.write(line)
+            self.stats.feed(line.decode("utf-8", errors="replace"))
+        self.process.stdout.close()
+
+
+class FuzzScheduler:
+    """
+    fuzz target 调度器
+
+    按提交顺序启动任务，同时运行的任务占用的核心总数不超过核心预算；
+    每个任务在独立的进程组中运行，并绑定到分配给它的核心（Linux），
+    子进程（cargo 启动的 fuzzer）继承绑定。
+    """
+
+    def __init__(self, core_budget: int = 0, max_parallel: int = 0, pin: bool = True,
+                 poll_interval: float = 0.5):
+        """
+        初始化调度器
+
+        :param core_budget: 可使用的核心数（0 表示全部可用核心）
+        :param max_parallel: 最多同时运行的任务数（0 表示只受核心预算限制）
+        :param pin: 是否将任务绑定到核心
+        :param poll_interval: 检查任务状态的间隔（秒）
+        """
+        cores = available_cores()
+        if core_budget > len(cores):
+            logger.warning(f"核心预算 {core_budget} 超过可用核心数 {len(cores)}，使用全部可用核心")
+        self.cores = cores[:core_budget] if core_budget > 0 else cores
+        self.max_parallel = max_parallel
+        self.pin = pin and hasattr(os, "sched_setaffinity")
+        self.poll_interval = poll_interval
+
+    def run(self, jobs: List[FuzzJob],
+            on_finish: Optional[Callable[[FuzzResult], None]] = None,
+            on_progress: Optional[Callable[[List[TargetStats]], None]] = None) -> List[FuzzResult]:
+        """
+        运行全部任务，直到全部结束
+
+        :param jobs: 任务列表
+        :param on_finish: 每个任务结束时的回调
+        :param on_progress: 每次检查任务状态时的回调，参数为运行中任务的指标
+        :return: 与 jobs 顺序一致的结果
+        """
+        queue = list(jobs)
+        free = list(self.cores)
+        running: List[_Running] = []
+        results: Dict[str, FuzzResult] = {}
+        try:
+            while queue or running:
+                # 启动能放进剩余核心的任务
+                while queue and (not self.max_parallel or len(running) < self.max_parallel):
+                    cores_needed = min(queue[0].cores, len(self.cores))
+                    if cores_needed > len(free):
+                        break
+                    job = queue.pop(0)
+                    assigned, free = free[:cores_needed], free[cores_needed:]
+                    task = self._start(job, assigned)
+                    if task is None:
+                        free += assigned
+                        results[job.name] = FuzzResult(job.name, None, 0.0, assigned, job.log_file, [])
+                        if on_finish:
+                            on_finish(results[job.name])
+                    else:
+                        running.append(task)
+
+                time.sleep(self.poll_interval)
+                for task in list(running):
+                    if task.process.poll() is None:
+                        if task.job.deadline and time.monotonic() - task.started > task.job.deadline:
+                            logger.warning(f"{task.job.name} 超过 {task.job.deadline:.0f}s 未结束，强制终止")
+                            task.timed_out = True
+                            self._kill(task.process)
+                        continue
+                    running.remove(task)
+                    free += task.cores
+                    result = self._finish(task)
+                    results[task.job.name] = result
+                    if on_finish:
+                        on_finish(result)
+                if on_progress:
+                    on_progress([task.stats for task in running])
+        except BaseException:
+            # Ctrl-C 等：终止所有仍在运行的任务，已读取的输出照常保存
+            for task in running:
+                self._kill(task.process)
+                self._finish(task)
+            raise
+        return [results[job.name] for job in jobs]
+
+    def _start(self, job: FuzzJob, cores: List[int]) -> Optional[_Running]:
+        """启动任务，失败时返回 None"""
+        job.log_file.parent.mkdir(parents=True, exist_ok=True)
+        existing = set()
+        if job.artifact_dir is not None and job.artifact_dir.exists():
+            existing = {path.name for path in job.artifact_dir.iterdir()}
+        log = open(job.log_file, "ab" if job.append else "wb", buffering=0)
+        preexec_fn = None
+        if self.pin:
+            def preexec_fn():
+                os.sched_setaffinity(0, cores)
+        try:
+            process = subprocess.Popen(
+                job.cmd,
+                cwd=job.cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env={**os.environ, **job.env},
+                start_new_session=True,
+                preexec_fn=preexec_fn
+            )
+        except OSError as e:
+            log.close()
+            logger.error(f"启动 {job.name} 失败: {e}")
+            return None
+        logger.info(f"开始运行 {job.name}（核心 {','.join(map(str, cores))}）")
+        return _Running(job, process, cores, log, existing)
+
+    @staticmethod
+    def _kill(process: subprocess.Popen):
+        """终止任务的整个进程组"""
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    def _finish(task: _Running) -> FuzzResult:
+        """收集结束任务的退出码、指标和新产生的 artifact"""
+        # 主进程结束后进程组中残留的子进程（如 -jobs 的 worker）仍持有输出管道，
+        # 先结束它们，管道关闭后读取线程才会退出，之后才能关闭日志和时间序列
+        try:
+            os.killpg(task.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        task.reader.join()
+        task.log.close()
+        task.stats.close()
+        artifacts = []
+        artifact_dir = task.job.artifact_dir
+        if artifact_dir is not None and artifact_dir.exists():
+            artifacts = sorted(
+                path for path in artifact_dir.iterdir()
+                if path.is_file() and path.name not in task.existing
+            )
+        return FuzzResult(
+            task.job.name,
+            task.process.returncode,
+            time.monotonic() - task.started,
+            task.cores,
+            task.job.log_file,
+            artifacts,
+            task.timed_out,
+            task.stats.snapshot(),
+            task.stats.feature_gain()
+        )
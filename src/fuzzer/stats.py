@@ -0,0 +1,128 @@
+"""
+libFuzzer 输出解析
+逐行解析 "#N EVENT cov: ft: corp: exec/s: rss:" 状态行，记录为时间序列
+"""
+
+import json
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+_STATUS_RE = re.compile(r"^#(\d+)\s+([A-Za-z]+)\b(.*)$")
+_FIELD_RE = re.compile(r"([A-Za-z/]+): (\S+)")
+_SIZE_UNITS = {"b": 1, "Kb": 1 << 10, "Mb": 1 << 20, "Gb": 1 << 30}
+
+
+def _size(text: str) -> Optional[int]:
+    """解析 libFuzzer 的大小表示，如 "20b"、"2Kb" """
+    match = re.match(r"(\d+)([KMG]?b)$", text)
+    if not match:
+        return None
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def parse_status_line(line: str) -> Optional[dict]:
+    """
+    解析 libFuzzer 状态行
+
+    如 "#345	NEW    cov: 24 ft: 25 corp: 5/20b lim: 4 exec/s: 0 rss: 31Mb L: 4/4 MS: 1 ..."
+
+    :param line: 输出的一行
+    :return: {"execs", "event", "cov", "ft", "corpus", "corpus_bytes", "lim", "exec_s", "rss_mb"}
+             中出现的字段，不是状态行时返回 None
+    """
+    match = _STATUS_RE.match(line.strip())
+    if not match:
+        return None
+    record = {"execs": int(match.group(1)), "event": match.group(2)}
+    for key, value in _FIELD_RE.findall(match.group(3)):
+        if key in ("cov", "ft", "lim") and value.isdigit():
+            record[key] = int(value)
+        elif key == "exec/s" and value.isdigit():
+            record["exec_s"] = int(value)
+        elif key == "rss" and value.endswith("Mb") and value[:-2].isdigit():
+            record["rss_mb"] = int(value[:-2])
+        elif key == "corp" and "/" in value:
+            count, size = value.split("/", 1)
+            if count.isdigit():
+                record["corpus"] = int(count)
+            if _size(size) is not None:
+                record["corpus_bytes"] = _size(size)
+    return record
+
+
+class TargetStats:
+    """
+    单个 fuzz target 的运行指标
+
+    每条状态记录追加到 JSON Lines 文件（附带相对启动时间 t），
+    内存中只保留最新的指标。
+    """
+
+    def __init__(self, name: str, series_file: Optional[Path] = None, append: bool = False,
+                 offset: float = 0.0):
+        """
+        :param name: fuzz target 名称
+        :param series_file: 时间序列保存位置（None 表示不保存）
+        :param append: 追加到已有的时间序列（分多次运行同一个 target 时使用）
+        :param offset: 时间 t 的起点（此前已运行的秒数）
+        """
+        self.name = name
+        self.started = time.monotonic() - offset
+        self.initial: dict = {}
+        self.latest: dict = {}
+        self.records = 0
+        self.lock = threading.Lock()
+        self.series = None
+        if series_file is not None:
+            series_file.parent.mkdir(parents=True, exist_ok=True)
+            self.series = open(series_file, "a" if append else "w", encoding="utf-8", buffering=1)
+
+    def feed(self, line: str) -> Optional[dict]:
+        """
+        处理一行输出
+
+        :param line: 输出的一行
+        :return: 解析出的状态记录，不是状态行时返回 None
+        """
+        record = parse_status_line(line)
+        if record is None:
+            return None
+        record = {"t": round(time.monotonic() - self.started, 3), **record}
+        with self.lock:
+            if not self.initial:
+                self.initial = record
+            # 部分事件行（如 RELOAD）不带全部字段，沿用之前的值
+            self.latest = {**self.latest, **record}
+            self.records += 1
+        if self.series is not None:
+            self.series.write(json.dumps(record) + "\n")
+        return record
+
+    def snapshot(self) -> dict:
+        """最新指标"""
+        with self.lock:
+            return dict(self.latest)
+
+    def feature_gain(self) -> tuple:
+        """
+        本次运行新增的 feature 数和对应的 fuzzing 时间
+
+        以第一条状态记录（通常是加载语料库后的 INITED）为起点。
+
+        :return: (新增 feature 数, 秒数)
+        """
+        with self.lock:
+            if not self.latest:
+                return 0, 0.0
+            gain = self.latest.get("ft", 0) - self.initial.get("ft", 0)
+            return max(0, gain), self.latest["t"] - self.initial["t"]
+
+    def close(self):
+        """关闭时间序列文件"""
+        if self.series is not None:
+            self.series.close()
+            self.series = None
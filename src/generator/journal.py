@@ -0,0 +1,123 @@
+"""
+生成日志
+以追加方式逐条记录生成计划和已完成的 fuzz target，中断后可以继续生成
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+
+JOURNAL_FILE = "generate_journal.jsonl"
+
+
+def prompt_hash(prompt: str) -> str:
+    """prompt 的摘要"""
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class JournalState:
+    """
+    从生成日志恢复的状态
+    """
+
+    def __init__(self, selections: Optional[List[List[str]]] = None,
+                 completed: Optional[Dict[int, dict]] = None):
+        """
+        :param selections: 生成计划（每个 fuzz target 的函数集合），没有日志时为 None
+        :param completed: 编号 -> 完成记录
+        """
+        self.selections = selections
+        self.completed = completed or {}
+
+
+class GenerationJournal:
+    """
+    生成日志（JSON Lines）
+
+    第一条为生成计划，之后每完成一个 fuzz target 追加一条记录，
+    每条写入后立即 fsync，进程在任意时刻中断都最多丢失正在写入的一条。
+    """
+
+    def __init__(self, path: Path):
+        """
+        :param path: 日志文件路径
+        """
+        self.path = path
+        self.file = None
+
+    def load(self) -> JournalState:
+        """
+        读取已有日志
+
+        最后一行可能因中断而不完整，无法解析的行会被忽略。
+        """
+        if not self.path.exists():
+            return JournalState()
+        selections = None
+        completed = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"生成日志第 {line_no} 行不完整，已忽略")
+                    continue
+                if entry["type"] == "plan":
+                    selections = entry["selections"]
+                    completed = {}
+                elif entry["type"] == "done":
+                    completed[entry["index"]] = entry
+        return JournalState(selections, completed)
+
+    def start(self, selections: List[List[str]], **info):
+        """
+        开始新的生成，清空旧日志并写入生成计划
+
+        :param selections: 每个 fuzz target 的函数集合
+        :param info: 其他需要记录的信息（任务类型等）
+        """
+        self.close()
+        self.file = open(self.path, "w", encoding="utf-8")
+        self._append({"type": "plan", "selections": selections, **info})
+
+    def resume(self):
+        """在已有日志后继续追加，先截掉中断时未写完的最后一行"""
+        self.close()
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, index: int, functions: List[str], prompt_digest: str, output: str):
+        """
+        记录一个已完成的 fuzz target
+
+        :param index: 在生成计划中的编号（从 0 开始）
+        :param functions: 函数集合
+        :param prompt_digest: prompt 摘要
+        :param output: 输出文件名
+        """
+        self._append({
+            "type": "done",
+            "index": index,
+            "functions": functions,
+            "prompt_hash": prompt_digest,
+            "output": output,
+        })
+
+    def _append(self, entry: dict):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        """关闭日志"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,229 @@
+"""
+Prompt token 预算
+按优先级选择和裁剪上下文片段，使 prompt 不超过配置的 token 数
+"""
+
+import math
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+
+from loguru import logger
+
+
+class Tokenizer(ABC):
+    """
+    分词器接口，只需要统计 token 数
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """
+        统计文本的 token 数
+
+        :param text: 文本
+        """
+
+
+class ApproxTokenizer(Tokenizer):
+    """
+    离线近似分词器
+
+    按 BPE 分词器的常见规律估计：英文单词约每 4 个字母一个 token，
+    数字每 3 位一个 token，其他字符（中文、标点等）各算一个 token。
+    """
+
+    name = "approx"
+
+    _PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+    def count(self, text: str) -> int:
+        tokens = 0
+        for match in self._PATTERN.finditer(text):
+            piece = match.group()
+            if piece[0].isascii() and piece[0].isalpha():
+                tokens += math.ceil(len(piece) / 4)
+            elif piece[0].isdigit():
+                tokens += math.ceil(len(piece) / 3)
+            else:
+                tokens += 1
+        return tokens
+
+
+class TiktokenTokenizer(Tokenizer):
+    """
+    基于 tiktoken 的分词器（需要安装 tiktoken）
+    """
+
+    name = "tiktoken"
+
+    def __init__(self, model: str = ""):
+        """
+        初始化分词器
+
+        :param model: 模型名称，未知模型使用 cl100k_base 编码
+        """
+        import tiktoken
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+TOKENIZERS = ("auto", "approx", "tiktoken")
+
+
+def create_tokenizer(name: str = "auto", model: str = "") -> Tokenizer:
+    """
+    创建分词器
+
+    :param name: auto（有 tiktoken 时使用，否则使用近似分词器）、approx 或 tiktoken
+    :param model: 模型名称
+    :return: 分词器
+    """
+    if name not in TOKENIZERS:
+        raise ValueError(f"不支持的分词器: {name}")
+    if name == "approx":
+        return ApproxTokenizer()
+    try:
+        return TiktokenTokenizer(model)
+    except ImportError:
+        if name == "tiktoken":
+            logger.warning("未安装 tiktoken 包，使用近似分词器，可运行: pip install tiktoken")
+        return ApproxTokenizer()
+
+
+def doc_variants(doc_comment: str) -> List[str]:
+    """
+    生成从完整到精简的文档版本
+
+    去掉注释标记（///、//!、/** */、#[doc = "..."]）后，依次为完整文档、
+    第一个空行或代码示例之前的摘要、第一行。
+
+    :param doc_comment: 原始文档注释
+    :return: 各版本，没有文档时为空
+    """
+    lines = []
+    for line in doc_comment.splitlines():
+        line = line.strip()
+        if line.startswith("///") or line.startswith("//!"):
+            line = line[3:]
+        elif line.startswith("#[doc") or line.startswith("#![doc"):
+            match = re.match(r'#!?\[doc\s*=\s*"(.*)"\s*\]$', line)
+            line = match.group(1) if match else line
+        else:
+            line = line.removeprefix("/**").removeprefix("/*!").removesuffix("*/").lstrip("* ")
+        lines.append(line.rstrip()[1:] if line.startswith(" ") else line.rstrip())
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    if not lines:
+        return []
+
+    summary = []
+    for line in lines:
+        if not line or line.startswith("```") or line.startswith("#"):
+            break
+        summary.append(line)
+
+    variants = ["\n".join(lines), "\n".join(summary), lines[0]]
+    return [v for i, v in enumerate(variants) if v and v not in variants[:i]]
+
+
+class ContextPiece:
+    """
+    prompt 中的一段上下文
+
+    variants 为从完整到精简的若干版本；预算不足时依次尝试更短的版本，
+    都放不下时省略（必需的片段总是使用完整版本）。
+    """
+
+    __slots__ = ("variants", "priority", "required")
+
+    def __init__(self, variants: Sequence[str], priority: int = 0, required: bool = False):
+        """
+        初始化上下文片段
+
+        :param variants: 从完整到精简的文本版本
+        :param priority: 优先级，数值大的先分配预算
+        :param required: 是否必需
+        """
+        self.variants = list(variants)
+        self.priority = priority
+        self.required = required
+
+
+class PromptBudget:
+    """
+    prompt token 预算
+    """
+
+    def __init__(self, tokenizer: Tokenizer, max_tokens: int = 0):
+        """
+        初始化预算
+
+        :param tokenizer: 分词器
+        :param max_tokens: prompt 的 token 上限（0 表示不限制）
+        """
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+
+    def count(self, text: str) -> int:
+        """统计 token 数"""
+        return self.tokenizer.count(text)
+
+    def fit(self, fixed: str, pieces: List[ContextPiece], scale: int = 1) -> List[Optional[str]]:
+        """
+        在预算内为每个片段选择版本
+
+        必需片段先占用预算，其余片段按优先级从高到低（同优先级按出现顺序）
+        选择能放下的最完整版本。
+
+        :param fixed: prompt 中固定的部分（要求说明等）
+        :param pieces: 上下文片段
+        :param scale: 预算倍数（批量生成多个 fuzz target 时为数量）
+        :return: 与 pieces 一一对应的文本，省略的片段为 None
+        """
+        if not self.max_tokens:
+            return [piece.variants[0] for piece in pieces]
+
+        chosen: List[Optional[str]] = [None] * len(pieces)
+        remaining = self.max_tokens * scale - self.count(fixed)
+        for i, piece in enumerate(pieces):
+            if piece.required:
+                chosen[i] = piece.variants[0]
+                remaining -= self.count(chosen[i])
+
+        optional = sorted(
+            (i for i, piece in enumerate(pieces) if not piece.required),
+            key=lambda i: -pieces[i].priority
+        )
+        for i in optional:
+            for variant in pieces[i].variants:
+                tokens = self.count(variant)
+                if tokens <= remaining:
+                    chosen[i] = variant
+                    remaining -= tokens
+                    break
+        if remaining < 0:
+            logger.debug(f"prompt 的必需部分超出预算 {-remaining} tokens")
+        return chosen
+
+    def render(self, header: str, pieces: List[ContextPiece], footer: str, scale: int = 1) -> str:
+        """
+        组装 prompt
+
+        :param header: 开头的固定部分
+        :param pieces: 上下文片段（按在 prompt 中的顺序）
+        :param footer: 结尾的固定部分
+        :param scale: 预算倍数
+        :return: prompt
+        """
+        chosen = self.fit(header + footer, pieces, scale)
+        return header + "".join(text for text in chosen if text) + footer
@@ -3,9 +3,22 @@ Rust Fuzz Target 生成器
 """
 
 import random
+import re
 from pathlib import Path
 from loguru import logger
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+
+from .journal import prompt_hash
+from .prompt_budget import ContextPiece, PromptBudget, create_tokenizer, doc_variants
+from .type_context import TypeIndex
+
+
+# 每个 fuzz target 的最大输出 token 数
+MAX_TOKENS_PER_TARGET = 2000
+
+# 批量生成时各个 fuzz target 之间的分隔标记
+BATCH_MARKER = "===== FUZZ TARGET {index} ====="
+BATCH_MARKER_RE = re.compile(r"^[ \t/#*]*=+ *FUZZ TARGET (\d+) *=+[ \t*]*$", re.MULTILINE)
 
 
 class RustFuzzGenerator:
@@ -13,20 +26,51 @@ class RustFuzzGenerator:
     Rust Fuzz Target 生成器
     """
     
-    def __init__(self, llm_client, analysis_results: dict, config: dict):
+    def __init__(self, llm_client, analysis_results: dict, config: dict,
+                 symbol_index=None, library_config: dict = None, type_index: TypeIndex = None):
         """
         初始化生成器
         
         :param llm_client: LLM 客户端
         :param analysis_results: 代码分析结果
         :param config: 配置
+        :param symbol_index: 符号索引（存在时优先从索引查询，analysis_results 可为空）
+        :param library_config: 目标库配置（提供 api_hints 等上下文）
+        :param type_index: 类型索引（为 None 时从 analysis_results 构建）
         """
         self.llm_client = llm_client
         self.analysis_results = analysis_results
         self.config = config
+        self.symbol_index = symbol_index
         self.functions = analysis_results.get("functions", [])
         self.structs = analysis_results.get("structs", [])
         self.enums = analysis_results.get("enums", [])
+        self.api_hints = (library_config or {}).get("api_hints", [])
+        
+        generator_config = config.get("generator", {})
+        tokenizer = create_tokenizer(
+            generator_config.get("tokenizer", "auto"),
+            config.get("llm", {}).get("openai_model", "")
+        )
+        self.prompt_budget = PromptBudget(tokenizer, generator_config.get("prompt_token_budget", 3000))
+        # 为 0 时相同的 prompt 总是得到相同的响应，直接使用缓存
+        self.temperature = config.get("llm", {}).get("temperature", 0.7)
+        if type_index is None:
+            type_index = TypeIndex(
+                self.structs, self.enums, analysis_results.get("impls", []),
+                collect_depth=generator_config.get("collect_depth", 3),
+                one_def_per_name=generator_config.get("collect_one_def_in_same_names", True)
+            )
+        self.type_index = type_index
+        # 函数集合 -> prompt token 数（批量生成时为均摊到每个 fuzz target 的数量）
+        self.prompt_tokens: Dict[tuple, int] = {}
+        # 函数集合 -> 最近一次使用的 prompt 摘要（批量生成时为整个批量 prompt 的摘要）
+        self.prompt_hashes: Dict[tuple, str] = {}
+        
+        # 限定路径 -> 函数（同名方法的路径不同）
+        self._functions_by_path = {}
+        for func in self.functions:
+            self._functions_by_path.setdefault(func["path"], func)
     
     def select_functions(self, target_functions: List[str], function_set_size: int = 3) -> List[str]:
         """
@@ -40,11 +84,13 @@ class RustFuzzGenerator:
             return target_functions
         return random.sample(target_functions, function_set_size)
     
-    def generate_fuzz_target(self, selected_functions: List[str]) -> str:
+    def generate_fuzz_target(self, selected_functions: List[str], sample: str = "") -> str:
         """
         生成 fuzz target 代码
         
         :param selected_functions: 选中的函数列表
+        :param sample: 响应缓存中区分相同 prompt 的标识（fuzz target 编号），
+                       使重复的函数集合各自得到新的采样
         :return: 生成的代码
         """
         # 收集函数信息
@@ -59,61 +105,241 @@ class RustFuzzGenerator:
         
         # 使用 LLM 生成代码
         prompt = self._build_prompt(func_infos)
-        generated_code = self.llm_client.generate(prompt)
+        self.prompt_tokens[tuple(selected_functions)] = self.prompt_budget.count(prompt)
+        self.prompt_hashes[tuple(selected_functions)] = prompt_hash(prompt)
+        generated_code = self.llm_client.generate(
+            prompt, temperature=self.temperature, max_tokens=MAX_TOKENS_PER_TARGET, stop_after_blocks=1,
+            sample=sample
+        )
         
         # 后处理
         final_code = self._post_process(generated_code)
         
         return final_code
     
-    def _get_function_info(self, func_name: str) -> Dict:
+    def generate_fuzz_targets(self, selections: List[List[str]],
+                              samples: Optional[List[str]] = None) -> List[Union[str, Exception]]:
         """
-        获取函数信息
+        在一次 LLM 请求中生成多个 fuzz target
+
+        多个函数集合共用一份要求说明，LLM 按分隔标记依次输出各个 fuzz target。
+        无法从响应中解析出的 fuzz target 退回到单独请求。
+
+        :param selections: 函数集合列表
+        :param samples: 各 fuzz target 的缓存标识（见 generate_fuzz_target）
+        :return: 与 selections 一一对应的代码，生成失败的位置为异常对象
         """
-        for func in self.functions:
-            if func["name"] == func_name:
-                return func
-        return None
+        samples = samples or [""] * len(selections)
+        results: List[Union[str, Exception, None]] = [None] * len(selections)
+        batch = []
+        for i, selected_functions in enumerate(selections):
+            func_infos = [info for info in map(self._get_function_info, selected_functions) if info]
+            if func_infos:
+                batch.append((i, func_infos))
+            else:
+                results[i] = ValueError("未找到任何有效函数")
+
+        if len(batch) > 1:
+            prompt = self._build_batch_prompt([func_infos for _, func_infos in batch])
+            tokens = round(self.prompt_budget.count(prompt) / len(batch))
+            digest = prompt_hash(prompt)
+            for i, _ in batch:
+                self.prompt_tokens[tuple(selections[i])] = tokens
+                self.prompt_hashes[tuple(selections[i])] = digest
+            try:
+                response = self.llm_client.generate(
+                    prompt, temperature=self.temperature, max_tokens=MAX_TOKENS_PER_TARGET * len(batch),
+                    stop_after_blocks=len(batch),
+                    sample=",".join(samples[i] for i, _ in batch)
+                )
+                codes = self._split_batch(response, len(batch))
+            except Exception as e:
+                logger.warning(f"批量生成失败，改为逐个生成: {e}")
+                codes = [None] * len(batch)
+            for (i, _), code in zip(batch, codes):
+                results[i] = code
+            missing = sum(code is None for code in codes)
+            if missing:
+                logger.warning(f"批量响应中有 {missing}/{len(batch)} 个 fuzz target 无法解析，改为单独生成")
+
+        for i, selected_functions in enumerate(selections):
+            if results[i] is None:
+                try:
+                    results[i] = self.generate_fuzz_target(selected_functions, samples[i])
+                except Exception as e:
+                    results[i] = e
+        return results
     
-    def _build_prompt(self, func_infos: List[Dict]) -> str:
+    def find_functions(self, name: str) -> List[Dict]:
         """
-        构建 LLM prompt
+        按限定路径或名称查找函数
+
+        完整路径精确匹配；否则匹配以 name 结尾的路径（如 "new"、"Foo::new"），可能有多个。
+
+        :param name: 限定路径、部分路径或函数名
         """
-        prompt = f"""你是一个 Rust fuzzing 专家。请为以下函数生成一个 fuzz target。
+        if self.symbol_index is not None:
+            return self.symbol_index.find_functions(name)
+        if name in self._functions_by_path:
+            return [self._functions_by_path[name]]
+        suffix = f"::{name}"
+        return [func for func in self.functions if func["path"].endswith(suffix)]
+    
+    def _get_function_info(self, path: str) -> Optional[Dict]:
+        """
+        按限定路径获取函数信息
 
-要求:
+        不是限定路径时（如旧的生成日志中的函数名）只在唯一匹配时返回。
+        """
+        if self.symbol_index is not None:
+            func = self.symbol_index.get_function(path)
+        else:
+            func = self._functions_by_path.get(path)
+        if func is None and "::" not in path:
+            matches = self.find_functions(path)
+            func = matches[0] if len(matches) == 1 else None
+        return func
+    
+    REQUIREMENTS = """要求:
 1. 使用 libfuzzer (cargo-fuzz) 格式
 2. 正确处理 Rust 的所有权和生命周期
 3. 生成合理的测试输入
 4. 处理可能的错误情况
 5. 使用 arbitrary crate 生成结构化输入
-
-目标函数:
 """
-        
-        for func in func_infos:
-            prompt += f"\n函数名: {func['name']}\n"
-            prompt += f"参数: {func['params']}\n"
-            prompt += f"返回类型: {func['return_type']}\n"
-            if func.get('doc_comment'):
-                prompt += f"文档: {func['doc_comment']}\n"
-            prompt += "\n"
-        
-        prompt += """
-请生成完整的 fuzz target 代码，包括:
-1. 必要的 use 语句
+    
+    CODE_REQUIREMENTS = """1. 必要的 use 语句
 2. fuzz_target! 宏定义
 3. 输入数据解析
 4. 函数调用
 5. 错误处理
+"""
+    
+    def _build_prompt(self, func_infos: List[Dict]) -> str:
+        """
+        构建 LLM prompt
+        
+        函数签名总是完整保留，文档、相关类型定义和提示等上下文按 token 预算裁剪。
+        """
+        header = f"""你是一个 Rust fuzzing 专家。请为以下函数生成一个 fuzz target。
 
+{self.REQUIREMENTS}
+目标函数:
+"""
+        
+        pieces = self._function_pieces(func_infos) + self.type_index.pieces(func_infos) + self._hint_pieces()
+        
+        footer = f"""
+请生成完整的 fuzz target 代码，包括:
+{self.CODE_REQUIREMENTS}
 代码格式:
 ```rust
 // fuzz target 代码
 ```
 """
         
-        return prompt
+        return self.prompt_budget.render(header, pieces, footer)
+    
+    def _build_batch_prompt(self, batch: List[List[Dict]]) -> str:
+        """
+        构建批量生成的 LLM prompt
+        
+        :param batch: 每个 fuzz target 的函数信息列表
+        """
+        header = f"""你是一个 Rust fuzzing 专家。请为以下 {len(batch)} 组函数分别生成一个独立的 fuzz target，共 {len(batch)} 个。
+
+{self.REQUIREMENTS}"""
+        
+        pieces = []
+        for index, func_infos in enumerate(batch, 1):
+            pieces.append(ContextPiece([f"\n第 {index} 组目标函数:\n"], required=True))
+            pieces += self._function_pieces(func_infos)
+        # 各组共用一份相关类型定义
+        pieces += self.type_index.pieces(info for func_infos in batch for info in func_infos)
+        pieces += self._hint_pieces()
+        
+        footer = f"""
+每个 fuzz target 都应是完整、可单独编译的文件，包括:
+{self.CODE_REQUIREMENTS}
+按组的顺序输出，每个 fuzz target 前单独一行写分隔标记，格式如下:
+{BATCH_MARKER.format(index=1)}
+```rust
+// 第 1 组的 fuzz target 代码
+```
+{BATCH_MARKER.format(index=2)}
+```rust
+// 第 2 组的 fuzz target 代码
+```
+"""
+        
+        return self.prompt_budget.render(header, pieces, footer, scale=len(batch))
+    
+    def _function_pieces(self, func_infos: List[Dict]) -> List[ContextPiece]:
+        """
+        生成函数信息的上下文片段
+        
+        签名部分是必需的；文档按完整、摘要、首行的顺序裁剪，
+        包含 unsafe 的函数的文档优先保留。
+        """
+        pieces = []
+        for func in func_infos:
+            signature = f"\n函数名: {func['name']}\n"
+            if func.get('path'):
+                signature += f"路径: {func['path']}\n"
+            if func.get('owner'):
+                signature += f"所属类型: {func['owner']}\n"
+            if func.get('self_param'):
+                signature += f"接收者: {func['self_param']}\n"
+            signature += f"参数: {self._format_params(func['params'])}\n"
+            signature += f"返回类型: {func['return_type']}\n"
+            pieces.append(ContextPiece([signature], required=True))
+            
+            variants = [f"文档: {doc}\n" for doc in doc_variants(func.get('doc_comment', ""))]
+            if variants:
+                priority = 2 if func.get('is_unsafe') or func.get('contains_unsafe') else 1
+                pieces.append(ContextPiece(variants, priority=priority))
+            pieces.append(ContextPiece(["\n"], required=True))
+        return pieces
+    
+    def _hint_pieces(self) -> List[ContextPiece]:
+        """生成 API 使用提示的上下文片段"""
+        if not self.api_hints:
+            return []
+        hints = "".join(f"- {hint}\n" for hint in self.api_hints)
+        return [ContextPiece([f"API 使用提示:\n{hints}"], priority=0)]
+    
+    @staticmethod
+    def _format_params(params: List[Dict]) -> str:
+        """将参数列表格式化为 Rust 签名形式"""
+        if not params:
+            return "无"
+        return ", ".join(f"{param['name']}: {param['type']}" for param in params)
+    
+    def _split_batch(self, response: str, count: int) -> List[Optional[str]]:
+        """
+        将批量响应拆分为各个 fuzz target
+        
+        优先按分隔标记拆分；没有标记但代码块数量恰好相同时按顺序对应。
+        
+        :param response: LLM 响应
+        :param count: fuzz target 数量
+        :return: 各个 fuzz target 的代码，无法解析的位置为 None
+        """
+        codes: List[Optional[str]] = [None] * count
+        markers = list(BATCH_MARKER_RE.finditer(response))
+        if markers:
+            for k, match in enumerate(markers):
+                index = int(match.group(1)) - 1
+                end = markers[k + 1].start() if k + 1 < len(markers) else len(response)
+                segment = response[match.end():end]
+                if 0 <= index < count and codes[index] is None and "```" in segment:
+                    codes[index] = self._post_process(segment)
+            return codes
+        
+        blocks = re.findall(r"```[^\n]*\n(.*?)```", response, re.DOTALL)
+        if len(blocks) == count:
+            codes = [self._post_process(f"```rust\n{block}```") for block in blocks]
+        return codes
     
     def _post_process(self, generated_code: str) -> str:
         """
@@ -0,0 +1,229 @@
+"""
+函数集合规划
+用贪心加权集合覆盖预先规划所有 fuzz target 的函数集合，
+以尽量少的 fuzz target 覆盖全部目标函数
+"""
+
+import random
+import re
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+
+# 不作为分组依据的参数类型
+PRIMITIVE_TYPES = {
+    "bool", "char", "str", "String", "Self", "()",
+    "u8", "u16", "u32", "u64", "u128", "usize",
+    "i8", "i16", "i32", "i64", "i128", "isize",
+    "f32", "f64", "[u8]", "Vec<u8>",
+}
+
+
+def _base_type(type_name: str) -> str:
+    """去掉引用、可变性和生命周期，得到参数的基础类型"""
+    return re.sub(r"&\s*('\w+\s+)?(mut\s+)?", "", type_name).strip()
+
+
+def _key(func: dict) -> str:
+    """函数的唯一标识：限定路径（不同类型的同名方法路径不同）"""
+    return func.get("path") or func["name"]
+
+
+class SelectionPlan:
+    """
+    函数集合规划结果
+    """
+
+    def __init__(self, selections: List[List[str]], uncovered: List[str], full_cover_size: int):
+        """
+        :param selections: 每个 fuzz target 的函数集合（函数的限定路径）
+        :param uncovered: 没有被任何 fuzz target 覆盖的函数（限定路径）
+        :param full_cover_size: 覆盖全部函数所需的 fuzz target 数量
+        """
+        self.selections = selections
+        self.uncovered = uncovered
+        self.full_cover_size = full_cover_size
+
+
+class FunctionSelector:
+    """
+    基于贪心加权集合覆盖的函数选择器
+
+    候选集合为同一类型的方法、同一模块的函数以及接受相同参数类型的函数，
+    每一步选择未覆盖函数权重之和最大的候选集合（取其中权重最高的若干个，
+    不足时用全局权重最高的未覆盖函数补齐）。全部覆盖后，如果还需要更多
+    fuzz target，则开始新一轮覆盖：已在同一个 fuzz target 中出现过的函数对
+    不再计入收益，每轮优先组合此前没有放在一起的函数，同权重函数的顺序也随轮次打乱。
+    """
+
+    # 后续轮次中每个候选集合最多考虑的函数数量（以函数集合大小为单位）
+    CANDIDATE_FACTOR = 4
+
+    def __init__(self, function_set_size: int = 3, prioritize_unsafe: bool = True,
+                 priority_functions: Iterable[str] = (), reaching_unsafe: Iterable[str] = ()):
+        """
+        初始化选择器
+
+        :param function_set_size: 每个 fuzz target 的函数数量
+        :param prioritize_unsafe: 是否提高 unsafe 相关函数的权重
+        :param priority_functions: 重点测试的函数（priority_unsafe_functions），
+                                   可以是限定路径或路径后缀（如 "new"、"Foo::new"）
+        :param reaching_unsafe: 可能执行到 unsafe 代码的函数的限定路径
+        """
+        self.function_set_size = max(1, function_set_size)
+        self.prioritize_unsafe = prioritize_unsafe
+        self.priority_functions = set(priority_functions)
+        self.reaching_unsafe = set(reaching_unsafe)
+
+    def weight(self, func: dict) -> float:
+        """
+        计算函数的权重
+
+        unsafe 函数、包含或可到达 unsafe 代码的函数、重点测试的函数权重更高；
+        参数类型越丰富，权重越高。
+        """
+        weight = 1.0
+        if self.prioritize_unsafe:
+            if func.get("is_unsafe"):
+                weight += 3
+            if func.get("contains_unsafe"):
+                weight += 2
+            elif _key(func) in self.reaching_unsafe:
+                weight += 1
+        if self._is_priority(_key(func)):
+            weight += 5
+        param_types = {param["type"] for param in func.get("params", [])}
+        weight += 0.5 * min(len(param_types), 4)
+        return weight
+
+    def _is_priority(self, path: str) -> bool:
+        """是否为重点测试的函数"""
+        return any(path == name or path.endswith(f"::{name}") for name in self.priority_functions)
+
+    def _groups(self, functions: Dict[str, dict]) -> List[List[str]]:
+        """按所属类型、模块和参数类型构造候选集合"""
+        groups: Dict[str, List[str]] = {}
+        for path, func in functions.items():
+            if func.get("owner"):
+                groups.setdefault(f"owner:{func.get('module', '')}::{func['owner']}", []).append(path)
+            else:
+                groups.setdefault(f"module:{func.get('module', '')}", []).append(path)
+            for param in func.get("params", []):
+                base = _base_type(param["type"])
+                if base not in PRIMITIVE_TYPES and len(base) > 1:
+                    group = groups.setdefault(f"type:{base}", [])
+                    if not group or group[-1] != path:
+                        group.append(path)
+        return list(groups.values())
+
+    def _cover(self, order: List[str], groups: List[List[str]], weights: Dict[str, float],
+               round_index: int = 0, seen: Optional[Set[Tuple[str, str]]] = None) -> List[List[str]]:
+        """
+        一轮贪心覆盖，返回覆盖全部函数的集合序列
+
+        :param round_index: 轮次，非 0 时打乱同权重函数的顺序
+        :param seen: 此前已放在同一个 fuzz target 中的函数对，本轮选出的集合也会加入
+        """
+        def by_weight(names: List[str]) -> List[str]:
+            names = list(names)
+            if round_index:
+                random.Random(round_index).shuffle(names)
+            return sorted(names, key=lambda name: -weights[name])
+
+        seen = seen if seen is not None else set()
+        order = by_weight(order)
+        groups = [by_weight(group) for group in groups]
+        size = self.function_set_size
+        uncovered = set(order)
+        cursor = 0
+        selections = []
+
+        def gain_of(name: str, members: List[str]) -> float:
+            # 与已选函数组成的函数对中，此前出现过的部分不计收益
+            if not members:
+                return weights[name]
+            fresh = sum((min(name, member), max(name, member)) not in seen for member in members)
+            return weights[name] * fresh / len(members)
+
+        def extend(members: List[str], candidates: List[str]) -> Tuple[List[str], float]:
+            members = list(members)
+            gain = 0.0
+            if round_index == 0:
+                # 第一轮的函数都未曾组合过，收益即权重
+                for name in candidates[:size - len(members)]:
+                    members.append(name)
+                    gain += weights[name]
+                return members, gain
+            candidates = candidates[:size * self.CANDIDATE_FACTOR]
+            while len(members) < size and candidates:
+                best = max(candidates, key=lambda name: gain_of(name, members))
+                gain += gain_of(best, members)
+                members.append(best)
+                candidates.remove(best)
+            return members, gain
+
+        while uncovered:
+            best_members = []
+            best_gain = 0.0
+            for group in groups:
+                candidates = [name for name in group if name in uncovered]
+                # 收益不超过权重最高的 size 个函数的权重之和，不可能更优时跳过
+                if sum(weights[name] for name in candidates[:size]) <= best_gain:
+                    continue
+                members, gain = extend([], candidates)
+                if gain > best_gain:
+                    best_members, best_gain = members, gain
+
+            selection = list(best_members)
+            uncovered.difference_update(selection)
+            # 不足时用全局权重最高的未覆盖函数补齐
+            while cursor < len(order) and order[cursor] not in uncovered:
+                cursor += 1
+            if len(selection) < size and uncovered:
+                candidates = []
+                for name in order[cursor:]:
+                    if name in uncovered:
+                        candidates.append(name)
+                        if len(candidates) >= size * self.CANDIDATE_FACTOR:
+                            break
+                selection, _ = extend(selection, candidates)
+                uncovered.difference_update(selection)
+            seen.update((min(a, b), max(a, b)) for a, b in combinations(selection, 2))
+            selections.append(selection)
+        return selections
+
+    def plan(self, functions: Iterable[dict], count: int) -> SelectionPlan:
+        """
+        规划 count 个 fuzz target 的函数集合
+
+        :param functions: 目标函数信息（按限定路径去重，同路径只保留权重最高的一个）
+        :param count: fuzz target 数量
+        :return: 规划结果
+        """
+        by_path: Dict[str, dict] = {}
+        weights: Dict[str, float] = {}
+        for func in functions:
+            weight = self.weight(func)
+            if weight > weights.get(_key(func), 0):
+                by_path[_key(func)] = func
+                weights[_key(func)] = weight
+        if not by_path:
+            return SelectionPlan([], [], 0)
+
+        order = list(by_path)
+        groups = self._groups(by_path)
+        seen: Set[Tuple[str, str]] = set()
+        cover = self._cover(order, groups, weights, seen=seen)
+        selections = list(cover[:count])
+        round_index = 0
+        while len(selections) < count:
+            # 已全部覆盖，开始新一轮，优先组合此前没有放在一起的函数
+            round_index += 1
+            selections += self._cover(order, groups, weights, round_index, seen)[:count - len(selections)]
+
+        covered = {name for selection in selections for name in selection}
+        uncovered = [name for name in sorted(order, key=lambda name: -weights[name]) if name not in covered]
+        logger.debug(f"覆盖全部 {len(order)} 个函数需要 {len(cover)} 个 fuzz target")
+        return SelectionPlan(selections, uncovered, len(cover))
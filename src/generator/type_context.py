@@ -0,0 +1,217 @@
+"""
+类型依赖上下文
+预先建立类型名到定义的索引，按 collect_depth 收集目标函数依赖的结构体和枚举定义
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from .prompt_budget import ContextPiece, doc_variants
+
+
+# 类型字符串中的标识符（生命周期先去掉）
+_IDENT_RE = re.compile(r"[A-Za-z_]\w*")
+_LIFETIME_RE = re.compile(r"'\w+")
+
+# 每个类型在 prompt 中最多列出的 trait 和方法数量
+MAX_LISTED = 12
+
+
+def type_names(type_str: str) -> List[str]:
+    """
+    提取类型字符串中出现的标识符（按出现顺序去重）
+
+    如 "&'a Option<Vec<Foo>>" 得到 ["Option", "Vec", "Foo"]。
+    """
+    names = _IDENT_RE.findall(_LIFETIME_RE.sub("", type_str))
+    return list(dict.fromkeys(names))
+
+
+def _impl_type_name(type_str: str) -> str:
+    """impl 块目标类型的名称，如 "&'a Foo<T>" 得到 "Foo" """
+    base = re.sub(r"<.*", "", _LIFETIME_RE.sub("", type_str)).replace("&", "").replace("mut ", "")
+    return base.split("::")[-1].strip()
+
+
+class TypeIndex:
+    """
+    类型名到定义的索引
+
+    构建时遍历一次全部结构体、枚举和 impl 块；之后每个类型的依赖和渲染结果、
+    每个根类型的 BFS 结果都只计算一次，收集上下文的耗时只与上下文大小有关。
+    """
+
+    def __init__(self, structs: Iterable[dict] = (), enums: Iterable[dict] = (),
+                 impls: Iterable[dict] = (), collect_depth: int = 3, one_def_per_name: bool = True):
+        """
+        建立索引
+
+        :param structs: 结构体定义
+        :param enums: 枚举定义
+        :param impls: impl 块
+        :param collect_depth: 收集深度（1 表示只收集签名中直接出现的类型，0 表示不收集）
+        :param one_def_per_name: 同名定义只选择一个（优先公开的定义）
+        """
+        self.collect_depth = max(0, collect_depth)
+        self.one_def_per_name = one_def_per_name
+        self.definitions: Dict[str, List[Tuple[str, dict]]] = {}
+        for kind, items in (("struct", structs), ("enum", enums)):
+            for item in items:
+                self.definitions.setdefault(item["name"], []).append((kind, item))
+        if one_def_per_name:
+            for name, defs in self.definitions.items():
+                self.definitions[name] = [min(defs, key=lambda d: not d[1].get("is_pub"))]
+
+        # 类型名 -> 实现的 trait / 固有方法
+        self.traits: Dict[str, List[str]] = {}
+        self.methods: Dict[str, List[str]] = {}
+        for impl in impls:
+            name = _impl_type_name(impl["type"])
+            if name not in self.definitions:
+                continue
+            if impl.get("trait"):
+                self.traits.setdefault(name, []).append(impl["trait"])
+            else:
+                self.methods.setdefault(name, []).extend(impl.get("methods", []))
+
+        self._deps: Dict[str, Tuple[str, ...]] = {}
+        self._levels: Dict[str, Tuple[Tuple[str, ...], ...]] = {}
+        self._rendered: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.definitions)
+
+    def dependencies(self, name: str) -> Tuple[str, ...]:
+        """类型定义中（字段类型）直接引用的已知类型"""
+        deps = self._deps.get(name)
+        if deps is None:
+            found = {}
+            for kind, item in self.definitions.get(name, ()):
+                for field in item.get("fields", ()):
+                    for dep in type_names(field["type"]):
+                        if dep != name and dep in self.definitions:
+                            found[dep] = None
+            deps = self._deps[name] = tuple(found)
+        return deps
+
+    def levels(self, name: str) -> Tuple[Tuple[str, ...], ...]:
+        """
+        从类型出发的 BFS 分层结果（第 0 层为自身），最多 collect_depth 层
+
+        :param name: 已知类型名
+        """
+        levels = self._levels.get(name)
+        if levels is None:
+            seen = {name}
+            current = [name]
+            result = []
+            while current and len(result) < self.collect_depth:
+                result.append(tuple(current))
+                following = []
+                for type_name in current:
+                    for dep in self.dependencies(type_name):
+                        if dep not in seen:
+                            seen.add(dep)
+                            following.append(dep)
+                current = following
+            levels = self._levels[name] = tuple(result)
+        return levels
+
+    def collect(self, func_infos: Iterable[dict]) -> List[Tuple[str, int]]:
+        """
+        收集函数签名依赖的类型
+
+        所属类型和参数类型为第 1 层，其字段类型为第 2 层，依此类推。
+
+        :param func_infos: 函数信息
+        :return: [(类型名, 层数)]，按层数和出现顺序排列，每个类型只出现一次
+        """
+        if not self.collect_depth:
+            return []
+        roots = []
+        for func in func_infos:
+            type_strs = [func.get("owner") or ""] + [param["type"] for param in func.get("params", [])]
+            for type_str in type_strs:
+                for name in type_names(type_str):
+                    if name == "Self":
+                        name = func.get("owner") or ""
+                    if name in self.definitions:
+                        roots.append(name)
+
+        depth_of: Dict[str, int] = {}
+        for root in dict.fromkeys(roots):
+            for depth, names in enumerate(self.levels(root), 1):
+                for name in names:
+                    if depth < depth_of.get(name, depth + 1):
+                        depth_of[name] = depth
+        return sorted(depth_of.items(), key=lambda item: item[1])
+
+    def render(self, name: str) -> List[str]:
+        """
+        类型的上下文文本，从完整到精简
+
+        依次为定义、文档首行、实现的 trait 和固有方法；只有定义；只有名称和路径。
+        """
+        variants = self._rendered.get(name)
+        if variants is None:
+            full = []
+            short = []
+            paths = []
+            for kind, item in self.definitions.get(name, ()):
+                definition = self._definition(kind, item)
+                doc = doc_variants(item.get("doc_comment", ""))
+                header = f"\n相关类型 {item['path']}:\n"
+                text = header
+                if doc:
+                    text += f"{doc[-1]}\n"
+                text += definition
+                full.append(text)
+                short.append(header + definition)
+                paths.append(item["path"])
+            traits = list(dict.fromkeys(self.traits.get(name, ())))
+            methods = list(dict.fromkeys(self.methods.get(name, ())))
+            extra = ""
+            if traits:
+                extra += f"实现的 trait: {self._listing(traits)}\n"
+            if methods:
+                extra += f"方法: {self._listing(methods)}\n"
+            variants = ["".join(full) + extra, "".join(short), f"\n相关类型: {', '.join(paths)}\n"]
+            variants = self._rendered[name] = [v for i, v in enumerate(variants) if v not in variants[:i]]
+        return variants
+
+    def pieces(self, func_infos: Iterable[dict]) -> List[ContextPiece]:
+        """
+        生成类型定义的上下文片段
+
+        签名中直接出现的类型优先级与普通函数的文档相同，更深层的类型最先省略。
+        """
+        return [
+            ContextPiece(self.render(name), priority=1 if depth == 1 else 0)
+            for name, depth in self.collect(func_infos)
+        ]
+
+    @staticmethod
+    def _listing(names: List[str]) -> str:
+        text = ", ".join(names[:MAX_LISTED])
+        if len(names) > MAX_LISTED:
+            text += f" 等 {len(names)} 个"
+        return text
+
+    @staticmethod
+    def _definition(kind: str, item: dict) -> str:
+        """以 Rust 语法渲染结构体或枚举定义"""
+        vis = "pub " if item.get("is_pub") else ""
+        if kind == "enum":
+            variants = item.get("variants", [])
+            return f"{vis}enum {item['name']} {{ {', '.join(variants)} }}\n"
+        fields = item.get("fields", [])
+        if not fields:
+            return f"{vis}struct {item['name']};\n"
+        if all(field["name"].isdigit() for field in fields):
+            types = ", ".join(("pub " if field.get("is_pub") else "") + field["type"] for field in fields)
+            return f"{vis}struct {item['name']}({types});\n"
+        lines = "".join(
+            f"    {'pub ' if field.get('is_pub') else ''}{field['name']}: {field['type']},\n"
+            for field in fields
+        )
+        return f"{vis}struct {item['name']} {{\n{lines}}}\n"
@@ -0,0 +1,171 @@
+"""
+LLM 响应缓存
+以请求参数的哈希为键，将响应持久化到 SQLite，按大小和时间淘汰
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+"""
+
+
+def cache_key(provider: str, model: str, prompt: str, temperature: float, max_tokens: int,
+              sample: str = "") -> str:
+    """
+    计算请求的缓存键
+
+    :param sample: 区分相同 prompt 的多次采样（如 fuzz target 编号）
+    :return: 十六进制哈希
+    """
+    prompt_hash = hashlib.blake2b(prompt.encode("utf-8"), digest_size=32).hexdigest()
+    request = [provider, model, prompt_hash, temperature, max_tokens]
+    if sample:
+        request.append(sample)
+    request = json.dumps(request)
+    return hashlib.blake2b(request.encode("utf-8"), digest_size=32).hexdigest()
+
+
+class ResponseCache:
+    """
+    持久化的 LLM 响应缓存
+
+    读取时更新访问时间；打开和关闭时淘汰超过保存期限的条目，
+    总大小超过上限时按最近最少使用的顺序淘汰。
+    连接可在多个线程间共享，操作通过锁串行化。
+
+    temperature > 0 的响应是一次采样，相同 prompt 的下一次请求应得到新的结果，
+    因此默认只保存不读取，只在 reuse_sampled 时（继续上次中断的生成）复用。
+    """
+
+    def __init__(self, db_file: Path, max_size_mb: float = 256, max_age_days: float = 30,
+                 reuse_sampled: bool = False):
+        """
+        打开缓存
+
+        :param db_file: 缓存数据库路径
+        :param max_size_mb: 响应总大小上限（MiB，0 表示不限制）
+        :param max_age_days: 条目保存天数（0 表示不限制）
+        :param reuse_sampled: 是否复用 temperature > 0 的响应
+        """
+        self.db_file = db_file
+        self.reuse_sampled = reuse_sampled
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        # temperature > 0 且不复用采样结果、没有查询缓存的请求
+        self.bypassed = 0
+        self.lock = threading.Lock()
+        db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.executescript(CACHE_SCHEMA)
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存
+
+        :param key: 缓存键
+        :return: 响应，未命中时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def lookup(self, key: str, temperature: float) -> Optional[str]:
+        """
+        查询可以直接使用的响应
+
+        :param key: 缓存键
+        :param temperature: 请求的温度参数，大于 0 且不复用采样结果时不查询
+        :return: 响应，未命中或不应复用时返回 None
+        """
+        if temperature > 0 and not self.reuse_sampled:
+            with self.lock:
+                self.bypassed += 1
+            return None
+        return self.get(key)
+
+    def put(self, key: str, response: str):
+        """
+        保存响应
+
+        :param key: 缓存键
+        :param response: 响应
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now)
+            )
+            self.conn.commit()
+
+    def evict(self) -> int:
+        """
+        淘汰过期条目和超出大小上限的条目
+
+        :return: 淘汰的条目数
+        """
+        removed = 0
+        with self.lock:
+            if self.max_age > 0:
+                cursor = self.conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)
+                )
+                removed += cursor.rowcount
+            if self.max_size > 0:
+                total = 0
+                expired = []
+                rows = self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at DESC")
+                for key, size in rows:
+                    total += size
+                    if total > self.max_size:
+                        expired.append((key,))
+                self.conn.executemany("DELETE FROM responses WHERE key = ?", expired)
+                removed += len(expired)
+            self.conn.commit()
+        if removed:
+            logger.debug(f"LLM 响应缓存淘汰 {removed} 条")
+        return removed
+
+    def stats(self) -> dict:
+        """
+        缓存统计
+
+        :return: {"hits", "misses", "bypassed", "entries", "size"}
+        """
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed,
+                "entries": entries, "size": size}
+
+    def close(self):
+        """淘汰条目并关闭缓存"""
+        self.evict()
+        self.conn.close()
@@ -3,8 +3,14 @@ LLM 客户端
 支持 OpenAI 和 Ollama
 """
 
+import time
+from functools import partial
 from loguru import logger
-from typing import Optional
+from typing import Callable, Iterator, Optional, Tuple
+
+from .cache import ResponseCache, cache_key
+from .rate_limit import RateLimiter
+from .streaming import FenceParser, LatencyStats
 
 
 class LLMClient:
@@ -13,7 +19,10 @@ class LLMClient:
     """
     
     def __init__(self, provider: str = "openai", model: str = "gpt-4", 
-                 api_key: str = "", api_base: str = "", host: str = ""):
+                 api_key: str = "", api_base: str = "", host: str = "",
+                 cache: Optional[ResponseCache] = None,
+                 limiter: Optional[RateLimiter] = None, stream: bool = False,
+                 latency: Optional[LatencyStats] = None):
         """
         初始化 LLM 客户端
         
@@ -22,12 +31,20 @@ class LLMClient:
         :param api_key: API 密钥
         :param api_base: API 端点
         :param host: Ollama 主机
+        :param cache: 响应缓存（None 表示不使用缓存）
+        :param limiter: 限流器（None 表示不限流，只按默认设置重试）
+        :param stream: 是否使用流式响应（可在代码块闭合后提前结束生成）
+        :param latency: 耗时统计（多个客户端可共享同一个）
         """
         self.provider = provider
         self.model = model
         self.api_key = api_key
         self.api_base = api_base
         self.host = host
+        self.cache = cache
+        self.limiter = limiter or RateLimiter()
+        self.stream = stream
+        self.latency = latency or LatencyStats()
         
         if provider == "openai":
             self._init_openai()
@@ -40,7 +57,8 @@ class LLMClient:
         """初始化 OpenAI 客户端"""
         try:
             from openai import OpenAI
-            self.client = OpenAI(api_key=self.api_key, base_url=self.api_base)
+            # 重试由限流器统一处理
+            self.client = OpenAI(api_key=self.api_key, base_url=self.api_base, max_retries=0)
             logger.info(f"OpenAI 客户端初始化成功，模型: {self.model}")
         except ImportError:
             logger.error("未安装 openai 包，请运行: pip install openai")
@@ -50,35 +68,55 @@ class LLMClient:
         """初始化 Ollama 客户端"""
         try:
             import ollama
-            self.client = ollama
+            # 客户端内部的 HTTP 连接在多次请求间复用
+            self.client = ollama.Client(host=self.host or None)
             logger.info(f"Ollama 客户端初始化成功，模型: {self.model}")
         except ImportError:
             logger.error("未安装 ollama 包，请运行: pip install ollama")
             raise
     
     def generate(self, prompt: str, temperature: float = 0.7, 
-                 max_tokens: int = 2000) -> str:
+                 max_tokens: int = 2000, stop_after_blocks: int = 0, sample: str = "") -> str:
         """
         生成文本
         
         :param prompt: 输入提示
         :param temperature: 温度参数
         :param max_tokens: 最大 token 数
+        :param stop_after_blocks: 流式响应中闭合多少个 rust 代码块后停止生成（0 表示生成到结束）
+        :param sample: 区分相同 prompt 的多次采样的缓存标识（如 fuzz target 编号）
         :return: 生成的文本
         """
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.provider, self.model, prompt, temperature, max_tokens, sample)
+            cached = self.cache.lookup(key, temperature)
+            if cached is not None:
+                return cached
+        
+        if self.provider == "openai":
+            request = partial(self._generate_openai, prompt, temperature, max_tokens, stop_after_blocks)
+        else:
+            request = partial(self._generate_ollama, prompt, temperature, max_tokens, stop_after_blocks)
         try:
-            if self.provider == "openai":
-                return self._generate_openai(prompt, temperature, max_tokens)
-            elif self.provider == "ollama":
-                return self._generate_ollama(prompt, temperature, max_tokens)
+            response = self.limiter.call(request, prompt, max_tokens)
         except Exception as e:
             logger.error(f"生成失败: {e}")
             raise
+        
+        if key is not None and response:
+            self.cache.put(key, response)
+        return response
     
     def _generate_openai(self, prompt: str, temperature: float, 
-                         max_tokens: int) -> str:
-        """使用 OpenAI 生成"""
-        response = self.client.chat.completions.create(
+                         max_tokens: int, stop_after_blocks: int = 0) -> tuple:
+        """
+        使用 OpenAI 生成
+        
+        :return: (生成的文本, 实际 token 数)
+        """
+        started = time.perf_counter()
+        request = dict(
             model=self.model,
             messages=[
                 {"role": "system", "content": "你是一个 Rust fuzzing 专家。"},
@@ -87,12 +125,33 @@ class LLMClient:
             temperature=temperature,
             max_tokens=max_tokens
         )
-        return response.choices[0].message.content
+        if not self.stream:
+            response = self.client.chat.completions.create(**request)
+            self.latency.record(started, None)
+            usage = response.usage.total_tokens if response.usage else None
+            return response.choices[0].message.content, usage
+        
+        stream = self.client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **request
+        )
+        
+        def chunks():
+            for chunk in stream:
+                text = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+                usage = chunk.usage.total_tokens if getattr(chunk, "usage", None) else None
+                yield text, usage
+        
+        return self._read_stream(chunks(), stream.close, started, stop_after_blocks)
     
     def _generate_ollama(self, prompt: str, temperature: float, 
-                         max_tokens: int) -> str:
-        """使用 Ollama 生成"""
-        response = self.client.generate(
+                         max_tokens: int, stop_after_blocks: int = 0) -> tuple:
+        """
+        使用 Ollama 生成
+        
+        :return: (生成的文本, 实际 token 数)
+        """
+        started = time.perf_counter()
+        request = dict(
             model=self.model,
             prompt=prompt,
             options={
@@ -100,4 +159,52 @@ class LLMClient:
                 "num_predict": max_tokens
             }
         )
-        return response['response']
+        if not self.stream:
+            response = self.client.generate(**request)
+            self.latency.record(started, None)
+            usage = (response.get('prompt_eval_count') or 0) + (response.get('eval_count') or 0)
+            return response['response'], usage or None
+        
+        stream = self.client.generate(stream=True, **request)
+        
+        def chunks():
+            for chunk in stream:
+                usage = None
+                if chunk.get('done'):
+                    usage = (chunk.get('prompt_eval_count') or 0) + (chunk.get('eval_count') or 0) or None
+                yield chunk.get('response') or "", usage
+        
+        return self._read_stream(chunks(), stream.close, started, stop_after_blocks)
+    
+    def _read_stream(self, chunks: Iterator[Tuple[str, Optional[int]]], close: Callable[[], None],
+                     started: float, stop_after_blocks: int) -> tuple:
+        """
+        读取流式响应，所需的代码块闭合后关闭连接，停止生成
+        
+        :param chunks: (文本片段, 实际 token 数或 None) 迭代器
+        :param close: 关闭流的函数
+        :param started: 请求开始时间
+        :param stop_after_blocks: 闭合多少个 rust 代码块后停止（0 表示读到结束）
+        :return: (生成的文本, 实际 token 数)，提前停止时 token 数为 None
+        """
+        parser = FenceParser(stop_after_blocks)
+        parts = []
+        usage = None
+        first_token_at = None
+        stopped = False
+        try:
+            for text, chunk_usage in chunks:
+                if chunk_usage:
+                    usage = chunk_usage
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(text)
+                if parser.feed(text):
+                    stopped = True
+                    break
+        finally:
+            close()
+        self.latency.record(started, first_token_at, stopped)
+        return "".join(parts), usage
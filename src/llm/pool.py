@@ -0,0 +1,196 @@
+"""
+LLM 客户端池
+在多个端点之间按权重和未完成请求数分配请求，端点失败时改用其他端点，可选地对慢请求发送对冲请求
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Collection, List, Optional
+
+from loguru import logger
+
+from .cache import ResponseCache, cache_key
+from .llm import LLMClient
+from .rate_limit import is_retryable
+from .streaming import _percentile
+
+
+class LLMClientPool:
+    """
+    LLM 客户端池
+
+    与 LLMClient 提供相同的 generate 接口。每个请求发往
+    (未完成请求数 + 1) / 权重 最小的端点，端点重试后仍以可重试的错误失败时
+    改用其余端点中最优的一个；开启对冲时，请求耗时超过近期耗时的指定分位数后，
+    再向另一个端点发送相同的请求，采用先完成的结果。
+    """
+
+    def __init__(self, clients: List[LLMClient], weights: List[float],
+                 cache: Optional[ResponseCache] = None, hedge_percentile: float = 0,
+                 hedge_min_samples: int = 20, max_workers: int = 64):
+        """
+        初始化客户端池
+
+        :param clients: 各端点的客户端（不应各自带有响应缓存）
+        :param weights: 各端点的权重
+        :param cache: 响应缓存（None 表示不使用缓存）
+        :param hedge_percentile: 触发对冲请求的耗时分位数，如 0.95（0 表示不对冲）
+        :param hedge_min_samples: 开始对冲前至少需要的耗时样本数
+        :param max_workers: 执行对冲请求的最大线程数
+        """
+        if not clients:
+            raise ValueError("LLM 客户端池至少需要一个端点")
+        self.clients = clients
+        self.weights = [max(weight, 1e-6) for weight in weights]
+        self.cache = cache
+        self.hedge_percentile = hedge_percentile if len(clients) > 1 else 0
+        self.hedge_min_samples = hedge_min_samples
+        self.outstanding = [0] * len(clients)
+        self.requests = [0] * len(clients)
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.lock = threading.Lock()
+        self._recent = deque(maxlen=200)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if self.hedge_percentile else None
+
+        # 各端点的客户端应共享同一个耗时统计
+        self.latency = clients[0].latency
+
+    @property
+    def models(self) -> str:
+        """各端点的 provider 和模型，用于缓存键"""
+        return ",".join(sorted({f"{client.provider}:{client.model}" for client in self.clients}))
+
+    def _acquire(self, exclude: Collection[int] = ()) -> Optional[int]:
+        """选择端点并增加其未完成请求数，没有可用端点时返回 None"""
+        with self.lock:
+            candidates = [i for i in range(len(self.clients)) if i not in exclude]
+            if not candidates:
+                return None
+            index = min(candidates, key=lambda i: (self.outstanding[i] + 1) / self.weights[i])
+            self.outstanding[index] += 1
+            self.requests[index] += 1
+            return index
+
+    def _call(self, index: int, prompt: str, temperature: float, max_tokens: int,
+              stop_after_blocks: int) -> str:
+        """在指定端点上执行请求"""
+        try:
+            return self.clients[index].generate(prompt, temperature, max_tokens, stop_after_blocks)
+        finally:
+            with self.lock:
+                self.outstanding[index] -= 1
+
+    def _call_with_failover(self, index: int, prompt: str, temperature: float, max_tokens: int,
+                            stop_after_blocks: int) -> str:
+        """在指定端点上执行请求，以可重试的错误失败时依次改用其余端点"""
+        tried = []
+        while True:
+            tried.append(index)
+            try:
+                return self._call(index, prompt, temperature, max_tokens, stop_after_blocks)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                next_index = self._acquire(exclude=tried)
+                if next_index is None:
+                    raise
+                with self.lock:
+                    self.failovers += 1
+                logger.warning(f"端点 {index} 请求失败 ({e})，改用端点 {next_index}")
+                index = next_index
+
+    def _hedge_delay(self) -> Optional[float]:
+        """当前的对冲等待时间，样本不足或未开启时返回 None"""
+        if not self.hedge_percentile:
+            return None
+        with self.lock:
+            if len(self._recent) < self.hedge_min_samples:
+                return None
+            return _percentile(list(self._recent), self.hedge_percentile)
+
+    def generate(self, prompt: str, temperature: float = 0.7,
+                 max_tokens: int = 2000, stop_after_blocks: int = 0, sample: str = "") -> str:
+        """
+        生成文本
+
+        :param prompt: 输入提示
+        :param temperature: 温度参数
+        :param max_tokens: 最大 token 数
+        :param stop_after_blocks: 流式响应中闭合多少个 rust 代码块后停止生成（0 表示生成到结束）
+        :param sample: 区分相同 prompt 的多次采样的缓存标识（如 fuzz target 编号）
+        :return: 生成的文本
+        """
+        key = None
+        if self.cache is not None:
+            key = cache_key("pool", self.models, prompt, temperature, max_tokens, sample)
+            cached = self.cache.lookup(key, temperature)
+            if cached is not None:
+                return cached
+
+        args = (prompt, temperature, max_tokens, stop_after_blocks)
+        delay = self._hedge_delay()
+        started = time.perf_counter()
+        if delay is None:
+            response = self._call_with_failover(self._acquire(), *args)
+        else:
+            response = self._generate_hedged(delay, args)
+        with self.lock:
+            self._recent.append(time.perf_counter() - started)
+
+        if key is not None and response:
+            self.cache.put(key, response)
+        return response
+
+    def _generate_hedged(self, delay: float, args: tuple) -> str:
+        """
+        发送请求，超过 delay 秒未完成时向另一个端点发送对冲请求
+
+        先完成的请求失败时等待另一个；未被采用的请求尚未开始时取消，已开始的在后台完成后丢弃。
+        """
+        primary_index = self._acquire()
+        primary = self._executor.submit(self._call_with_failover, primary_index, *args)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge_index = self._acquire(exclude=[primary_index])
+        with self.lock:
+            self.hedged += 1
+        logger.debug(f"LLM 请求超过 {delay:.1f}s 未完成，向端点 {hedge_index} 发送对冲请求")
+        hedge = self._executor.submit(self._call_with_failover, hedge_index, *args)
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self) -> dict:
+        """
+        各端点的请求统计
+
+        :return: {"requests": 各端点请求数, "hedged": 对冲次数, "hedge_wins": 对冲请求先完成的次数,
+                  "failovers": 改用其他端点的次数}
+        """
+        with self.lock:
+            return {"requests": list(self.requests), "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+                    "failovers": self.failovers}
+
+    def close(self):
+        """关闭对冲请求的线程池，不等待仍在运行的请求，取消尚未开始的请求"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
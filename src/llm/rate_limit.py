@@ -0,0 +1,300 @@
+"""
+LLM 请求限流与重试
+令牌桶限制每分钟的请求数和 token 数，被限流时自适应地降低并发，
+失败的请求按带抖动的指数退避重试，并遵循服务端返回的 Retry-After
+"""
+
+import email.utils
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from loguru import logger
+
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# 表示被限流的 HTTP 状态码
+THROTTLE_STATUS = {429, 503}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估计文本的 token 数（约每 4 字节一个 token）
+
+    :param text: 文本
+    """
+    return max(1, len(text.encode("utf-8")) // 4)
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    以固定速率补充令牌，容量为一分钟的配额，允许短时突发。
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        初始化令牌桶
+
+        :param per_minute: 每分钟补充的令牌数
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1):
+        """
+        取出令牌，不足时等待
+
+        超过容量的请求按容量计算，避免永远无法满足。
+
+        :param amount: 令牌数
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def refund(self, amount: float):
+        """
+        退回多取的令牌（可以为负，表示补扣）
+
+        :param amount: 令牌数
+        """
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds: float):
+        """
+        清空令牌并推迟补充，用于服务端要求等待时
+
+        :param seconds: 等待秒数
+        """
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 自适应并发限制
+
+    被限流时将上限减半，之后每连续成功“上限”次将上限加一。
+    初始不限制，直到第一次被限流。同一批并发请求（在上次减半之前发出的）
+    被限流只计一次，避免连续减半。
+    """
+
+    def __init__(self, max_concurrency: int = 0):
+        """
+        初始化
+
+        :param max_concurrency: 并发上限（0 表示不限制）
+        """
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency or None
+        self.in_flight = 0
+        self.successes = 0
+        self.epoch = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """
+        占用一个并发槽位，超过上限时等待
+
+        :return: 当前的调整轮次，被限流时传给 on_throttle
+        """
+        with self.condition:
+            while self.limit is not None and self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+            epoch = self.epoch
+        try:
+            yield epoch
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify()
+
+    def on_success(self):
+        """请求成功"""
+        with self.condition:
+            if self.limit is None:
+                return
+            self.successes += 1
+            if self.successes >= self.limit and self.limit != self.max_concurrency:
+                self.limit += 1
+                self.successes = 0
+                self.condition.notify()
+
+    def on_throttle(self, epoch: int):
+        """
+        请求被限流
+
+        :param epoch: 请求发出时的调整轮次
+        """
+        with self.condition:
+            if epoch != self.epoch:
+                return
+            self.epoch += 1
+            current = self.limit if self.limit is not None else self.in_flight
+            self.limit = max(1, current // 2)
+            self.successes = 0
+            logger.debug(f"LLM 请求被限流，并发上限调整为 {self.limit}")
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """获取异常对应的 HTTP 状态码"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    获取服务端要求的等待时间
+
+    :param error: 请求异常
+    :return: 秒数，未指定时返回 None
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """判断请求异常是否可以重试（限流、超时、连接错误和服务端错误）"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+
+def is_throttled(error: Exception) -> bool:
+    """判断请求是否被限流"""
+    return _status_code(error) in THROTTLE_STATUS
+
+
+class RateLimiter:
+    """
+    LLM 请求限流器
+
+    同一个客户端的所有线程共享：请求前按每分钟请求数和 token 数取令牌
+    （token 按 prompt 加 max_tokens 预扣，完成后按实际用量多退少补），
+    失败时退避重试，被限流时降低并发。
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_concurrency: int = 0, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        初始化限流器
+
+        :param requests_per_minute: 每分钟请求数上限（0 表示不限制）
+        :param tokens_per_minute: 每分钟 token 数上限（0 表示不限制）
+        :param max_concurrency: 并发请求数上限（0 表示不限制）
+        :param max_retries: 最大重试次数
+        :param base_delay: 第一次重试的基础等待秒数
+        :param max_delay: 单次等待秒数上限
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """计算第 attempt 次重试前的等待秒数"""
+        delay = retry_after(error)
+        if delay is None:
+            # full jitter
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return min(delay, self.max_delay)
+
+    def call(self, request: Callable[[], tuple], prompt: str, max_tokens: int) -> str:
+        """
+        在限流下执行请求，失败时重试
+
+        :param request: 请求函数，返回 (响应文本, 实际 token 数或 None)
+        :param prompt: 输入提示（用于预估 token 数）
+        :param max_tokens: 最大输出 token 数
+        :return: 响应文本
+        """
+        reserved = estimate_tokens(prompt) + max_tokens
+        attempt = 0
+        while True:
+            with self.concurrency.slot() as epoch:
+                if self.requests is not None:
+                    self.requests.acquire()
+                if self.tokens is not None:
+                    self.tokens.acquire(reserved)
+                try:
+                    text, used = request()
+                except Exception as e:
+                    if self.tokens is not None:
+                        self.tokens.refund(reserved)
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    error = e
+                else:
+                    if self.tokens is not None:
+                        if used is None:
+                            used = estimate_tokens(prompt) + estimate_tokens(text)
+                        self.tokens.refund(reserved - used)
+                    self.concurrency.on_success()
+                    return text
+
+            delay = self._backoff(attempt, error)
+            with self.lock:
+                self.retries += 1
+                if is_throttled(error):
+                    self.throttled += 1
+            if is_throttled(error):
+                self.concurrency.on_throttle(epoch)
+                if self.requests is not None:
+                    self.requests.pause(delay)
+            attempt += 1
+            logger.warning(f"LLM 请求失败 ({error})，{delay:.1f} 秒后第 {attempt} 次重试")
+            time.sleep(delay)
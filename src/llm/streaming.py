@@ -0,0 +1,114 @@
+"""
+流式响应处理
+增量解析代码块以便提前结束生成，并统计首 token 时间和总耗时
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class FenceParser:
+    """
+    增量的 Markdown 代码块解析器
+
+    逐块接收流式输出，在指定数量的 rust 代码块闭合后报告完成。
+    闭合判断与 _post_process 提取代码的方式一致：代码块内行首的 ``` 即为结束。
+    """
+
+    def __init__(self, stop_after_blocks: int):
+        """
+        初始化解析器
+
+        :param stop_after_blocks: 闭合多少个 rust 代码块后完成（0 表示从不提前完成）
+        """
+        self.stop_after_blocks = stop_after_blocks
+        self.closed_blocks = 0
+        self.language = None
+        self.line = ""
+
+    @property
+    def done(self) -> bool:
+        """是否已经完成"""
+        return 0 < self.stop_after_blocks <= self.closed_blocks
+
+    def feed(self, text: str) -> bool:
+        """
+        接收一段输出
+
+        :param text: 新输出的文本
+        :return: 是否已经完成
+        """
+        lines = (self.line + text).split("\n")
+        self.line = lines.pop()
+        for line in lines:
+            self._process_line(line)
+            if self.done:
+                return True
+        # 未结束的行以 ``` 开头时代码块已经闭合，不必等待换行
+        if self.language is not None and self.line.lstrip().startswith("```"):
+            self._process_line(self.line)
+            self.line = ""
+        return self.done
+
+    def _process_line(self, line: str):
+        stripped = line.strip()
+        if not stripped.startswith("```"):
+            return
+        if self.language is None:
+            self.language = stripped[3:].strip()
+        else:
+            if self.language == "rust":
+                self.closed_blocks += 1
+            self.language = None
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class LatencyStats:
+    """
+    LLM 请求耗时统计（线程安全）
+    """
+
+    def __init__(self):
+        self.first_token: List[float] = []
+        self.total: List[float] = []
+        self.early_stops = 0
+        self.lock = threading.Lock()
+
+    def record(self, started: float, first_token_at: Optional[float], stopped_early: bool = False):
+        """
+        记录一次请求
+
+        :param started: 请求开始时间（time.perf_counter）
+        :param first_token_at: 收到第一个 token 的时间，非流式请求为 None（视为与结束同时）
+        :param stopped_early: 是否提前结束了生成
+        """
+        finished = time.perf_counter()
+        with self.lock:
+            self.first_token.append((first_token_at or finished) - started)
+            self.total.append(finished - started)
+            self.early_stops += int(stopped_early)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        汇总统计
+
+        :return: 请求数、首 token 时间和总耗时的均值与分位数（秒）、提前结束次数
+        """
+        with self.lock:
+            count = len(self.total)
+            return {
+                "requests": count,
+                "ttft_mean": sum(self.first_token) / count if count else 0.0,
+                "ttft_p50": _percentile(self.first_token, 0.5),
+                "latency_mean": sum(self.total) / count if count else 0.0,
+                "latency_p50": _percentile(self.total, 0.5),
+                "latency_p95": _percentile(self.total, 0.95),
+                "early_stops": self.early_stops,
+            }
@@ -61,27 +61,97 @@ def get_crate_path() -> Path:
     return crate_path
 
 
-def setup_llm(llm_name: str = ""):
+def _create_llm_client(endpoint: dict, llm_config: dict, cache, latency=None):
     """
-    设置 LLM 客户端
-    
-    :param llm_name: LLM 名称
+    根据端点配置创建 LLM 客户端
+
+    端点中未设置的项使用 [llm] 中的同名配置。
+
+    :param endpoint: 端点配置（[[llm.endpoints]] 中的一项，单端点时为空）
+    :param llm_config: [llm] 配置
+    :param cache: 响应缓存
+    :param latency: 耗时统计
     :return: LLM 客户端
     """
     from .llm.llm import LLMClient
+    from .llm.rate_limit import RateLimiter
     
-    llm_config = global_vars.config.get("llm", {})
+    def option(key, default):
+        return endpoint.get(key, llm_config.get(key, default))
     
-    if llm_config.get("use_ollama", False):
+    # 同一端点的所有并发请求共享限流器
+    limiter = RateLimiter(
+        requests_per_minute=option("requests_per_minute", 0),
+        tokens_per_minute=option("tokens_per_minute", 0),
+        max_concurrency=option("max_concurrency", 0),
+        max_retries=option("max_retries", 5),
+        base_delay=option("retry_base_delay", 1.0),
+        max_delay=option("retry_max_delay", 60.0)
+    )
+    
+    provider = endpoint.get("provider", "ollama" if llm_config.get("use_ollama", False) else "openai")
+    if provider == "ollama":
         return LLMClient(
             provider="ollama",
-            model=llm_config.get("ollama_model", "codellama:13b"),
-            host=llm_config.get("ollama_host", "http://localhost:11434")
+            model=endpoint.get("model", llm_config.get("ollama_model", "codellama:13b")),
+            host=endpoint.get("host", llm_config.get("ollama_host", "http://localhost:11434")),
+            cache=cache,
+            limiter=limiter,
+            stream=option("stream", True),
+            latency=latency
         )
     else:
         return LLMClient(
             provider="openai",
-            model=llm_config.get("openai_model", "gpt-4"),
-            api_key=llm_config.get("openai_api_key", ""),
-            api_base=llm_config.get("openai_api_base", "https://api.openai.com/v1")
+            model=endpoint.get("model", llm_config.get("openai_model", "gpt-4")),
+            api_key=endpoint.get("api_key", llm_config.get("openai_api_key", "")),
+            api_base=endpoint.get("api_base", llm_config.get("openai_api_base", "https://api.openai.com/v1")),
+            cache=cache,
+            limiter=limiter,
+            stream=option("stream", True),
+            latency=latency
+        )
+
+
+def setup_llm(llm_name: str = "", use_cache: bool = True, reuse_sampled: bool = False):
+    """
+    设置 LLM 客户端
+    
+    配置了 [[llm.endpoints]] 时返回在各端点间分配请求的客户端池，
+    接口与单个客户端相同。
+    
+    :param llm_name: LLM 名称
+    :param use_cache: 是否使用响应缓存（还需配置中 cache_enabled 未关闭）
+    :param reuse_sampled: 是否复用 temperature > 0 的缓存响应（继续上次中断的生成时使用）
+    :return: LLM 客户端
+    """
+    from .llm.cache import ResponseCache
+    from .llm.pool import LLMClientPool
+    from .llm.streaming import LatencyStats
+    
+    llm_config = global_vars.config.get("llm", {})
+    
+    cache = None
+    if use_cache and llm_config.get("cache_enabled", True):
+        cache = ResponseCache(
+            Path(llm_config.get("cache_path", "output/llm_cache.db")),
+            max_size_mb=llm_config.get("cache_max_size_mb", 256),
+            max_age_days=llm_config.get("cache_max_age_days", 30),
+            reuse_sampled=reuse_sampled
         )
+    
+    endpoints = llm_config.get("endpoints", [])
+    if not endpoints:
+        return _create_llm_client({}, llm_config, cache)
+    
+    # 缓存由客户端池统一查询，各端点共享耗时统计
+    latency = LatencyStats()
+    clients = [_create_llm_client(endpoint, llm_config, None, latency) for endpoint in endpoints]
+    logger.info(f"LLM 客户端池: {len(clients)} 个端点")
+    return LLMClientPool(
+        clients,
+        weights=[endpoint.get("weight", 1) for endpoint in endpoints],
+        cache=cache,
+        hedge_percentile=llm_config.get("hedge_percentile", 0),
+        hedge_min_samples=llm_config.get("hedge_min_samples", 20)
+    )